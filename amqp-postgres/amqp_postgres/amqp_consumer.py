@@ -41,9 +41,10 @@ logger = logging.getLogger(__name__)
 
 class AMQPLogsEventsConsumer(object):
 
-    def __init__(self, message_processor):
+    def __init__(self, message_processor, prefetch_count=None):
         self.queue = 'cloudify-logs-events'
         self._message_processor = message_processor
+        self._prefetch_count = prefetch_count
 
         # This is here because AMQPConnection expects it
         self.routing_key = ''
@@ -51,6 +52,8 @@ class AMQPLogsEventsConsumer(object):
     def register(self, connection):
         channel = connection.channel()
         channel.confirm_delivery()
+        if self._prefetch_count:
+            channel.basic_qos(prefetch_count=self._prefetch_count)
         channel.queue_declare(queue=self.queue,
                               durable=True,
                               auto_delete=False)
@@ -22,7 +22,7 @@ import argparse
 from cloudify.amqp_client import get_client
 
 from .amqp_consumer import AMQPLogsEventsConsumer, AckingAMQPConnection
-from .postgres_publisher import DBLogEventPublisher
+from .postgres_publisher import DBLogEventPublisherPool, MAX_QUEUE_SIZE
 
 logger = logging.getLogger(__name__)
 BROKER_PORT_SSL = 5671
@@ -46,9 +46,15 @@ def _create_connections(config):
         cls=AckingAMQPConnection
     )
     amqp_client.acks_queue = acks_queue
-    db_publisher = DBLogEventPublisher(config, amqp_client)
+    db_publisher = DBLogEventPublisherPool(
+        config, amqp_client,
+        workers=config.get('amqp_postgres_workers') or 1
+    )
     amqp_consumer = AMQPLogsEventsConsumer(
-        message_processor=db_publisher.process
+        message_processor=db_publisher.process,
+        prefetch_count=config.get('amqp_postgres_prefetch_count')
+        or config.get('amqp_postgres_max_queue_size')
+        or MAX_QUEUE_SIZE
     )
 
     amqp_client.add_handler(amqp_consumer)
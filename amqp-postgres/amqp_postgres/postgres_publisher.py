@@ -17,7 +17,9 @@
 import json
 import Queue
 import logging
+from io import BytesIO
 from time import time
+from datetime import datetime
 from threading import Thread, Lock
 
 import psycopg2
@@ -29,12 +31,21 @@ from cloudify.constants import EVENTS_EXCHANGE_NAME, LOGS_EXCHANGE_NAME
 logger = logging.getLogger(__name__)
 
 BATCH_DELAY = 0.5
+BATCH_SIZE = 100
+MAX_BATCH_SIZE = 5000
+MAX_QUEUE_SIZE = 10000
+METRICS_INTERVAL = 60  # seconds
+EXECUTIONS_CACHE_SIZE = 10000
+MISSING_EXECUTION_TTL = 5  # seconds
 
 EVENT_INSERT_QUERY = """
     INSERT INTO events (
         timestamp,
         reported_timestamp,
         _execution_fk,
+        _deployment_fk,
+        _blueprint_fk,
+        _node_instance_fk,
         _tenant_id,
         _creator_id,
         event_type,
@@ -51,6 +62,9 @@ EVENT_VALUES_TEMPLATE = """(
         now() AT TIME ZONE 'utc',
         CAST (%(timestamp)s AS TIMESTAMP),
         %(execution_id)s,
+        %(deployment_id)s,
+        %(blueprint_id)s,
+        %(node_instance_id)s,
         %(tenant_id)s,
         %(creator_id)s,
         %(event_type)s,
@@ -68,6 +82,9 @@ LOG_INSERT_QUERY = """
         timestamp,
         reported_timestamp,
         _execution_fk,
+        _deployment_fk,
+        _blueprint_fk,
+        _node_instance_fk,
         _tenant_id,
         _creator_id,
         logger,
@@ -83,6 +100,9 @@ LOG_VALUES_TEMPLATE = """(
         now() AT TIME ZONE 'utc',
         CAST (%(timestamp)s AS TIMESTAMP),
         %(execution_id)s,
+        %(deployment_id)s,
+        %(blueprint_id)s,
+        %(node_instance_id)s,
         %(tenant_id)s,
         %(creator_id)s,
         %(logger)s,
@@ -95,14 +115,66 @@ LOG_VALUES_TEMPLATE = """(
     )
 """
 
-EXECUTION_SELECT_QUERY = """
+# Columns stored by the COPY-based ingestion, as (column, item key) pairs.
+# The `timestamp` column is filled in separately, when the batch is stored
+EVENT_COPY_COLUMNS = [
+    ('reported_timestamp', 'timestamp'),
+    ('_execution_fk', 'execution_id'),
+    ('_deployment_fk', 'deployment_id'),
+    ('_blueprint_fk', 'blueprint_id'),
+    ('_node_instance_fk', 'node_instance_id'),
+    ('_tenant_id', 'tenant_id'),
+    ('_creator_id', 'creator_id'),
+    ('event_type', 'event_type'),
+    ('message', 'message'),
+    ('message_code', 'message_code'),
+    ('operation', 'operation'),
+    ('node_id', 'node_id'),
+    ('error_causes', 'error_causes'),
+    ('visibility', 'visibility'),
+]
+
+LOG_COPY_COLUMNS = [
+    ('reported_timestamp', 'timestamp'),
+    ('_execution_fk', 'execution_id'),
+    ('_deployment_fk', 'deployment_id'),
+    ('_blueprint_fk', 'blueprint_id'),
+    ('_node_instance_fk', 'node_instance_id'),
+    ('_tenant_id', 'tenant_id'),
+    ('_creator_id', 'creator_id'),
+    ('logger', 'logger'),
+    ('level', 'level'),
+    ('message', 'message'),
+    ('message_code', 'message_code'),
+    ('operation', 'operation'),
+    ('node_id', 'node_id'),
+    ('visibility', 'visibility'),
+]
+
+COPY_QUERY = 'COPY {table} (timestamp, {columns}) FROM STDIN'
+
+EXECUTIONS_SELECT_QUERY = """
     SELECT
-        id,
-        _storage_id,
-        _creator_id,
-        _tenant_id
+        executions.id,
+        executions._storage_id,
+        executions._creator_id,
+        executions._tenant_id,
+        executions._deployment_fk,
+        deployments._blueprint_fk
     FROM executions
-    WHERE id = %s
+    LEFT JOIN deployments
+        ON deployments._storage_id = executions._deployment_fk
+    WHERE executions.id = ANY(%s)
+"""
+
+NODE_INSTANCES_SELECT_QUERY = """
+    SELECT
+        node_instances.id,
+        node_instances._storage_id,
+        nodes._deployment_fk
+    FROM node_instances
+    JOIN nodes ON nodes._storage_id = node_instances._node_fk
+    WHERE node_instances.id = ANY(%s)
 """
 
 
@@ -111,10 +183,26 @@ class DBLogEventPublisher(object):
 
     def __init__(self, config, connection):
         self._lock = Lock()
-        self._batch = Queue.Queue()
+        # the queue is bounded, but the AMQP consumer prefetch should not
+        # be larger than its size, so that putting never actually blocks,
+        # and the back-pressure is applied by the broker instead
+        self._batch = Queue.Queue(
+            maxsize=config.get('amqp_postgres_max_queue_size')
+            or MAX_QUEUE_SIZE)
 
         self._last_commit = time()
+        self._last_metrics = time()
         self.config = config
+        self._min_batch_size = config.get('amqp_postgres_batch_size') \
+            or BATCH_SIZE
+        self._max_batch_size = max(
+            config.get('amqp_postgres_max_batch_size') or MAX_BATCH_SIZE,
+            self._min_batch_size)
+        self._batch_size = self._min_batch_size
+        self._batch_delay = config.get('amqp_postgres_batch_delay') \
+            or BATCH_DELAY
+        self._commit_latency = 0
+        self._use_copy = bool(config.get('amqp_postgres_use_copy'))
         self._amqp_connection = connection
         self._started = Queue.Queue()
         self._reset_cache()
@@ -122,7 +210,8 @@ class DBLogEventPublisher(object):
         self.error_exit = None
 
     def _reset_cache(self):
-        self._executions_cache = LimitedSizeDict(10000)
+        self._executions_cache = ExecutionsCache(
+            EXECUTIONS_CACHE_SIZE, MISSING_EXECUTION_TTL)
 
     def start(self):
         self.error_exit = None
@@ -166,11 +255,13 @@ class DBLogEventPublisher(object):
         items = []
         while True:
             try:
-                items.append(self._batch.get(timeout=BATCH_DELAY / 2))
+                items.append(self._batch.get(timeout=self._batch_delay / 2))
             except Queue.Empty:
                 pass
-            if len(items) > 100 or \
-                    (items and (time() - self._last_commit > BATCH_DELAY)):
+            if len(items) > self._batch_size or \
+                    (items and
+                     (time() - self._last_commit > self._batch_delay)):
+                store_start = time()
                 try:
                     self._store(conn, items)
                 except psycopg2.OperationalError as e:
@@ -180,30 +271,88 @@ class DBLogEventPublisher(object):
                                      len(items))
                     conn.rollback()
                     # in case the integrityError was caused by stale cache,
-                    # clean it entirely before trying to insert without
-                    # batching.
+                    # drop the executions of this batch from the cache
+                    # before trying to insert without batching.
                     # This happens rarely.
-                    self._reset_cache()
+                    self._executions_cache.invalidate(
+                        self._get_execution_ids(items))
                     self._store_nobatch(conn, items)
                 items = []
                 self._last_commit = time()
+                self._adjust_batch_size(self._last_commit - store_start)
+            if time() - self._last_metrics > METRICS_INTERVAL:
+                logger.info('Publisher metrics: %s', self.metrics)
+                self._last_metrics = time()
+
+    def _adjust_batch_size(self, commit_latency):
+        """Adapt the batch size to the observed load.
+
+        If storing a batch took longer than the batch delay, the database
+        is struggling, so make the batches smaller. Otherwise, if the
+        queue is growing faster than we're storing, make the batches
+        larger, so that the cost of each commit is spread over more items.
+        """
+        self._commit_latency = commit_latency
+        if commit_latency > self._batch_delay:
+            self._batch_size = max(self._batch_size // 2,
+                                   self._min_batch_size)
+        elif self._batch.qsize() > self._batch_size:
+            self._batch_size = min(self._batch_size * 2,
+                                   self._max_batch_size)
+
+    @property
+    def metrics(self):
+        return {
+            'batch_size': self._batch_size,
+            'queue_depth': self._batch.qsize(),
+            'commit_latency': self._commit_latency
+        }
+
+    def _get_executions(self, conn, execution_ids):
+        """Fetch all the executions not yet cached, in a single query"""
+        missing = set(execution_id for execution_id in execution_ids
+                      if execution_id not in self._executions_cache)
+        if not missing:
+            return
+        with conn.cursor() as cur:
+            cur.execute(EXECUTIONS_SELECT_QUERY, (list(missing), ))
+            executions = cur.fetchall()
+        found = {}
+        for execution in executions:
+            if execution['id'] in found:
+                raise ValueError('Expected 1 execution, found more (id: {0})'
+                                 .format(execution['id']))
+            found[execution['id']] = execution
+        for execution_id in missing:
+            if execution_id in found:
+                self._executions_cache[execution_id] = found[execution_id]
+            else:
+                self._executions_cache.set_missing(execution_id)
 
     def _get_execution(self, conn, execution_id):
-        if execution_id not in self._executions_cache:
-            with conn.cursor() as cur:
-                cur.execute(EXECUTION_SELECT_QUERY, (execution_id, ))
-                executions = cur.fetchall()
-            if len(executions) > 1:
-                raise ValueError('Expected 1 execution, found {0} (id: {1})'
-                                 .format(len(executions), execution_id))
-            elif not executions:
-                execution = None
-            else:
-                execution = executions[0]
-            self._executions_cache[execution_id] = execution
-        return self._executions_cache[execution_id]
+        self._get_executions(conn, [execution_id])
+        return self._executions_cache.get(execution_id)
 
-    def _get_db_item(self, conn, message, exchange):
+    def _get_node_instances(self, conn, items):
+        """Map the node instances of the messages to their storage ids.
+
+        Node instance ids are only unique within a deployment, so the
+        returned dict is keyed by (deployment storage id, node instance id)
+        """
+        node_ids = set(message['context'].get('node_id')
+                       for message, _, _ in items)
+        node_ids.discard(None)
+        if not node_ids:
+            return {}
+        with conn.cursor() as cur:
+            cur.execute(NODE_INSTANCES_SELECT_QUERY, (list(node_ids), ))
+            return {
+                (node_instance['_deployment_fk'], node_instance['id']):
+                    node_instance['_storage_id']
+                for node_instance in cur.fetchall()
+            }
+
+    def _get_db_item(self, conn, message, exchange, node_instances):
         execution_id = message['context']['execution_id']
         execution = self._get_execution(conn, execution_id)
         if execution is None:
@@ -216,23 +365,39 @@ class DBLogEventPublisher(object):
             get_item = self._get_log
         else:
             raise ValueError('Unknown exchange type: {0}'.format(exchange))
-        return get_item(message, execution)
+        item = get_item(message, execution)
+        if item is not None:
+            item['node_instance_id'] = node_instances.get(
+                (execution['_deployment_fk'], item['node_id']))
+        return item
+
+    @staticmethod
+    def _get_execution_ids(items):
+        return [message['context']['execution_id']
+                for message, _, _ in items]
 
     def _store(self, conn, items):
         events, logs = [], []
 
         acks = []
+        self._get_executions(conn, self._get_execution_ids(items))
+        node_instances = self._get_node_instances(conn, items)
         for message, exchange, ack in items:
             acks.append(ack)
-            item = self._get_db_item(conn, message, exchange)
+            item = self._get_db_item(conn, message, exchange,
+                                     node_instances)
             if item is None:
                 continue
             target = events if exchange == EVENTS_EXCHANGE_NAME else logs
             target.append(item)
 
         with conn.cursor() as cur:
-            self._insert_events(cur, events)
-            self._insert_logs(cur, logs)
+            if self._use_copy:
+                self._copy_events(cur, events)
+                self._copy_logs(cur, logs)
+            else:
+                self._insert_events(cur, events)
+                self._insert_logs(cur, logs)
         logger.debug('commit %s', len(logs) + len(events))
         conn.commit()
         for ack in acks:
@@ -244,10 +409,17 @@ class DBLogEventPublisher(object):
         This is to be used in the anomalous cases where inserting the whole
         batch throws an IntegrityError - we fall back to inserting the items
         one by one, so that only the errorneous message is dropped.
+        Each message is only acked once it's handled (stored, dropped, or
+        skipped), so that the messages not stored yet aren't lost if the
+        database goes down.
         """
+        self._get_executions(conn, self._get_execution_ids(items))
+        node_instances = self._get_node_instances(conn, items)
         for message, exchange, ack in items:
-            item = self._get_db_item(conn, message, exchange)
+            item = self._get_db_item(conn, message, exchange,
+                                     node_instances)
             if item is None:
+                self._amqp_connection.acks_queue.put(ack)
                 continue
             insert = (self._insert_events if exchange == EVENTS_EXCHANGE_NAME
                       else self._insert_logs)
@@ -260,6 +432,9 @@ class DBLogEventPublisher(object):
             except psycopg2.IntegrityError:
                 logger.debug('Error storing %s: %s', exchange, item)
                 conn.rollback()
+                self._executions_cache.invalidate(
+                    [message['context']['execution_id']])
+            self._amqp_connection.acks_queue.put(ack)
 
     def _insert_events(self, cursor, events):
         if not events:
@@ -273,6 +448,32 @@ class DBLogEventPublisher(object):
         execute_values(cursor, LOG_INSERT_QUERY, logs,
                        template=LOG_VALUES_TEMPLATE)
 
+    def _copy_events(self, cursor, events):
+        self._copy(cursor, 'events', EVENT_COPY_COLUMNS, events)
+
+    def _copy_logs(self, cursor, logs):
+        self._copy(cursor, 'logs', LOG_COPY_COLUMNS, logs)
+
+    def _copy(self, cursor, table, columns, items):
+        """Stream the items into the table using COPY ... FROM STDIN.
+
+        The whole batch is serialized into an in-memory buffer in the
+        COPY text format, and sent to postgres in a single round-trip.
+        """
+        if not items:
+            return
+        timestamp = datetime.utcnow().isoformat()
+        buf = BytesIO()
+        for item in items:
+            row = [timestamp] + [item[key] for _, key in columns]
+            buf.write('\t'.join(_copy_value(v) for v in row).encode('utf-8'))
+            buf.write('\n')
+        buf.seek(0)
+        query = COPY_QUERY.format(
+            table=table,
+            columns=', '.join(column for column, _ in columns))
+        cursor.copy_expert(query, buf)
+
     def on_db_connection_error(self, err):
         logger.critical('Database down - cannot continue')
         self._amqp_connection.close()
@@ -285,6 +486,8 @@ class DBLogEventPublisher(object):
             return {
                 'timestamp': message['timestamp'],
                 'execution_id': execution['_storage_id'],
+                'deployment_id': execution['_deployment_fk'],
+                'blueprint_id': execution['_blueprint_fk'],
                 'tenant_id': execution['_tenant_id'],
                 'creator_id': execution['_creator_id'],
                 'logger': message['logger'],
@@ -309,6 +512,8 @@ class DBLogEventPublisher(object):
             return {
                 'timestamp': message['timestamp'],
                 'execution_id': execution['_storage_id'],
+                'deployment_id': execution['_deployment_fk'],
+                'blueprint_id': execution['_blueprint_fk'],
                 'tenant_id': execution['_tenant_id'],
                 'creator_id': execution['_creator_id'],
                 'event_type': message['event_type'],
@@ -325,22 +530,92 @@ class DBLogEventPublisher(object):
             return None
 
 
-class LimitedSizeDict(OrderedDict):
-    """
-    A FIFO dictionary with a maximum size limit. If number of keys reaches
-    the limit, the elements added first will be popped
-    Implementation taken from https://stackoverflow.com/a/2437645/978089
+class DBLogEventPublisherPool(object):
+    """Distribute the messages between several DBLogEventPublishers.
+
+    Each publisher has its own database connection and publisher thread.
+    Messages are partitioned by their execution id, so that all messages
+    of a single execution are stored by the same publisher, in the order
+    they were received.
     """
-    def __init__(self, size_limit=None, *args, **kwds):
-        self.size_limit = size_limit
-        OrderedDict.__init__(self, *args, **kwds)
-        self._check_size_limit()
+    def __init__(self, config, connection, workers=1):
+        self._publishers = [DBLogEventPublisher(config, connection)
+                            for _ in range(workers)]
 
-    def __setitem__(self, key, value):
-        OrderedDict.__setitem__(self, key, value)
-        self._check_size_limit()
+    @property
+    def error_exit(self):
+        for publisher in self._publishers:
+            if publisher.error_exit:
+                return publisher.error_exit
+
+    def start(self):
+        for publisher in self._publishers:
+            publisher.start()
 
-    def _check_size_limit(self):
-        if self.size_limit is not None:
-            while len(self) > self.size_limit:
-                self.popitem(last=False)
+    def process(self, message, exchange, tag):
+        execution_id = message.get('context', {}).get('execution_id')
+        index = hash(execution_id) % len(self._publishers)
+        self._publishers[index].process(message, exchange, tag)
+
+
+def _copy_value(value):
+    """Format a single value for the COPY text format"""
+    if value is None:
+        return u'\\N'
+    if not isinstance(value, basestring):
+        value = unicode(value)
+    return (value.replace(u'\\', u'\\\\')
+                 .replace(u'\t', u'\\t')
+                 .replace(u'\n', u'\\n')
+                 .replace(u'\r', u'\\r'))
+
+
+class ExecutionsCache(object):
+    """An LRU cache of executions, keyed by the execution id.
+
+    If the number of entries reaches the size limit, the least recently
+    used ones are evicted. Executions that were not found in the database
+    are also cached, but only for missing_ttl seconds, so that a flood of
+    messages for an unknown execution doesn't query the database for
+    every single message.
+    """
+    def __init__(self, size_limit, missing_ttl):
+        self.size_limit = size_limit
+        self.missing_ttl = missing_ttl
+        # execution id -> (execution, expiration time of a missing entry)
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, execution_id):
+        if execution_id not in self._entries:
+            return False
+        execution, expires = self._entries[execution_id]
+        if expires is not None and expires < time():
+            del self._entries[execution_id]
+            return False
+        return True
+
+    def __setitem__(self, execution_id, execution):
+        self._set(execution_id, (execution, None))
+
+    def set_missing(self, execution_id):
+        self._set(execution_id, (None, time() + self.missing_ttl))
+
+    def get(self, execution_id):
+        if execution_id not in self:
+            return None
+        entry = self._entries.pop(execution_id)
+        self._entries[execution_id] = entry
+        return entry[0]
+
+    def invalidate(self, execution_ids):
+        for execution_id in execution_ids:
+            self._entries.pop(execution_id, None)
+
+    def _set(self, execution_id, entry):
+        self._entries.pop(execution_id, None)
+        self._entries[execution_id] = entry
+        while len(self._entries) > self.size_limit:
+            self._entries.popitem(last=False)
@@ -14,11 +14,16 @@
 # limitations under the License.
 ############
 
+import Queue
+import unittest
 from uuid import uuid4
 from time import sleep
 from dateutil import parser as date_parser
 
+import mock
+import psycopg2
 from cloudify.amqp_client import create_events_publisher
+from cloudify.constants import LOGS_EXCHANGE_NAME
 
 from manager_rest.server import db
 from manager_rest.storage import models
@@ -30,13 +35,16 @@ from manager_rest.storage.models_states import VisibilityState
 
 
 from amqp_postgres.main import _create_connections
-from amqp_postgres.postgres_publisher import BATCH_DELAY
+from amqp_postgres.postgres_publisher import BATCH_DELAY, DBLogEventPublisher
 
 LOG_MESSAGE = 'log'
 EVENT_MESSAGE = 'event'
 
 
 class TestAMQPPostgres(BaseServerTestCase):
+    # additional config passed to the amqp-postgres publisher
+    publisher_config = {}
+
     def create_configuration(self):
         """
         Override here to allow using postgresql instead of sqlite
@@ -66,8 +74,9 @@ class TestAMQPPostgres(BaseServerTestCase):
             'amqp_{0}'.format(n)
             for n in ['host', 'username', 'password', 'ca_path']
         ]
-        amqp_client, _ = _create_connections(
-            {k: getattr(config, k) for k in config_keys})
+        publisher_config = {k: getattr(config, k) for k in config_keys}
+        publisher_config.update(self.publisher_config)
+        amqp_client, _ = _create_connections(publisher_config)
         amqp_client.consume_in_thread()
         self.addCleanup(amqp_client.close)
         self.events_publisher = create_events_publisher()
@@ -243,3 +252,69 @@ class TestAMQPPostgres(BaseServerTestCase):
             },
             'timestamp': get_formatted_timestamp()
         }
+
+
+class TestAMQPPostgresCopy(TestAMQPPostgres):
+    """Run the same tests, but store the messages using COPY"""
+    publisher_config = {'amqp_postgres_use_copy': True}
+
+
+class TestAMQPPostgresWorkers(TestAMQPPostgres):
+    """Run the same tests, with several publisher workers"""
+    publisher_config = {
+        'amqp_postgres_workers': 4,
+        'amqp_postgres_prefetch_count': 1000
+    }
+
+
+class TestStoreNoBatch(unittest.TestCase):
+    def setUp(self):
+        self.amqp_connection = mock.Mock(acks_queue=Queue.Queue())
+        self.publisher = DBLogEventPublisher({}, self.amqp_connection)
+        self.conn = mock.MagicMock()
+        self.items = [
+            (TestAMQPPostgres._get_log('execution_{0}'.format(i)),
+             LOGS_EXCHANGE_NAME, 'ack_{0}'.format(i))
+            for i in range(3)
+        ]
+        self.execution = {'_storage_id': 1, '_deployment_fk': 1,
+                          '_blueprint_fk': 1, '_tenant_id': 0,
+                          '_creator_id': 0}
+        for patched in [
+                mock.patch.object(self.publisher, '_get_executions'),
+                mock.patch.object(self.publisher, '_get_node_instances',
+                                  return_value={}),
+                mock.patch.object(self.publisher, '_get_execution',
+                                  return_value=self.execution)]:
+            patched.start()
+            self.addCleanup(patched.stop)
+
+    def _acks(self):
+        acks = []
+        while not self.amqp_connection.acks_queue.empty():
+            acks.append(self.amqp_connection.acks_queue.get())
+        return acks
+
+    def test_acks_after_commit(self):
+        with mock.patch.object(self.publisher, '_insert_logs'):
+            self.publisher._store_nobatch(self.conn, self.items)
+        self.assertEqual(self._acks(), ['ack_0', 'ack_1', 'ack_2'])
+        self.assertEqual(self.conn.commit.call_count, 3)
+
+    def test_acks_dropped_message(self):
+        # the message that can't be stored is acked, and dropped
+        with mock.patch.object(self.publisher, '_insert_logs',
+                               side_effect=[None, psycopg2.IntegrityError,
+                                            None]):
+            self.publisher._store_nobatch(self.conn, self.items)
+        self.assertEqual(self._acks(), ['ack_0', 'ack_1', 'ack_2'])
+        self.conn.rollback.assert_called_once_with()
+
+    def test_no_ack_on_connection_error(self):
+        # the messages that weren't stored are not acked, so the broker
+        # redelivers them
+        with mock.patch.object(self.publisher, '_insert_logs',
+                               side_effect=[None, psycopg2.OperationalError]):
+            with self.assertRaises(psycopg2.OperationalError):
+                self.publisher._store_nobatch(self.conn, self.items)
+        self.assertEqual(self._acks(), ['ack_0'])
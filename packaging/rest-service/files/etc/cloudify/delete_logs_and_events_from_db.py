@@ -22,6 +22,7 @@ from manager_rest.config import instance as conf
 POSTGRESQL_DEFAULT_PORT = 5432
 RESTSERVICE_CONFIG_PATH = '/opt/manager/cloudify-rest.conf'
 DEFAULT_SAVE_PERIOD = 5
+PARTITIONS_CREATED_AHEAD = 3
 EVENTS_TABLE_NAME = 'events'
 LOGS_TABLE_NAME = 'logs'
 
@@ -43,20 +44,63 @@ def _connect():
 
 
 def delete_old_logs_and_events():
-    _delete_rows_from_table(DEFAULT_SAVE_PERIOD, EVENTS_TABLE_NAME)
-    _delete_rows_from_table(DEFAULT_SAVE_PERIOD, LOGS_TABLE_NAME)
+    for table in [EVENTS_TABLE_NAME, LOGS_TABLE_NAME]:
+        _drop_old_partitions(DEFAULT_SAVE_PERIOD, table)
+        _delete_rows_from_table(DEFAULT_SAVE_PERIOD, table)
+        _create_future_partitions(PARTITIONS_CREATED_AHEAD, table)
+
+
+def _drop_old_partitions(save_period, table):
+    """Drop the daily partitions that only contain expired rows.
+
+    Rows are assigned to partitions by their `timestamp`, which is the time
+    they were stored, so they expire by it (and not by their
+    `reported_timestamp`, like the rows left in the parent table).
+    """
+    first_day_to_keep = (datetime.utcnow() - timedelta(days=save_period))\
+        .date()
+    with _connect() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT inhrelid::regclass::text FROM pg_inherits "
+                        "WHERE inhparent = %s::regclass", (table, ))
+            partitions = [row[0] for row in cur.fetchall()]
+            for partition in partitions:
+                day = datetime.strptime(
+                    partition[len(table) + len('_p'):], '%Y%m%d').date()
+                if day < first_day_to_keep:
+                    cur.execute('DROP TABLE {0}'.format(partition))
+            conn.commit()
 
 
 def _delete_rows_from_table(save_period, table):
+    """Delete expired rows stored in the parent table itself.
+
+    Those are rows stored before the table was partitioned.
+    """
     last_date_to_keep = str(datetime.today() - timedelta(days=save_period))
     with _connect() as conn:
         with conn.cursor() as cur:
-            query = "DELETE FROM {0} WHERE reported_timestamp < '{1}'"\
+            query = "DELETE FROM ONLY {0} WHERE reported_timestamp < '{1}'"\
                 .format(table, last_date_to_keep)
             cur.execute(query)
             conn.commit()
 
 
+def _create_future_partitions(days, table):
+    """Create the partitions for the next days in advance, and route the
+    inserted rows to them, so that they don't need to be created (or even
+    looked up) while inserting
+    """
+    today = datetime.utcnow().date()
+    with _connect() as conn:
+        with conn.cursor() as cur:
+            for day in range(days + 1):
+                cur.execute('SELECT create_daily_partition(%s, %s)',
+                            (table, today + timedelta(days=day)))
+            cur.execute('SELECT update_partition_routing(%s)', (table, ))
+            conn.commit()
+
+
 if __name__ == '__main__':
     conf.load_from_file(RESTSERVICE_CONFIG_PATH)
     delete_old_logs_and_events()
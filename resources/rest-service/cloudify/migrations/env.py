@@ -1,4 +1,5 @@
 from __future__ import with_statement
+import re
 from alembic import context
 from sqlalchemy import engine_from_config, pool
 from logging.config import fileConfig
@@ -21,6 +22,10 @@ config.set_main_option('sqlalchemy.url',
                        current_app.config.get('SQLALCHEMY_DATABASE_URI'))
 target_metadata = current_app.extensions['migrate'].db.metadata
 
+# daily partitions of the events and logs tables, which are created by
+# the database itself, and are not a part of the models
+PARTITION_TABLE = re.compile(r'^(events|logs)_p\d{8}$')
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -64,6 +69,9 @@ def run_migrations_online():
                 directives[:] = []
                 logger.info('No changes in schema detected.')
 
+    def include_object(object, name, type_, reflected, compare_to):
+        return not (type_ == 'table' and PARTITION_TABLE.match(name))
+
     engine = engine_from_config(config.get_section(config.config_ini_section),
                                 prefix='sqlalchemy.',
                                 poolclass=pool.NullPool)
@@ -72,6 +80,11 @@ def run_migrations_online():
     context.configure(connection=connection,
                       target_metadata=target_metadata,
                       process_revision_directives=process_revision_directives,
+                      include_object=include_object,
+                      # some migrations commit in the middle (in batches,
+                      # see autocommit_block), so each migration runs in
+                      # its own transaction
+                      transaction_per_migration=True,
                       **current_app.extensions['migrate'].configure_args)
 
     try:
@@ -0,0 +1,32 @@
+"""Store the workflow plugins of blueprints in their own column
+
+Revision ID: 5ce2b0cbb6f3
+Revises: e4b1b8a2c6f5
+Create Date: 2026-10-18 16:05:41.735302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '5ce2b0cbb6f3'
+down_revision = 'e4b1b8a2c6f5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('blueprints',
+                  sa.Column('_workflow_plugins',
+                            postgresql.JSONB(none_as_null=True),
+                            nullable=True))
+    op.execute("""
+        UPDATE blueprints
+        SET _workflow_plugins = plan -> 'workflow_plugins_to_install'
+    """)
+
+
+def downgrade():
+    op.drop_column('blueprints', '_workflow_plugins')
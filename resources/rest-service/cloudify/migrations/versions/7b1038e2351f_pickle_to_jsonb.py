@@ -0,0 +1,137 @@
+"""Store the pickled columns of blueprints, deployments, executions, nodes
+and node instances as JSONB
+
+Revision ID: 7b1038e2351f
+Revises: b92770a7b6ca
+Create Date: 2026-10-18 13:40:52.806617
+
+"""
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from manager_rest.storage.models_base import make_json_compatible
+
+
+# revision identifiers, used by Alembic.
+revision = '7b1038e2351f'
+down_revision = 'b92770a7b6ca'
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger('alembic.env')
+
+# table -> converted columns
+COLUMNS = {
+    'blueprints': ['plan'],
+    'deployments': ['inputs', 'groups', 'policy_triggers', 'policy_types',
+                    'outputs', 'scaling_groups', 'workflows'],
+    'executions': ['parameters'],
+    'nodes': ['plugins', 'plugins_to_install', 'properties',
+              'relationships', 'operations', 'type_hierarchy'],
+    'node_instances': ['relationships', 'runtime_properties',
+                       'scaling_groups'],
+}
+
+NOT_NULLABLE = {('blueprints', 'plan')}
+
+# The rows are converted in batches, so that a large table (e.g. many node
+# instances with large runtime properties) is never loaded at once
+BATCH_SIZE = 1000
+
+CONVERTED_COLUMN_SUFFIX = '_converted'
+
+
+def _converted(column):
+    return column + CONVERTED_COLUMN_SUFFIX
+
+
+def _to_json(table_name, storage_id, column, value):
+    value, dropped = make_json_compatible(value)
+    for path in dropped:
+        logger.warning('%s %s: the value of %s%s can\'t be stored as json, '
+                       'replacing it with null', table_name, storage_id,
+                       column, path)
+    return value
+
+
+def _unchanged(table_name, storage_id, column, value):
+    return value
+
+
+def _convert_table(table_name, columns, source_type, target_type, convert):
+    """Copy the values of the columns to the converted columns.
+
+    The values are loaded with the source type, passed through `convert`,
+    and stored with the target type (e.g. unpickled and then dumped to
+    json), as the database can't convert pickled values by itself.
+
+    Every batch is converted in a transaction of its own, so that the
+    converted rows aren't all kept locked until the migration ends. Rows
+    that are changed after their batch was converted keep the old value,
+    so the manager must not be running while this migration does.
+    """
+    table = sa.table(
+        table_name,
+        sa.column('_storage_id', sa.Integer),
+        *([sa.column(column, source_type) for column in columns] +
+          [sa.column(_converted(column), target_type) for column in columns])
+    )
+    select = (
+        sa.select([table.c._storage_id] + [table.c[c] for c in columns])
+        .where(table.c._storage_id > sa.bindparam('last_id'))
+        .order_by(table.c._storage_id)
+        .limit(BATCH_SIZE)
+    )
+    update = (
+        table.update()
+        .where(table.c._storage_id == sa.bindparam('_id'))
+        .values({_converted(c): sa.bindparam('_' + c) for c in columns})
+    )
+
+    # The migration's own connection is in autocommit mode here, so the
+    # batches use connections of their own to get a transaction each
+    engine = op.get_bind().engine
+    last_id = -1
+    while True:
+        with engine.begin() as connection:
+            rows = connection.execute(select, last_id=last_id).fetchall()
+            if not rows:
+                break
+            connection.execute(update, [
+                dict({'_id': row[0]},
+                     **{'_' + c: convert(table_name, row[0], c, value)
+                        for c, value in zip(columns, row[1:])})
+                for row in rows
+            ])
+        last_id = rows[-1][0]
+
+
+def _convert(source_type, target_type, convert):
+    for table, columns in COLUMNS.items():
+        for column in columns:
+            # A previous run that failed midway already committed the
+            # converted columns, and the rows it converted
+            op.execute('ALTER TABLE {0} DROP COLUMN IF EXISTS {1}'
+                       .format(table, _converted(column)))
+            op.add_column(table, sa.Column(_converted(column), target_type,
+                                           nullable=True))
+        # Commit the new columns, before converting the rows into them
+        with op.get_context().autocommit_block():
+            _convert_table(table, columns, source_type, target_type, convert)
+        for column in columns:
+            op.drop_column(table, column)
+            op.alter_column(table, _converted(column),
+                            new_column_name=column,
+                            nullable=(table, column) not in NOT_NULLABLE)
+
+
+def upgrade():
+    _convert(sa.PickleType(), postgresql.JSONB(none_as_null=True), _to_json)
+
+
+def downgrade():
+    _convert(postgresql.JSONB(none_as_null=True), sa.PickleType(),
+             _unchanged)
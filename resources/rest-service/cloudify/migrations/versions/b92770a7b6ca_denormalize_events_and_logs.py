@@ -0,0 +1,122 @@
+"""Store the deployment, blueprint and node instance of events and logs
+
+Revision ID: b92770a7b6ca
+Revises: f98e3eb1d89c
+Create Date: 2026-10-18 11:02:17.318405
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b92770a7b6ca'
+down_revision = 'f98e3eb1d89c'
+branch_labels = None
+depends_on = None
+
+TABLES = ['events', 'logs']
+
+# (column, referred table, ondelete)
+FOREIGN_KEYS = [
+    ('_deployment_fk', 'deployments', 'CASCADE'),
+    ('_blueprint_fk', 'blueprints', 'CASCADE'),
+    # node instances are removed when scaling in, but their logs are kept
+    ('_node_instance_fk', 'node_instances', 'SET NULL'),
+]
+
+# The rows are backfilled in ranges of storage ids, each range in its own
+# transaction, so that only the rows of the current range are locked
+BACKFILL_BATCH_SIZE = 10000
+
+# Updating the parent table updates the rows of its partitions as well
+BACKFILL_DEPLOYMENTS = """
+UPDATE {0}
+SET _deployment_fk = executions._deployment_fk,
+    _blueprint_fk = deployments._blueprint_fk
+FROM executions
+LEFT JOIN deployments
+    ON deployments._storage_id = executions._deployment_fk
+WHERE {0}._execution_fk = executions._storage_id
+AND {0}._storage_id >= %(first_id)s AND {0}._storage_id < %(last_id)s
+"""
+
+BACKFILL_NODE_INSTANCES = """
+UPDATE {0}
+SET _node_instance_fk = node_instances._storage_id
+FROM node_instances
+JOIN nodes ON nodes._storage_id = node_instances._node_fk
+WHERE {0}.node_id = node_instances.id
+AND {0}._deployment_fk = nodes._deployment_fk
+AND {0}._storage_id >= %(first_id)s AND {0}._storage_id < %(last_id)s
+"""
+
+SELECT_PARTITIONS = """
+SELECT inhrelid::regclass::text
+FROM pg_inherits
+WHERE inhparent = '{0}'::regclass
+"""
+
+
+def _get_partitions(table):
+    return [row[0] for row in
+            op.get_bind().execute(SELECT_PARTITIONS.format(table))]
+
+
+def _backfill(table):
+    """Fill in the new columns of the existing rows.
+
+    This runs in autocommit mode: the new columns are committed first, and
+    then every range of rows is updated in a transaction of its own, so
+    that the table isn't locked while all of its rows are rewritten.
+    """
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        max_id = bind.execute(
+            'SELECT max(_storage_id) FROM {0}'.format(table)).scalar()
+        for first_id in range(0, (max_id or 0) + 1, BACKFILL_BATCH_SIZE):
+            last_id = first_id + BACKFILL_BATCH_SIZE
+            for query in [BACKFILL_DEPLOYMENTS, BACKFILL_NODE_INSTANCES]:
+                bind.execute(query.format(table),
+                             first_id=first_id, last_id=last_id)
+
+
+def _add_foreign_keys(table):
+    # Indexes and foreign keys are not inherited, so the existing partitions
+    # get theirs explicitly (partitions created from now on copy them from
+    # the parent table)
+    for target in [table] + _get_partitions(table):
+        for column, referred_table, ondelete in FOREIGN_KEYS:
+            op.create_foreign_key(
+                op.f('{0}_{1}_fkey'.format(target, column)),
+                target,
+                referred_table,
+                [column],
+                ['_storage_id'],
+                ondelete=ondelete,
+            )
+            op.create_index(
+                op.f('ix_{0}_{1}'.format(target, column)),
+                target,
+                [column],
+                unique=False,
+            )
+
+
+def upgrade():
+    for table in TABLES:
+        for column, _, _ in FOREIGN_KEYS:
+            op.add_column(table, sa.Column(column, sa.Integer(),
+                                           nullable=True))
+        _backfill(table)
+        _add_foreign_keys(table)
+
+
+def downgrade():
+    for table in TABLES:
+        # Partitions created after the upgrade define the columns locally,
+        # so they're not dropped along with the columns of the parent
+        for target in [table] + _get_partitions(table):
+            for column, _, _ in FOREIGN_KEYS:
+                op.execute('ALTER TABLE {0} DROP COLUMN IF EXISTS {1}'
+                           .format(target, column))
@@ -0,0 +1,29 @@
+"""Add a partial index on the queued executions
+
+Revision ID: e4b1b8a2c6f5
+Revises: 7b1038e2351f
+Create Date: 2026-10-18 15:12:36.204871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b1b8a2c6f5'
+down_revision = '7b1038e2351f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        'executions_queued_created_at_idx',
+        'executions',
+        ['created_at', '_storage_id'],
+        unique=False,
+        postgresql_where=sa.text("status = 'queued'"))
+
+
+def downgrade():
+    op.drop_index('executions_queued_created_at_idx', table_name='executions')
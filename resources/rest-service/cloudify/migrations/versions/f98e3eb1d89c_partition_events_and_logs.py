@@ -0,0 +1,162 @@
+"""Partition the events and logs tables by day
+
+Revision ID: f98e3eb1d89c
+Revises: 1fbd6bf39e84
+Create Date: 2026-10-18 09:12:44.501826
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'f98e3eb1d89c'
+down_revision = '1fbd6bf39e84'
+branch_labels = None
+depends_on = None
+
+PARTITIONED_TABLES = ['events', 'logs']
+
+# Postgres 9.5 has no declarative partitioning, so the partitions are
+# child tables inheriting from the parent, and rows inserted into the
+# parent are routed to the partition of their day by a trigger.
+# A partition is called <parent>_pYYYYMMDD, and has the indexes and foreign
+# keys of its parent. The partitions are created in advance by the retention
+# job, and only a row of a day without a partition (e.g. a restored event)
+# creates one, when it's inserted.
+CREATE_PARTITION_FUNCTION = """
+CREATE OR REPLACE FUNCTION create_daily_partition(parent text, day date)
+RETURNS text AS $$
+DECLARE
+    partition text := parent || '_p' || to_char(day, 'YYYYMMDD');
+    fk record;
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_tables
+               WHERE schemaname = current_schema()
+               AND tablename = partition) THEN
+        RETURN partition;
+    END IF;
+    BEGIN
+        EXECUTE format(
+            'CREATE TABLE %I ('
+            '    LIKE %I INCLUDING INDEXES,'
+            '    CHECK ("timestamp" >= %L AND "timestamp" < %L)'
+            ') INHERITS (%I)',
+            partition, parent, day, day + 1, parent);
+    EXCEPTION WHEN duplicate_table OR unique_violation THEN
+        -- the partition was created concurrently by another session
+        RETURN partition;
+    END;
+    FOR fk IN
+        SELECT pg_get_constraintdef(oid) AS definition
+        FROM pg_constraint
+        WHERE conrelid = parent::regclass AND contype = 'f'
+    LOOP
+        EXECUTE format('ALTER TABLE %I ADD %s', partition, fk.definition);
+    END LOOP;
+    RETURN partition;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+# (Re)create the routing trigger function of the parent table: rows of the
+# recent partitions are inserted with static INSERTs, whose plans are
+# cached, so routing a row doesn't look up or create anything. Only rows of
+# older or missing partitions take the slow path, through
+# create_daily_partition and a dynamic INSERT.
+# This is called by the retention job after it creates the next partitions.
+UPDATE_ROUTING_FUNCTION = """
+CREATE OR REPLACE FUNCTION update_partition_routing(parent text)
+RETURNS void AS $$
+DECLARE
+    -- the timestamps of the rows are in UTC
+    today date := (now() AT TIME ZONE 'utc')::date;
+    partition record;
+    branches text := '';
+BEGIN
+    -- rows are inserted with the current time, so today's partition is
+    -- checked first
+    FOR partition IN
+        SELECT relname AS name,
+               to_date(right(relname, 8), 'YYYYMMDD') AS day
+        FROM pg_inherits
+        JOIN pg_class ON pg_class.oid = inhrelid
+        WHERE inhparent = parent::regclass
+        AND to_date(right(relname, 8), 'YYYYMMDD') >= today - 1
+        ORDER BY abs(to_date(right(relname, 8), 'YYYYMMDD') - today)
+    LOOP
+        branches := branches || format(
+            'IF NEW."timestamp" >= %L AND NEW."timestamp" < %L THEN '
+            '    INSERT INTO %I VALUES (NEW.*); '
+            '    RETURN NULL; '
+            'END IF; ',
+            partition.day, partition.day + 1, partition.name);
+    END LOOP;
+    EXECUTE format(
+        'CREATE OR REPLACE FUNCTION %I() RETURNS trigger AS $routing$ '
+        'BEGIN '
+        '    %s'
+        '    EXECUTE format(''INSERT INTO %%I SELECT ($1).*'', '
+        '        create_daily_partition(TG_TABLE_NAME, '
+        '                               NEW."timestamp"::date)) '
+        '    USING NEW; '
+        '    RETURN NULL; '
+        'END; '
+        '$routing$ LANGUAGE plpgsql',
+        parent || '_insert_into_partition', branches);
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+INSERT_TRIGGER = """
+CREATE TRIGGER {0}_partition_insert
+BEFORE INSERT ON {0}
+FOR EACH ROW EXECUTE PROCEDURE {0}_insert_into_partition();
+"""
+
+# The partitions of the next days, created so that the inserts don't
+# take the slow path until the retention job first runs
+PARTITIONS_CREATED_AHEAD = 3
+
+# Move the rows of all the partitions back into the parent table, and
+# drop the partitions
+MERGE_PARTITIONS = """
+DO $$
+DECLARE
+    partition record;
+BEGIN
+    FOR partition IN
+        SELECT inhrelid::regclass AS name
+        FROM pg_inherits
+        WHERE inhparent = '{0}'::regclass
+    LOOP
+        EXECUTE format('ALTER TABLE %s NO INHERIT {0}', partition.name);
+        EXECUTE format('INSERT INTO {0} SELECT * FROM %s', partition.name);
+        EXECUTE format('DROP TABLE %s', partition.name);
+    END LOOP;
+END;
+$$;
+"""
+
+
+def upgrade():
+    # Rows that already exist stay in the parent tables, and are removed
+    # from there by the retention job when they expire
+    op.execute(CREATE_PARTITION_FUNCTION)
+    op.execute(UPDATE_ROUTING_FUNCTION)
+    for table in PARTITIONED_TABLES:
+        for day in range(PARTITIONS_CREATED_AHEAD + 1):
+            op.execute(
+                "SELECT create_daily_partition("
+                "'{0}', (now() AT TIME ZONE 'utc')::date + {1})"
+                .format(table, day))
+        op.execute("SELECT update_partition_routing('{0}')".format(table))
+        op.execute(INSERT_TRIGGER.format(table))
+
+
+def downgrade():
+    for table in PARTITIONED_TABLES:
+        op.execute('DROP TRIGGER {0}_partition_insert ON {0}'.format(table))
+        op.execute(MERGE_PARTITIONS.format(table))
+        op.execute('DROP FUNCTION {0}_insert_into_partition()'.format(table))
+    op.execute('DROP FUNCTION update_partition_routing(text)')
+    op.execute('DROP FUNCTION create_daily_partition(text, date)')
@@ -0,0 +1,160 @@
+#########
+# Copyright (c) 2018 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+import os
+import json
+import Queue
+import threading
+
+from cloudify.amqp_client import get_client, SendHandler
+from cloudify.constants import EVENTS_EXCHANGE_NAME
+
+from manager_rest import config
+from manager_rest.constants import MGMTWORKER_QUEUE, BROKER_SSL_PORT
+from manager_rest.manager_exceptions import AMQPPublishError
+
+# How long to wait for the broker to confirm a message
+PUBLISH_TIMEOUT = 30  # seconds
+
+
+class AMQPPublisher(object):
+    """A persistent connection to the broker, shared by the threads of the
+    process, for sending messages to the mgmtworker and to the events
+    exchange.
+
+    The messages are sent by the thread of the connection, in confirm mode,
+    and `publish` waits for the broker to confirm them. Messages that are
+    published concurrently (or in a batch, by `publish_many`) are queued,
+    and sent one after the other by the connection thread. The connection
+    reconnects by itself when it's closed by the broker, and it's recreated
+    if its thread is gone (e.g. after the reconnection failed, or in a
+    forked worker process).
+    """
+
+    def __init__(self, publish_timeout=PUBLISH_TIMEOUT):
+        self._publish_timeout = publish_timeout
+        self._lock = threading.Lock()
+        self._client = None
+        self._client_thread = None
+        self._handlers = {}
+        self._pid = None
+
+    @staticmethod
+    def _create_handlers():
+        # The exchanges are declared when the connection is established, so
+        # all the handlers are created up front
+        return {
+            'workflow': SendHandler(MGMTWORKER_QUEUE,
+                                    routing_key='workflow'),
+            'service': SendHandler(MGMTWORKER_QUEUE,
+                                   routing_key='service'),
+            'event': SendHandler(EVENTS_EXCHANGE_NAME,
+                                 exchange_type='topic',
+                                 routing_key='events'),
+            'hook': SendHandler(EVENTS_EXCHANGE_NAME,
+                                exchange_type='topic',
+                                routing_key='events.hooks'),
+        }
+
+    def _connect(self):
+        client = get_client(
+            amqp_host=config.instance.amqp_host,
+            amqp_user=config.instance.amqp_username,
+            amqp_pass=config.instance.amqp_password,
+            amqp_port=BROKER_SSL_PORT,
+            amqp_vhost='/',
+            ssl_enabled=True,
+            ssl_cert_path=config.instance.amqp_ca_path
+        )
+        handlers = self._create_handlers()
+        for handler in handlers.values():
+            client.add_handler(handler)
+        thread = client.consume_in_thread()
+        return client, thread, handlers
+
+    def _is_connected(self):
+        return self._client is not None and \
+            self._pid == os.getpid() and \
+            self._client_thread.is_alive()
+
+    def _get_connection(self, message_type):
+        with self._lock:
+            if not self._is_connected():
+                self._close_client()
+                self._client, self._client_thread, self._handlers = \
+                    self._connect()
+                self._pid = os.getpid()
+            return self._client, self._handlers[message_type]
+
+    def publish(self, message, message_type):
+        """Send the message, and wait until the broker confirms it
+
+        :param message: The message, a dict that will be sent as json
+        :param message_type: `workflow` or `service` for mgmtworker tasks,
+                             `event` or `hook` for events
+        """
+        self.publish_many([message], message_type)
+
+    def publish_many(self, messages, message_type):
+        """Send the messages in order, and wait until the broker confirms
+        all of them
+
+        Every message is waited for before the next one is queued. When the
+        connection is lost, its thread queues the unsent message again,
+        behind the messages that were queued after it, so a confirmation of
+        the last message doesn't mean the previous ones were sent. The
+        confirm-mode channel sends one message at a time anyway, so waiting
+        for each one costs little.
+        """
+        if not messages:
+            return
+        client, handler = self._get_connection(message_type)
+        for sent, message in enumerate(messages):
+            try:
+                client.publish({
+                    'exchange': handler.exchange,
+                    'body': json.dumps(message),
+                    'routing_key': handler.routing_key
+                }, wait=True, timeout=self._publish_timeout)
+            except Queue.Empty:
+                # The connection thread didn't send the message in time, so
+                # it's probably gone - the next messages will use a new
+                # connection
+                error = 'timed out'
+            except Exception as e:
+                # e.g. the broker didn't accept the message, which also ends
+                # the connection thread
+                error = e
+            else:
+                continue
+            with self._lock:
+                if client is self._client:
+                    self._close_client()
+            raise AMQPPublishError(
+                'Failed sending {0} {1} message(s) to the broker, after '
+                'sending {2} of them: {3}'
+                .format(len(messages), message_type, sent, error))
+
+    def _close_client(self):
+        client, self._client = self._client, None
+        if client is not None and self._pid == os.getpid():
+            client.close(wait=False)
+
+    def close(self):
+        with self._lock:
+            self._close_client()
+
+
+publisher = AMQPPublisher()
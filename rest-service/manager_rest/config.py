@@ -42,6 +42,13 @@ class Config(object):
         self.amqp_username = 'guest'
         self.amqp_password = 'guest'
         self.amqp_ca_path = ''
+        self.amqp_postgres_batch_size = None
+        self.amqp_postgres_max_batch_size = None
+        self.amqp_postgres_max_queue_size = None
+        self.amqp_postgres_batch_delay = None
+        self.amqp_postgres_use_copy = False
+        self.amqp_postgres_workers = None
+        self.amqp_postgres_prefetch_count = None
         self.ldap_server = None
         self.ldap_username = None
         self.ldap_password = None
@@ -73,6 +80,14 @@ class Config(object):
 
         self.failed_logins_before_account_lock = 4
         self.account_lock_period = -1
+        # Seconds between updates of the last login time of a user, so that
+        # not every request has to write to the users table (0 to update it
+        # on every request)
+        self.last_login_update_interval = 60
+        # The number of active executions of a tenant above which the queued
+        # executions, and the executions started in bulk, wait in the queue
+        # (0 for no limit)
+        self.max_concurrent_executions = 0
 
         self.warnings = []
 
@@ -13,29 +13,93 @@
 #  * See the License for the specific language governing permissions and
 #  * limitations under the License.
 
+import os
 import json
+import threading
+
 from cryptography.fernet import Fernet
 
 from manager_rest.constants import SECURITY_FILE_LOCATION
 
 
+class KeyManager(object):
+    """Encrypt and decrypt with the key from the security config file.
+
+    Reading the key means reading and parsing the config file, so the
+    Fernet object is kept, and only recreated when the file changes (e.g.
+    when a snapshot restore replaces the key). Fernet objects for keys
+    that are passed explicitly are kept as well.
+    """
+
+    def __init__(self, path):
+        self._path = path
+        self._lock = threading.Lock()
+        self._file_stat = None
+        self._fernet = None
+        self._fernets = {}
+
+    def _get_fernet(self, key=None):
+        if key:
+            key = str(key)
+            with self._lock:
+                if key not in self._fernets:
+                    self._fernets[key] = Fernet(key)
+                return self._fernets[key]
+        file_stat = self._get_file_stat()
+        with self._lock:
+            if self._fernet is None or file_stat != self._file_stat:
+                self._fernet = Fernet(str(_get_encryption_key(self._path)))
+                self._file_stat = file_stat
+            return self._fernet
+
+    def _get_file_stat(self):
+        try:
+            stat = os.stat(self._path)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime, stat.st_size
+
+    def encrypt(self, data, key=None):
+        return self._get_fernet(key).encrypt(bytes(data))
+
+    def decrypt(self, encrypted_data, key=None):
+        return self._get_fernet(key).decrypt(bytes(encrypted_data))
+
+    def encrypt_many(self, values, key=None):
+        """Encrypt all the values with the same key"""
+        fernet = self._get_fernet(key)
+        return [fernet.encrypt(bytes(value)) for value in values]
+
+    def decrypt_many(self, encrypted_values, key=None):
+        """Decrypt all the values with the same key"""
+        fernet = self._get_fernet(key)
+        return [fernet.decrypt(bytes(value)) for value in encrypted_values]
+
+
+key_manager = KeyManager(SECURITY_FILE_LOCATION)
+
+
 def encrypt(data, key=None):
-    key = key or _get_encryption_key()
-    fernet = Fernet(str(key))
-    return fernet.encrypt(bytes(data))
+    return key_manager.encrypt(data, key)
 
 
 def decrypt(encrypted_data, key=None):
-    key = key or _get_encryption_key()
-    fernet = Fernet(str(key))
-    return fernet.decrypt(bytes(encrypted_data))
+    return key_manager.decrypt(encrypted_data, key)
+
+
+def encrypt_many(values, key=None):
+    return key_manager.encrypt_many(values, key)
+
+
+def decrypt_many(encrypted_values, key=None):
+    return key_manager.decrypt_many(encrypted_values, key)
 
 
-def _get_encryption_key():
+def _get_encryption_key(path=SECURITY_FILE_LOCATION):
     # We should have used config.instance.security_encryption_key to get the
     # key, but in snapshot restore the encryption key get updated in the
     # config file (rest-security.conf) but not in the memory. This is a temp
     # solution until we will have dynamic configuration mechanism
-    with open(SECURITY_FILE_LOCATION) as security_conf_file:
+    with open(path) as security_conf_file:
         rest_security_conf = json.load(security_conf_file)
         return rest_security_conf['encryption_key']
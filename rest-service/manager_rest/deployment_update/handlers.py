@@ -709,6 +709,7 @@ class DeploymentUpdateNodeInstanceHandler(UpdateHandler):
             # Getting node instance ID from deployment ID and node ID
             node_instance_id = self.sm.list(
                 models.NodeInstance,
+                include=['id'],
                 filters={'deployment_id': deployment_id,
                          'node_id': node_id}
             ).items[0].id
@@ -0,0 +1,106 @@
+#########
+# Copyright (c) 2018 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+import threading
+
+from flask import current_app
+from flask_security import current_user
+
+from manager_rest import utils
+from manager_rest.flask_utils import user_request_context
+from manager_rest.storage import db, models
+
+
+class QueuedExecutionsDispatcher(object):
+    """Start the queued executions in the background.
+
+    When an execution ends, the request that updates its status only asks
+    the dispatcher to start the queued executions of the tenant, and
+    returns. A thread per process then starts them, with the user that
+    ended the execution. The requests that arrive while the thread is busy
+    are handled together, with a single scheduling pass per tenant, so a
+    burst of ending executions drains the queue in batches.
+
+    The thread is only started on the first dispatch (so that it is started
+    after the rest-service workers are forked), and only when the database
+    is postgres. Otherwise (i.e. SQLite, in the tests), the database can't
+    be shared between threads, and the queued executions are started by
+    the request itself.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # tenant id -> id of the user to start the executions with
+        self._pending = {}
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def dispatch(self, resource_manager):
+        """Start the queued executions of the current tenant"""
+        if not self._start(resource_manager):
+            resource_manager.start_queued_executions()
+            return
+        with self._lock:
+            self._pending[utils.current_tenant.id] = current_user.id
+        self._wakeup.set()
+
+    @staticmethod
+    def _use_thread():
+        return db.engine.dialect.name == 'postgresql'
+
+    def _start(self, resource_manager):
+        with self._lock:
+            if self._thread is None:
+                if self._use_thread():
+                    self._thread = threading.Thread(
+                        target=self._run,
+                        args=(current_app._get_current_object(),
+                              resource_manager))
+                    self._thread.daemon = True
+                    self._thread.start()
+                else:
+                    self._thread = False
+            return bool(self._thread)
+
+    def _run(self, app, resource_manager):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            self._start_pending(app, resource_manager)
+
+    def _start_pending(self, app, resource_manager):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for tenant_id, user_id in pending.items():
+            try:
+                self._start_queued_executions(
+                    app, resource_manager, tenant_id, user_id)
+            except Exception:
+                app.logger.exception(
+                    'Failed starting the queued executions of tenant %s',
+                    tenant_id)
+
+    @staticmethod
+    def _start_queued_executions(app, resource_manager, tenant_id, user_id):
+        # The executions are started like in the request that ended the
+        # execution: as its user, in its tenant
+        with app.app_context():
+            user = models.User.query.get(user_id)
+            with user_request_context(app, user):
+                utils.set_current_tenant(models.Tenant.query.get(tenant_id))
+                resource_manager.start_queued_executions()
+
+
+dispatcher = QueuedExecutionsDispatcher()
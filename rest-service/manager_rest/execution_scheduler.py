@@ -0,0 +1,205 @@
+#########
+# Copyright (c) 2018 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+from functools import partial
+
+from flask import current_app
+
+from manager_rest import config, utils, workflow_executor
+from manager_rest.storage import db, models
+from manager_rest.storage.models_states import ExecutionState
+
+# How many executions are sent to the mgmtworker in a single AMQP batch
+DISPATCH_BATCH_SIZE = 100
+
+
+class _RunningExecutions(object):
+    """The executions that block the queued ones: the active executions
+    of the tenant, and the ones started by the current scheduling pass
+    """
+
+    def __init__(self, active, queued):
+        self.deployments = set()
+        self.system_wide = False
+        self.count = 0
+        for deployment_fk, _ in active:
+            self.add(deployment_fk)
+        # Workflows that modify the DB wait for all the `create_snapshot`
+        # executions, whether they're running or queued
+        self.snapshot_creation = any(
+            workflow_id == 'create_snapshot'
+            for workflow_id in [wf for _, wf in active] +
+            [e.workflow_id for e in queued])
+
+    @property
+    def any(self):
+        return self.count > 0
+
+    def add(self, deployment_fk):
+        self.count += 1
+        if deployment_fk is None:
+            self.system_wide = True
+        else:
+            self.deployments.add(deployment_fk)
+
+
+class ExecutionScheduler(object):
+    """Starts the queued executions that can currently run.
+
+    All the queued executions of the tenant are selected (and locked) in a
+    single query, and the executions that block them in another one. The
+    runnable executions are then picked in memory, in the order in which
+    they were queued, following the same rules as when starting an
+    execution directly:
+    * a deployment runs a single execution at a time
+    * deployment executions don't run while a system-wide execution runs
+    * system-wide executions only run when nothing else runs
+    * deployment executions don't run while the tenant has
+      `max_concurrent_executions` active executions (if it's set)
+    * to avoid starving system-wide executions, the executions queued after
+      one are left in the queue, until it runs
+
+    The selected executions are marked as pending in a single transaction,
+    and then sent to the mgmtworker in batches.
+    """
+
+    def __init__(self, resource_manager, batch_size=DISPATCH_BATCH_SIZE):
+        self._rm = resource_manager
+        self._sm = resource_manager.sm
+        self._batch_size = batch_size
+
+    def start_queued_executions(self):
+        """Start the runnable queued executions, and return them"""
+        queued = self._lock_queued_executions()
+        running = _RunningExecutions(self._get_active_executions(), queued)
+        runnable = []
+        for execution in queued:
+            if self._can_start(execution, running):
+                runnable.append(execution)
+                running.add(execution._deployment_fk)
+            if execution.is_system_workflow:
+                break
+        self._start(runnable)
+        return runnable
+
+    def _tenant_filter(self):
+        return models.Execution._tenant_id == utils.current_tenant.id
+
+    def _lock_queued_executions(self):
+        """Return the queued executions of the tenant, oldest first.
+
+        The rows are locked until the executions are started, and rows that
+        are already locked (by a concurrent scheduling pass) are skipped, so
+        an execution can't be started twice.
+        """
+        return (
+            models.Execution.query
+            .filter(models.Execution.status == ExecutionState.QUEUED)
+            .filter(self._tenant_filter())
+            .order_by(models.Execution.created_at,
+                      models.Execution._storage_id)
+            .with_for_update(skip_locked=True, of=models.Execution)
+            .all()
+        )
+
+    def _get_active_executions(self):
+        """Return the (deployment storage id, workflow id) of the active
+        executions of the tenant
+        """
+        return (
+            db.session.query(models.Execution._deployment_fk,
+                             models.Execution.workflow_id)
+            .filter(models.Execution.status.in_(ExecutionState.ACTIVE_STATES))
+            .filter(self._tenant_filter())
+            .all()
+        )
+
+    def _can_start(self, execution, running):
+        if running.snapshot_creation and \
+                self._rm._system_workflow_modifies_db(execution.workflow_id):
+            return False
+        if self._rm._should_use_system_workflow_executor(execution):
+            # Deployment environment workflows don't wait for the other
+            # executions of their deployment
+            return execution._deployment_fk is not None or not running.any
+        return not running.system_wide and \
+            execution._deployment_fk not in running.deployments and \
+            not self._at_capacity(running.count)
+
+    @staticmethod
+    def _at_capacity(active_count):
+        limit = config.instance.max_concurrent_executions
+        return bool(limit) and active_count >= limit
+
+    def available_slots(self):
+        """Return how many more deployment executions the tenant can run
+        at the moment, or None if their number isn't limited
+        """
+        limit = config.instance.max_concurrent_executions
+        if not limit:
+            return None
+        return max(limit - len(self._get_active_executions()), 0)
+
+    def _start(self, executions):
+        started_at = utils.get_formatted_timestamp()
+        tasks = []
+        for execution in executions:
+            execution.status = ExecutionState.PENDING
+            execution.started_at = started_at
+            tasks.append(self.prepare_task(execution))
+        # Committing also releases the locks of the executions that stay
+        # queued
+        self._sm.update_many(executions)
+        self.send_tasks(tasks)
+
+    def send_tasks(self, tasks):
+        """Call the tasks returned by `prepare_task`, sending them to the
+        mgmtworker in batches
+        """
+        current_app.logger.debug('Starting {0} executions'.format(len(tasks)))
+        for index in range(0, len(tasks), self._batch_size):
+            with workflow_executor.batched_tasks():
+                for task in tasks[index:index + self._batch_size]:
+                    task()
+
+    def prepare_task(self, execution, bypass_maintenance=None):
+        """Return a function that sends the execution to the mgmtworker.
+
+        Everything the task needs is loaded before the executions are
+        committed, so that it isn't reloaded per execution afterwards.
+        """
+        deployment = execution.deployment
+        parameters = dict(execution.parameters or {})
+        if self._rm._should_use_system_workflow_executor(execution):
+            return partial(
+                workflow_executor.execute_system_workflow,
+                wf_id=execution.workflow_id,
+                task_id=execution.id,
+                task_mapping=self._rm.task_mapping.get(execution.workflow_id),
+                deployment=deployment,
+                execution_parameters=parameters,
+                bypass_maintenance=bypass_maintenance,
+                is_system_workflow=execution.is_system_workflow)
+        return partial(
+            workflow_executor.execute_workflow,
+            execution.workflow_id,
+            deployment.workflows[execution.workflow_id],
+            workflow_plugins=deployment.blueprint.workflow_plugins,
+            blueprint_id=deployment.blueprint_id,
+            deployment_id=deployment.id,
+            execution_id=execution.id,
+            execution_parameters=parameters,
+            bypass_maintenance=bypass_maintenance,
+            dry_run=execution.is_dry_run)
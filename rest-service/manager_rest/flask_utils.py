@@ -14,10 +14,12 @@
 #  * limitations under the License.
 
 from collections import namedtuple
+from contextlib import contextmanager
 
 from flask import Flask
 from flask_migrate import Migrate
 from flask_security import Security
+from werkzeug.test import EnvironBuilder
 
 from manager_rest import config, utils
 from manager_rest.storage import user_datastore, db
@@ -133,3 +135,21 @@ def set_admin_current_user(app):
     # And then load the admin as the currently active user
     app.extensions['security'].login_manager.reload_user(admin)
     return admin
+
+
+@contextmanager
+def user_request_context(app, user):
+    """Act as the user, outside of a request (e.g. in a background thread).
+
+    Flask-Login keeps the current user on the request context, so a request
+    context without an actual request is pushed for it. Requires an app
+    context.
+    """
+    builder = EnvironBuilder()
+    try:
+        environ = builder.get_environ()
+    finally:
+        builder.close()
+    with app.request_context(environ):
+        app.extensions['security'].login_manager.reload_user(user)
+        yield
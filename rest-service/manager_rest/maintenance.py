@@ -15,7 +15,9 @@
 #
 
 import os
+import time
 import StringIO
+import threading
 import traceback
 
 from flask import jsonify, request
@@ -37,6 +39,8 @@ ALLOWED_ENDPOINTS = ['maintenance',
                      'status',
                      'version']
 LOCAL_ADDRESS = '127.0.0.1'
+# Seconds between checks of the maintenance mode status file
+STATE_REFRESH_INTERVAL = 1
 
 
 def get_maintenance_file_path():
@@ -45,6 +49,64 @@ def get_maintenance_file_path():
             MAINTENANCE_MODE_STATUS_FILE)
 
 
+class MaintenanceModeState(object):
+    """The contents of the maintenance mode status file, cached.
+
+    The status is checked before every request, so instead of reading the
+    file every time, it is only stat'ed once every `refresh_interval`
+    seconds, and only read again when it changed. Changes made by this
+    process are seen right away, and changes made by other processes (the
+    other workers of the rest-service) after up to `refresh_interval`.
+    """
+
+    def __init__(self, refresh_interval):
+        self._refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._path = None
+        self._file_stat = None
+        self._checked_at = 0
+        self._state = None
+
+    def get(self, refresh=False):
+        """The maintenance mode state, or None when it's deactivated
+
+        :param refresh: Check the status file even if it was checked less
+                        than `refresh_interval` seconds ago
+        """
+        path = get_maintenance_file_path()
+        now = time.time()
+        with self._lock:
+            if refresh or path != self._path or \
+                    now - self._checked_at >= self._refresh_interval:
+                self._refresh(path)
+                self._checked_at = now
+            return dict(self._state) if self._state else None
+
+    def set(self, state):
+        """Write the state to the status file (or remove it, if None)"""
+        path = get_maintenance_file_path()
+        with self._lock:
+            if state:
+                utils.mkdirs(config.instance.maintenance_folder)
+                utils.write_dict_to_json_file(path, state)
+            elif os.path.isfile(path):
+                os.remove(path)
+            # read it back on the next check
+            self._path = None
+
+    def _refresh(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            file_stat = None
+        else:
+            file_stat = (stat.st_ino, stat.st_mtime, stat.st_size)
+        if path != self._path or file_stat != self._file_stat:
+            self._state = utils.read_json_file(path) if file_stat else None
+            self._path = path
+            self._file_stat = file_stat
+
+
 def prepare_maintenance_dict(status,
                              activated_at='',
                              remaining_executions=None,
@@ -72,12 +134,9 @@ def maintenance_mode_handler():
     # Removing v*/ from the endpoint
     index = request.endpoint.find('/')
     request_endpoint = request.endpoint[index+1:]
-    maintenance_file = os.path.join(
-            config.instance.maintenance_folder,
-            MAINTENANCE_MODE_STATUS_FILE)
 
-    if os.path.isfile(maintenance_file):
-        state = utils.read_json_file(maintenance_file)
+    state = maintenance_state.get()
+    if state:
         if state['status'] == MAINTENANCE_MODE_ACTIVATING:
             running_executions = get_running_executions()
             if not running_executions:
@@ -89,7 +148,7 @@ def maintenance_mode_handler():
                         requested_by=state['requested_by'],
                         activation_requested_at=state[
                             'activation_requested_at'])
-                utils.write_dict_to_json_file(maintenance_file, state)
+                maintenance_state.set(state)
             else:
                 return _handle_activating_mode(
                        state=state,
@@ -102,6 +161,9 @@ def maintenance_mode_handler():
             return _maintenance_mode_error()
 
 
+maintenance_state = MaintenanceModeState(STATE_REFRESH_INTERVAL)
+
+
 def _handle_activating_mode(state, request_endpoint):
     status = state['status']
 
@@ -480,3 +480,11 @@ class DeploymentPluginNotFound(ManagerException):
 class TenantNotProvided(ForbiddenError):
     def __init__(self, *args, **kwargs):
         super(TenantNotProvided, self).__init__(*args, **kwargs)
+
+
+class AMQPPublishError(ManagerException):
+    AMQP_PUBLISH_ERROR_CODE = 'amqp_publish_error'
+
+    def __init__(self, *args, **kwargs):
+        super(AMQPPublishError, self).__init__(
+            503, AMQPPublishError.AMQP_PUBLISH_ERROR_CODE, *args, **kwargs)
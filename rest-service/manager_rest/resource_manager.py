@@ -19,6 +19,7 @@ import yaml
 import shutil
 import itertools
 from copy import deepcopy
+from collections import OrderedDict
 from StringIO import StringIO
 
 from flask import current_app
@@ -30,7 +31,11 @@ from dsl_parser import exceptions as parser_exceptions
 from manager_rest import premium_enabled
 from manager_rest.constants import DEFAULT_TENANT_NAME
 from manager_rest.dsl_functions import get_secret_method
-from manager_rest.utils import is_create_global_permitted, send_event
+from manager_rest.execution_scheduler import ExecutionScheduler
+from manager_rest.execution_dispatcher import dispatcher
+from manager_rest.utils import (is_create_global_permitted,
+                                send_event,
+                                send_events)
 from manager_rest.storage import (get_storage_manager,
                                   models,
                                   get_node,
@@ -89,26 +94,13 @@ class ResourceManager(object):
 
         res = self.sm.update(execution)
         if status in ExecutionState.END_STATES:
-            self.start_queued_executions()
+            # The queued executions are started in the background, and
+            # the status update doesn't wait for them
+            dispatcher.dispatch(self)
         return res
 
     def start_queued_executions(self):
-        queued_executions = self._get_queued_executions()
-
-        for e in queued_executions:
-            self.execute_queued_workflow(e)
-            if e.is_system_workflow:  # To avoid starvation of system workflows
-                break
-
-    def _get_queued_executions(self):
-        filters = {'status': ExecutionState.QUEUED_STATE}
-
-        queued_executions = self.list_executions(
-            is_include_system_workflows=True,
-            filters=filters,
-            sort={'created_at': 'asc'}).items
-
-        return queued_executions
+        return ExecutionScheduler(self).start_queued_executions()
 
     def _validate_execution_update(self, current_status, future_status):
         if current_status in ExecutionState.END_STATES:
@@ -375,7 +367,8 @@ class ResourceManager(object):
             created_at=now,
             updated_at=now,
             main_file_name=application_file_name,
-            visibility=visibility
+            visibility=visibility,
+            _workflow_plugins=plan[constants.WORKFLOW_PLUGINS_TO_INSTALL]
         )
         return self.sm.put(new_blueprint)
 
@@ -408,6 +401,7 @@ class ResourceManager(object):
         )
         executions = self.sm.list(
             models.Execution,
+            include=['id', 'status'],
             filters=deplyment_id_filter
         )
 
@@ -425,6 +419,7 @@ class ResourceManager(object):
                 deployment_id=deployment_id)
             node_instances = self.sm.list(
                 models.NodeInstance,
+                include=['id', 'state'],
                 filters=deplyment_id_filter
             )
             # validate either all nodes for this deployment are still
@@ -461,8 +456,10 @@ class ResourceManager(object):
                          queue=False,
                          execution=None):
 
-        deployment = self.sm.get(models.Deployment, deployment_id)
-        blueprint = self.sm.get(models.Blueprint, deployment.blueprint_id)
+        # Only the workflows of the deployment are needed, and not the rest
+        # of its large columns (e.g. inputs and outputs)
+        deployment = self.sm.get(models.Deployment, deployment_id,
+                                 heavy_columns=['workflows'])
         self._verify_workflow_in_deployment(workflow_id, deployment,
                                             deployment_id)
         workflow = deployment.workflows[workflow_id]
@@ -506,8 +503,7 @@ class ResourceManager(object):
             return new_execution
 
         # executing the user workflow
-        workflow_plugins = blueprint.plan[
-            constants.WORKFLOW_PLUGINS_TO_INSTALL]
+        workflow_plugins = deployment.blueprint.workflow_plugins
         new_execution.status = ExecutionState.PENDING
         new_execution.started_at = utils.get_formatted_timestamp()
         self.sm.put(new_execution)
@@ -524,6 +520,137 @@ class ResourceManager(object):
 
         return new_execution
 
+    def execute_workflows(self,
+                          deployment_ids,
+                          workflow_id,
+                          parameters=None,
+                          allow_custom_parameters=False,
+                          force=False,
+                          bypass_maintenance=None,
+                          dry_run=False,
+                          queue=False):
+        """Start the workflow on many deployments at once
+
+        The deployments, their environments and their active executions are
+        validated with a query each (and not a few queries per deployment),
+        and if the workflow can't be started (or queued) on any of them,
+        none of the executions is created. The executions are created in a
+        single transaction, and the ones that can run are then sent to the
+        mgmtworker in batches.
+
+        Executions that can't run yet - because of the other executions of
+        their deployment, a system-wide execution, or the
+        `max_concurrent_executions` limit - are queued if `queue` is set.
+        """
+        deployment_ids = list(OrderedDict.fromkeys(deployment_ids))
+        if len(deployment_ids) > config.instance.max_results:
+            raise manager_exceptions.BadParametersError(
+                'Cannot start more than {0} executions at once'.format(
+                    config.instance.max_results))
+        deployments = self._get_deployments_for_execution(deployment_ids)
+        for deployment in deployments:
+            self._verify_workflow_in_deployment(workflow_id, deployment,
+                                                deployment.id)
+        self._verify_deployment_environments_created_successfully(
+            deployment_ids)
+
+        system_exec_running = self._check_for_active_system_wide_execution(
+            queue, None)
+        busy_deployments = set() if force else \
+            self._get_busy_deployments(deployment_ids, queue)
+        scheduler = ExecutionScheduler(self)
+        available_slots = scheduler.available_slots()
+
+        # Everything is validated before any execution is created
+        to_execute = []
+        started_count = 0
+        for deployment in deployments:
+            execution_parameters = self._get_only_user_execution_parameters(
+                self._merge_and_validate_execution_parameters(
+                    deployment.workflows[workflow_id], workflow_id,
+                    dict(parameters or {}), allow_custom_parameters))
+            should_queue = system_exec_running or \
+                deployment.id in busy_deployments or \
+                available_slots is not None and \
+                started_count >= available_slots
+            if should_queue and not queue:
+                raise manager_exceptions.ExistingRunningExecutionError(
+                    'Cannot start more than {0} executions at the moment. '
+                    'To queue the other executions, pass "queue=true" as a '
+                    'parameter to this request'.format(available_slots))
+            if not should_queue:
+                started_count += 1
+            to_execute.append((deployment, execution_parameters, should_queue))
+
+        now = utils.get_formatted_timestamp()
+        executions = []
+        started = []
+        queued = []
+        for deployment, execution_parameters, should_queue in to_execute:
+            execution = models.Execution(
+                id=str(uuid.uuid4()),
+                status=self._get_proper_status(should_queue),
+                created_at=now,
+                workflow_id=workflow_id,
+                error='',
+                parameters=execution_parameters,
+                is_system_workflow=False,
+                is_dry_run=dry_run
+            )
+            execution.set_deployment(deployment)
+            if should_queue:
+                queued.append(execution)
+            else:
+                execution.started_at = now
+                started.append(execution)
+            executions.append(execution)
+
+        tasks = [scheduler.prepare_task(e, bypass_maintenance)
+                 for e in started]
+        self.sm.put_many(executions)
+        scheduler.send_tasks(tasks)
+        if queued:
+            send_events([self._workflow_queued_event(e) for e in queued],
+                        'hook')
+        return executions
+
+    def _get_deployments_for_execution(self, deployment_ids):
+        """Return the deployments, in the order of their ids, with only
+        their workflows loaded out of their large columns
+        """
+        deployments = self.sm.list(
+            models.Deployment,
+            filters={'id': deployment_ids},
+            get_all_results=True,
+            heavy_columns=['workflows'])
+        deployments = {d.id: d for d in deployments}
+        missing = [d for d in deployment_ids if d not in deployments]
+        if missing:
+            raise manager_exceptions.NotFoundError(
+                'Requested `Deployment` with ID `{0}` was not found'
+                .format(', '.join(missing)))
+        return [deployments[d] for d in deployment_ids]
+
+    def _get_busy_deployments(self, deployment_ids, queue):
+        """Return the ids of the deployments that have active executions.
+
+        If `queue` isn't set, having such deployments is an error.
+        """
+        executions = self.list_executions(
+            include=['id', 'deployment_id'],
+            filters={'deployment_id': deployment_ids,
+                     'status': ExecutionState.ACTIVE_STATES},
+            is_include_system_workflows=True,
+            get_all_results=True).items
+        if executions and not queue:
+            raise manager_exceptions.ExistingRunningExecutionError(
+                'The following executions are currently running: {0}. To '
+                'execute this workflow anyway, pass "force=true" as a '
+                'parameter to this request'.format(
+                    ', '.join('{0} (deployment {1})'.format(
+                        e.id, e.deployment_id) for e in executions)))
+        return set(e.deployment_id for e in executions)
+
     @staticmethod
     def _should_use_system_workflow_executor(execution):
         """
@@ -541,41 +668,6 @@ class ResourceManager(object):
             return True
         return False
 
-    def execute_queued_workflow(self, execution):
-        """
-        Whenever an execution is about to change to END status this function
-        is called. Since the execution exists in the DB (it was created and
-        then queued), we extract the needed information and re-run it with the
-        correct workflow executor.
-        :param execution: an execution DB object
-        :return:
-        """
-        deployment = execution.deployment
-        deployment_id = None
-        if deployment:
-            deployment_id = deployment.id
-        workflow_id = execution.workflow_id
-        execution_parameters = execution.parameters
-        task_mapping = self.task_mapping.get(workflow_id)
-
-        if self._should_use_system_workflow_executor(execution):
-            # Use `execute_system_workflow`
-            self._execute_system_workflow(
-                workflow_id, task_mapping, deployment=deployment,
-                execution_parameters=execution_parameters, timeout=0,
-                created_at=None, verify_no_executions=True,
-                bypass_maintenance=None, update_execution_status=True,
-                queue=True, execution=execution
-            )
-
-        else:  # Use `execute_workflow`
-            self.execute_workflow(
-                deployment_id, workflow_id, parameters=execution_parameters,
-                allow_custom_parameters=False, force=False,
-                bypass_maintenance=None, dry_run=False, queue=True,
-                execution=execution
-            )
-
     @staticmethod
     def _get_proper_status(should_queue):
         return ExecutionState.QUEUED if should_queue else\
@@ -870,9 +962,23 @@ class ResourceManager(object):
     def _prepare_deployment_node_instances_for_storage(self,
                                                        deployment_id,
                                                        dsl_node_instances):
+        # Fetch the nodes of all the instances at once, rather than one by
+        # one for each instance
+        nodes = {}
+        node_ids = list(set(node_instance['node_id']
+                            for node_instance in dsl_node_instances))
+        if node_ids:
+            nodes = {
+                node.id: node for node in self.sm.list(
+                    models.Node,
+                    filters={'deployment_id': deployment_id, 'id': node_ids},
+                    get_all_results=True)
+            }
         node_instances = []
         for node_instance in dsl_node_instances:
-            node = get_node(deployment_id, node_instance['node_id'])
+            node = nodes.get(node_instance['node_id'])
+            if node is None:
+                node = get_node(deployment_id, node_instance['node_id'])
             instance_id = node_instance['id']
             scaling_groups = node_instance.get('scaling_groups', [])
             relationships = node_instance.get('relationships', [])
@@ -900,7 +1006,7 @@ class ResourceManager(object):
 
         for node in nodes:
             node.set_deployment(deployment)
-            self.sm.put(node)
+        self.sm.put_many(nodes)
 
     def _create_deployment_node_instances(self,
                                           deployment_id,
@@ -909,8 +1015,7 @@ class ResourceManager(object):
             deployment_id,
             dsl_node_instances)
 
-        for node_instance in node_instances:
-            self.sm.put(node_instance)
+        self.sm.put_many(node_instances)
 
     def assert_no_snapshot_creation_running_or_queued(self):
         """
@@ -1473,10 +1578,32 @@ class ResourceManager(object):
             workflow_id='create_deployment_environment')
         env_creation = next(
             (execution for execution in
-             self.sm.list(models.Execution, filters=deployment_id_filter)
+             self.sm.list(models.Execution,
+                          include=['workflow_id', 'status', 'error'],
+                          filters=deployment_id_filter)
              if execution.workflow_id == 'create_deployment_environment'),
             None)
 
+        self._verify_environment_creation_status(deployment_id, env_creation)
+
+    def _verify_deployment_environments_created_successfully(
+            self, deployment_ids):
+        """Like `_verify_deployment_environment_created_successfully`, for
+        many deployments at once
+        """
+        env_creations = self.sm.list(
+            models.Execution,
+            include=['deployment_id', 'status', 'error'],
+            filters={'deployment_id': deployment_ids,
+                     'workflow_id': 'create_deployment_environment'},
+            get_all_results=True)
+        env_creations = {e.deployment_id: e for e in env_creations}
+        for deployment_id in deployment_ids:
+            self._verify_environment_creation_status(
+                deployment_id, env_creations.get(deployment_id))
+
+    @staticmethod
+    def _verify_environment_creation_status(deployment_id, env_creation):
         if not env_creation:
             raise RuntimeError('Failed to find "create_deployment_environment"'
                                ' execution for deployment {0}'.format(
@@ -1575,11 +1702,11 @@ class ResourceManager(object):
                 deployment_id=deployment_id,
                 status=ExecutionState.ACTIVE_STATES)
             executions = self.list_executions(
+                include=['id', 'status'],
                 filters=deployment_id_filter,
                 is_include_system_workflows=include_system).items
-            return [e.id for e in executions if
-                    self.sm.get(models.Execution, e.id).status
-                    not in ExecutionState.END_STATES]
+            return [e.id for e in executions
+                    if e.status not in ExecutionState.END_STATES]
 
         should_queue = False
 
@@ -1733,6 +1860,10 @@ class ResourceManager(object):
                    ExecutionState.END_STATES for execution in executions)
 
     def _workflow_queued(self, execution):
+        send_event(self._workflow_queued_event(execution), 'hook')
+
+    @staticmethod
+    def _workflow_queued_event(execution):
         message_context = {
             'message_type': 'hook',
             'is_system_workflow': execution.is_system_workflow,
@@ -1757,8 +1888,7 @@ class ResourceManager(object):
                 'arguments': None
             }
         }
-
-        send_event(event, 'hook')
+        return event
 
 
 # What we need to access this manager in Flask
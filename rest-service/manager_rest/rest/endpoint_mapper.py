@@ -37,6 +37,7 @@ def setup_resources(api):
         'SnapshotsIdRestore': 'snapshots/<string:snapshot_id>/restore',
         'Executions': 'executions',
         'ExecutionsId': 'executions/<string:execution_id>',
+        'BulkExecutions': 'bulk-executions',
         'Deployments': 'deployments',
         'DeploymentsId': 'deployments/<string:deployment_id>',
         'DeploymentsIdOutputs': 'deployments/<string:deployment_id>/outputs',
@@ -95,7 +96,8 @@ def setup_resources(api):
         'SecretsSetGlobal': 'secrets/<string:key>/set-global',
         'SecretsSetVisibility': 'secrets/<string:key>/set-visibility',
         'ManagerConfig': 'config',
-        'Agents': 'agents'
+        'Agents': 'agents',
+        'EventsTail': 'events/tail'
     }
 
     # Set version endpoint as a non versioned endpoint
@@ -14,13 +14,20 @@
 #  * limitations under the License.
 #
 
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from dateutil import parser as date_parser
 from flask_restful_swagger import swagger
 from sqlalchemy import (
+    and_,
     asc,
     bindparam,
     desc,
     func,
     literal_column,
+    or_,
+    type_coerce,
 )
 from toolz import dicttoolz
 
@@ -204,7 +211,92 @@ class Events(SecuredResource):
         return query
 
     @staticmethod
-    def _build_select_query(filters, sort, range_filters, tenant_id):
+    def _encode_cursor(sql_event):
+        """Encode the position of an event in the results as a cursor.
+
+        :param sql_event: Event data returned when SQL query was executed
+        :type sql_event: :class:`sqlalchemy.util._collections.result`
+        :returns: An opaque cursor pointing right after the event
+        :rtype: str
+
+        """
+        position = [
+            sql_event._timestamp.isoformat(),
+            sql_event._storage_id,
+            sql_event.type,
+        ]
+        return urlsafe_b64encode(json.dumps(position))
+
+    @staticmethod
+    def _decode_cursor(cursor):
+        """Decode a cursor created by :meth:`_encode_cursor`.
+
+        :param cursor: Cursor passed as a request argument
+        :type cursor: str
+        :returns:
+            A (timestamp, storage id, type) tuple, or None for an empty
+            cursor, which points to the beginning of the results
+        :rtype: tuple
+
+        """
+        if not cursor:
+            return None
+        try:
+            timestamp, storage_id, event_type = json.loads(
+                urlsafe_b64decode(str(cursor)))
+            return date_parser.parse(timestamp), int(storage_id), event_type
+        except (TypeError, ValueError):
+            raise manager_exceptions.BadParametersError(
+                'Invalid cursor: {0}'.format(cursor))
+
+    @staticmethod
+    def _apply_cursor(query, model, cursor, order):
+        """Filter out the events up to (and including) the cursor position.
+
+        Events are ordered by timestamp, type and storage id, so the
+        comparison with the cursor depends on the type of the model.
+
+        :param query: Query in which the filtering should be applied
+        :type query: :class:`sqlalchemy.orm.query.Query`
+        :param model: Model to use to apply the filtering
+        :type model:
+            :class:`manager_rest.storage.resource_models.Event`
+            :class:`manager_rest.storage.resource_models.Log`
+        :param cursor: Decoded cursor, see :meth:`_decode_cursor`
+        :type cursor: tuple
+        :param order: Either `asc` or `desc`
+        :type order: str
+        :returns: Query with filtering applied
+        :rtype: :class:`sqlalchemy.orm.query.Query`
+
+        """
+        timestamp, storage_id, event_type = cursor
+        model_type = 'cloudify_{0}'.format(model.__name__.lower())
+        if order == 'desc':
+            after = (lambda left, right: left < right)
+            after_type = model_type < event_type
+        else:
+            after = (lambda left, right: left > right)
+            after_type = model_type > event_type
+
+        if model_type == event_type:
+            condition = or_(
+                after(model.timestamp, timestamp),
+                and_(model.timestamp == timestamp,
+                     after(model._storage_id, storage_id)),
+            )
+        elif after_type:
+            condition = or_(
+                after(model.timestamp, timestamp),
+                model.timestamp == timestamp,
+            )
+        else:
+            condition = after(model.timestamp, timestamp)
+        return query.filter(condition)
+
+    @staticmethod
+    def _build_select_query(filters, sort, range_filters, tenant_id,
+                            cursor=None):
         """Build query used to list events for a given execution.
 
         :param filters:
@@ -236,6 +328,10 @@ class Events(SecuredResource):
             `@` inherited from the old Elasticsearch implementation):
                 {'timestamp': {'from': <iso8601-date>, 'to': <iso8601-date>}}
         :type range_filters: dict(str, str)
+        :param cursor:
+            Return only the events that come after the cursor position.
+            When a cursor is used, the results must be sorted by timestamp.
+        :type cursor: tuple
         :returns:
             A SQL query that returns the events found that match the conditions
             passed as arguments.
@@ -245,17 +341,18 @@ class Events(SecuredResource):
         assert isinstance(filters, dict), \
             'Filters is expected to be a dictionary'
 
+        order = sort.values()[-1] if sort else 'asc'
         subqueries = []
         if (('type' not in filters or 'cloudify_event' in filters['type']) and
                 ('level' not in filters)):
             events_query = Events._build_select_subquery(
-                Event, filters, range_filters, tenant_id)
+                Event, filters, range_filters, tenant_id, cursor, order)
             subqueries.append(events_query)
 
         if (('type' not in filters or 'cloudify_log' in filters['type']) and
                 ('event_type' not in filters)):
             logs_query = Events._build_select_subquery(
-                Log, filters, range_filters, tenant_id)
+                Log, filters, range_filters, tenant_id, cursor, order)
             subqueries.append(logs_query)
 
         if subqueries:
@@ -264,6 +361,12 @@ class Events(SecuredResource):
                 subqueries,
             )
             query = Events._apply_sort(query, sort)
+            if sort:
+                # Break timestamp ties, so that the order is deterministic
+                # and cursors point to a well defined position
+                order_func = asc if order == 'asc' else desc
+                query = query.order_by(
+                    order_func('type'), order_func('_storage_id'))
             query = (
                 query
                 .limit(bindparam('limit'))
@@ -280,7 +383,8 @@ class Events(SecuredResource):
         return query
 
     @staticmethod
-    def _build_select_subquery(model, filters, range_filters, tenant_id):
+    def _build_select_subquery(model, filters, range_filters, tenant_id,
+                               cursor=None, order='asc'):
         """Build select subquery.
 
         :param model: Model used to build the query (either Event or Log)
@@ -291,6 +395,10 @@ class Events(SecuredResource):
         :type filters: dict(str, list(str))
         :param range_filters: Range filtres passed as request argument
         :type range_filters: dict(str, dict(str))
+        :param cursor: Decoded cursor, see :meth:`_decode_cursor`
+        :type cursor: tuple
+        :param order: Timestamp sorting order (either `asc` or `desc`)
+        :type order: str
         :returns: Select events query
         :rtype: :class:`sqlalchemy.orm.query.Query`
 
@@ -332,20 +440,24 @@ class Events(SecuredResource):
                 select_column('level'),
                 literal_column("'cloudify_{}'".format(model.__name__.lower()))
                 .label('type'),
+                model._storage_id.label('_storage_id'),
+                type_coerce(model.timestamp, db.DateTime).label('_timestamp'),
             )
             .filter(model._tenant_id == tenant_id)
 
-            .outerjoin(NodeInstance, NodeInstance.id == model.node_id)
+            .outerjoin(NodeInstance,
+                       NodeInstance._storage_id == model._node_instance_fk)
             .outerjoin(Node, Node._storage_id == NodeInstance._node_fk)
             .outerjoin(Execution, Execution._storage_id == model._execution_fk)
             .outerjoin(Deployment,
-                       Deployment._storage_id == Execution._deployment_fk)
-            .outerjoin(
-                Blueprint, Blueprint._storage_id == Deployment._blueprint_fk)
+                       Deployment._storage_id == model._deployment_fk)
+            .outerjoin(Blueprint, Blueprint._storage_id == model._blueprint_fk)
         )
 
         query = Events._apply_filters(query, model, filters)
         query = Events._apply_range_filters(query, model, range_filters)
+        if cursor is not None:
+            query = Events._apply_cursor(query, model, cursor, order)
         return query
 
     @staticmethod
@@ -424,12 +536,12 @@ class Events(SecuredResource):
         """
         query = (
             db.session.query(func.count('*').label('count'))
-            .filter(
-                model._execution_fk == Execution._storage_id,
-                Execution._deployment_fk == Deployment._storage_id,
-                Deployment._blueprint_fk == Blueprint._storage_id,
-                model._tenant_id == tenant_id
-            )
+            .select_from(model)
+            .filter(model._tenant_id == tenant_id)
+            .outerjoin(Execution, Execution._storage_id == model._execution_fk)
+            .outerjoin(Deployment,
+                       Deployment._storage_id == model._deployment_fk)
+            .outerjoin(Blueprint, Blueprint._storage_id == model._blueprint_fk)
         )
 
         query = Events._apply_filters(query, model, filters)
@@ -462,6 +574,10 @@ class Events(SecuredResource):
         event['@timestamp'] = event['timestamp']
         del event['reported_timestamp']
 
+        for cursor_field in ['_storage_id', '_timestamp']:
+            if cursor_field in event:
+                del event[cursor_field]
+
         event['message'] = {
             'text': event['message']
         }
@@ -14,6 +14,7 @@
 #  * limitations under the License.
 #
 
+from flask import request
 from flask_restful_swagger import swagger
 from sqlalchemy import bindparam
 
@@ -22,6 +23,7 @@ from manager_rest.rest import (
     resources_v1,
     rest_decorators,
 )
+from manager_rest.rest.rest_utils import verify_and_convert_bool
 from manager_rest.storage.models_base import db
 from manager_rest.storage.resource_models import (
     Deployment,
@@ -77,6 +79,13 @@ class Events(resources_v1.Events):
             Parameters used to limit results returned in a single query.
             Expected values `size` and `offset` are mapped into SQL as `LIMIT`
             and `OFFSET`.
+
+            Alternatively, the `_cursor` request argument can be used instead
+            of `offset`, to get the results that come after the position
+            returned as the `cursor` of the previous page (an empty cursor
+            stands for the first page). The cost of a page doesn't depend on
+            its position then, and the total count is only calculated if the
+            `_include_count` request argument is true.
         :type pagination: dict(str, int)
         :param sort:
             Result sorting order. The only allowed and expected value is to
@@ -95,21 +104,35 @@ class Events(resources_v1.Events):
         """
         size = pagination.get('size', self.DEFAULT_SEARCH_SIZE)
         offset = pagination.get('offset', 0)
+        use_cursor = '_cursor' in request.args
+        cursor = None
+        if use_cursor:
+            cursor = self._decode_cursor(request.args['_cursor'])
+            sort = self._get_cursor_sort(sort)
+            offset = 0
+        include_count = verify_and_convert_bool(
+            '_include_count',
+            request.args.get('_include_count', not use_cursor)
+        )
         params = {
             'limit': size,
             'offset': offset,
         }
 
-        count_query = self._build_count_query(filters, range_filters,
-                                              self.current_tenant.id)
-        total = count_query.params(**params).scalar()
+        total = None
+        if include_count:
+            count_query = self._build_count_query(filters, range_filters,
+                                                  self.current_tenant.id)
+            total = count_query.params(**params).scalar()
 
         select_query = self._build_select_query(filters, sort, range_filters,
-                                                self.current_tenant.id)
+                                                self.current_tenant.id,
+                                                cursor)
 
+        events = select_query.params(**params).all()
         results = [
             self._map_event_to_dict(_include, event)
-            for event in select_query.params(**params).all()
+            for event in events
         ]
 
         metadata = {
@@ -119,8 +142,34 @@ class Events(resources_v1.Events):
                 'total': total,
             }
         }
+        if use_cursor:
+            # When there are no new events, keep pointing to the same
+            # position, so that the events can be tailed
+            metadata['pagination']['cursor'] = (
+                self._encode_cursor(events[-1]) if events
+                else request.args['_cursor']
+            )
         return ListResult(results, metadata)
 
+    @staticmethod
+    def _get_cursor_sort(sort):
+        """Validate the sorting criteria used with a cursor.
+
+        Cursors point to a position in the results sorted by timestamp, so
+        no other sorting criteria is allowed.
+
+        :param sort: Sorting criteria passed as a request argument
+        :type sort: dict(str, str)
+        :returns: Sorting criteria by timestamp (ascending by default)
+        :rtype: dict(str, str)
+
+        """
+        fields = [field.lstrip('@') for field in sort]
+        if fields and fields != ['timestamp']:
+            raise manager_exceptions.BadParametersError(
+                'Only sorting by timestamp is allowed when using a cursor')
+        return {'timestamp': sort.values()[0] if sort else 'asc'}
+
     @rest_decorators.exceptions_handled
     def post(self):
         raise manager_exceptions.MethodNotAllowedError()
@@ -29,6 +29,10 @@ from manager_rest.storage import (
 from manager_rest.security.authorization import authorize
 from manager_rest.utils import create_filter_params_list_description
 
+# Node instances might have large runtime properties, so long lists of them
+# are streamed
+STREAM_THRESHOLD = 1000
+
 
 class Nodes(resources_v1.Nodes):
     @swagger.operation(
@@ -84,7 +88,8 @@ class NodeInstances(resources_v1.NodeInstances):
     )
     @rest_decorators.exceptions_handled
     @authorize('node_instance_list', allow_all_tenants=True)
-    @rest_decorators.marshal_with(models.NodeInstance)
+    @rest_decorators.marshal_with(models.NodeInstance,
+                                  stream_threshold=STREAM_THRESHOLD)
     @rest_decorators.create_filters(models.NodeInstance)
     @rest_decorators.paginate
     @rest_decorators.sortable(models.NodeInstance)
@@ -26,7 +26,8 @@ class Events(v2_Events):
 
     """
 
-    UNUSED_FIELDS = ['id', 'node_id', 'message_code']
+    UNUSED_FIELDS = ['id', 'node_id', 'message_code', '_storage_id',
+                     '_timestamp']
 
     @staticmethod
     def _map_event_to_dict(_include, sql_event):
@@ -14,7 +14,8 @@
 #  * limitations under the License.
 
 from flask import request
-from flask import current_app
+from flask import current_app, Response
+from flask_restful import Resource
 
 from manager_rest import config, premium_enabled, utils
 from manager_rest.security import SecuredResource
@@ -31,18 +32,38 @@ from manager_rest.constants import (FILE_SERVER_BLUEPRINTS_FOLDER,
                                     FILE_SERVER_TENANT_RESOURCES_FOLDER)
 
 from .. import rest_decorators, rest_utils
-from ...security.authentication import authenticator
-from ..responses_v3 import BaseResponse, ResourceID
+from ...security.authentication import authenticator, VerificationCache
+from ..responses_v3 import BaseResponse
 
 try:
     from cloudify_premium import LdapResponse
 except ImportError:
     LdapResponse = BaseResponse
 
+FILE_SERVER_AUTH_CACHE_SIZE = 1000
+FILE_SERVER_AUTH_CACHE_TTL = 10  # seconds
+# The request headers that the user can be authenticated by
+FILE_SERVER_AUTH_HEADERS = [
+    utils.CLOUDIFY_AUTH_HEADER,
+    utils.CLOUDIFY_AUTH_TOKEN_HEADER,
+    utils.CLOUDIFY_API_AUTH_TOKEN_HEADER,
+]
+
+
+class FileServerAuth(Resource):
+    """Authorize the requests to the file server.
+
+    nginx sends a request here for every file downloaded from the file
+    server, which during large installations means a request for every
+    plugin and script downloaded by every agent. Allowed decisions are
+    cached for a short while, keyed by the credentials in the request and
+    the resource that the file belongs to (e.g. the blueprint), so that
+    the following downloads of the same resource don't need to be
+    authenticated and authorized again.
+    """
 
-class FileServerAuth(SecuredResource):
     @staticmethod
-    def _verify_tenant(uri):
+    def _get_tenanted_resource(uri):
         tenanted_resources = [
             FILE_SERVER_BLUEPRINTS_FOLDER,
             FILE_SERVER_UPLOADED_BLUEPRINTS_FOLDER,
@@ -50,34 +71,38 @@ class FileServerAuth(SecuredResource):
             FILE_SERVER_TENANT_RESOURCES_FOLDER
         ]
         tenanted_resources = [r.strip('/') for r in tenanted_resources]
-        uri = uri.strip('/')
+        for resource in tenanted_resources:
+            if uri.startswith(resource):
+                return resource
+        return None
 
+    @staticmethod
+    def _verify_tenant(uri):
         # verifying that the only tenant that can be accessed is the one in
         # the header
-        for resource in tenanted_resources:
-            if uri.startswith(resource):
-                # Example of uri: 'blueprints/default_tenant/blueprint_1/
-                # scripts/configure.sh'
-                _, uri_tenant = uri.split('/', 2)[:2]
-                authenticator.authenticate(request)
-
-                # if it's global blueprint - no need or tenant verification
-                # first load requested tenant to config then check if global
-                tenant = get_storage_manager().get(
-                    models.Tenant,
-                    uri_tenant,
-                    filters={'name': uri_tenant}
-                )
-                utils.set_current_tenant(tenant)
-                if FileServerAuth._is_global_blueprint(uri):
-                    return
-
-                @authorize('file_server_auth', uri_tenant)
-                def _authorize():
-                    pass
-
-                _authorize()
-                return
+        if not FileServerAuth._get_tenanted_resource(uri):
+            return
+
+        # Example of uri: 'blueprints/default_tenant/blueprint_1/
+        # scripts/configure.sh'
+        _, uri_tenant = uri.split('/', 2)[:2]
+
+        # if it's global blueprint - no need or tenant verification
+        # first load requested tenant to config then check if global
+        tenant = get_storage_manager().get(
+            models.Tenant,
+            uri_tenant,
+            filters={'name': uri_tenant}
+        )
+        utils.set_current_tenant(tenant)
+        if FileServerAuth._is_global_blueprint(uri):
+            return
+
+        @authorize('file_server_auth', uri_tenant)
+        def _authorize():
+            pass
+
+        _authorize()
 
     @staticmethod
     def _is_global_blueprint(uri):
@@ -96,19 +121,58 @@ class FileServerAuth(SecuredResource):
             return False
         return blueprint.visibility == VisibilityState.GLOBAL
 
+    @staticmethod
+    def _get_cache_key(uri):
+        """The credentials, and the resource that the file belongs to.
+
+        All the files of a resource (e.g. the scripts of a blueprint, or
+        the resources of a tenant) get the same decision, so only the
+        resource is a part of the key, and not the whole uri.
+        """
+        if FileServerAuth._get_tenanted_resource(uri):
+            # e.g. 'blueprints/default_tenant/blueprint_1'
+            resource = '/'.join(uri.split('/')[:3])
+        else:
+            # the files that don't belong to a tenant only need the request
+            # to be authenticated
+            resource = ''
+        headers = [request.headers.get(header) or ''
+                   for header in FILE_SERVER_AUTH_HEADERS]
+        return tuple(headers) + (resource,)
+
+    def _authenticate_and_verify(self, uri):
+        auth_response = authenticator.authenticate(request)
+        if isinstance(auth_response, Response):
+            return auth_response
+        self._verify_tenant(uri)
+
     @rest_decorators.exceptions_handled
-    @rest_decorators.marshal_with(ResourceID)
     def get(self, **_):
         """
         Verify that the user is allowed to access requested resource.
 
         The user cannot access tenants except the one in the request's header.
+        Only the status code of the response matters to nginx, so the
+        response is returned as is, without marshalling it.
         """
-        uri = request.headers.get('X-Original-Uri')
-        self._verify_tenant(uri)
+        uri = request.headers.get('X-Original-Uri', '').strip('/')
+        auth_responses = []
+
+        def verify():
+            auth_responses.append(self._authenticate_and_verify(uri))
+            return auth_responses[0] is None
+
+        if not file_server_auth_cache.verify(self._get_cache_key(uri),
+                                             verify):
+            # e.g. an external authenticator redirecting elsewhere
+            return auth_responses[0]
 
         # verified successfully
-        return {}
+        return Response(status=200)
+
+
+file_server_auth_cache = VerificationCache(FILE_SERVER_AUTH_CACHE_SIZE,
+                                           FILE_SERVER_AUTH_CACHE_TTL)
 
 
 class LdapAuthentication(SecuredResource):
@@ -41,3 +41,9 @@ from .blueprints import (                        # NOQA
 )
 
 from .agents import Agents                       # NOQA
+
+from .events import EventsTail                   # NOQA
+
+from .executions import BulkExecutions           # NOQA
+
+from .nodes import NodeInstances                 # NOQA
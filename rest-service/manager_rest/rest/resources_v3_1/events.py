@@ -0,0 +1,93 @@
+#########
+# Copyright (c) 2018 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+from flask import request
+from flask_restful_swagger import swagger
+
+from manager_rest import manager_exceptions
+from manager_rest.rest import rest_decorators
+from manager_rest.storage import ListResult
+from manager_rest.security.authorization import authorize
+
+from ..resources_v3 import Events as v3_Events
+
+
+class EventsTail(v3_Events):
+    """Tail the events and logs of an execution.
+
+    A client tailing an execution sends the cursor it got last time, and
+    gets only the events after it (or an empty list and the same cursor,
+    when there are none yet). Unlike paging through the events endpoint,
+    every poll is a single indexed query that neither counts the events
+    nor skips over the ones already seen.
+
+    The request doesn't wait for new events: the rest-service runs on sync
+    gunicorn workers, so a request that waits would keep a whole worker
+    from serving the other requests meanwhile.
+    """
+
+    @swagger.operation(
+        responseclass='List[Event]',
+        nickname="tail events",
+        notes='Returns the events of an execution that come after the '
+              'given cursor'
+    )
+    @rest_decorators.exceptions_handled
+    @authorize('event_list')
+    @rest_decorators.marshal_events
+    @rest_decorators.create_filters()
+    @rest_decorators.paginate
+    @rest_decorators.rangeable
+    @rest_decorators.projection
+    @rest_decorators.sortable()
+    def get(self, _include=None, filters=None,
+            pagination=None, sort=None, range_filters=None, **kwargs):
+        """List the events of an execution after the cursor.
+
+        The `execution_id` filter is expected, and the other filters are
+        the same as in the events endpoint. The `_cursor` request argument
+        is the `cursor` returned by the previous request (or empty, to start
+        from the first event).
+        """
+        execution_ids = filters.get('execution_id', [])
+        if len(execution_ids) != 1:
+            raise manager_exceptions.BadParametersError(
+                'A single `execution_id` filter is expected')
+        raw_cursor = request.args.get('_cursor', '')
+        cursor = self._decode_cursor(raw_cursor)
+        sort = self._get_cursor_sort(sort)
+        params = {
+            'limit': pagination.get('size', self.DEFAULT_SEARCH_SIZE),
+            'offset': 0,
+        }
+        select_query = self._build_select_query(filters, sort, range_filters,
+                                                self.current_tenant.id,
+                                                cursor)
+        events = select_query.params(**params).all()
+
+        results = [
+            self._map_event_to_dict(_include, event)
+            for event in events
+        ]
+        metadata = {
+            'pagination': {
+                'size': params['limit'],
+                'offset': 0,
+                'total': None,
+                'cursor': (self._encode_cursor(events[-1]) if events
+                           else raw_cursor),
+            }
+        }
+        return ListResult(results, metadata)
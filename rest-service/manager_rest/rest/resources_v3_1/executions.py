@@ -0,0 +1,59 @@
+#########
+# Copyright (c) 2018 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+from manager_rest import manager_exceptions
+from manager_rest.storage import models
+from manager_rest.security import SecuredResource
+from manager_rest.security.authorization import authorize
+from manager_rest.resource_manager import get_resource_manager
+from manager_rest.maintenance import is_bypass_maintenance_mode
+from manager_rest.rest.rest_decorators import (exceptions_handled,
+                                               marshal_with)
+from manager_rest.rest.rest_utils import (get_json_and_verify_params,
+                                          verify_and_convert_bool)
+
+
+class BulkExecutions(SecuredResource):
+    @exceptions_handled
+    @authorize('execution_start')
+    @marshal_with(models.Execution)
+    def post(self, **kwargs):
+        """Execute a workflow on many deployments"""
+        request_dict = get_json_and_verify_params({
+            'deployment_ids': {'type': list},
+            'workflow_id': {'type': basestring},
+            'parameters': {'optional': True, 'type': dict}
+        })
+        deployment_ids = request_dict['deployment_ids']
+        if not deployment_ids or \
+                not all(isinstance(d, basestring) for d in deployment_ids):
+            raise manager_exceptions.BadParametersError(
+                'deployment_ids must be a non-empty list of deployment ids')
+
+        allow_custom_parameters, force, dry_run, queue = [
+            verify_and_convert_bool(name, request_dict.get(name, 'false'))
+            for name in ('allow_custom_parameters', 'force', 'dry_run',
+                         'queue')
+        ]
+        executions = get_resource_manager().execute_workflows(
+            deployment_ids,
+            request_dict['workflow_id'],
+            parameters=request_dict.get('parameters'),
+            allow_custom_parameters=allow_custom_parameters,
+            force=force,
+            bypass_maintenance=is_bypass_maintenance_mode(),
+            dry_run=dry_run,
+            queue=queue)
+        return executions, 201
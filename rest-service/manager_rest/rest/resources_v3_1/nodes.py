@@ -0,0 +1,135 @@
+#########
+# Copyright (c) 2018 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+import collections
+
+from flask_restful import marshal
+from flask_restful_swagger import swagger
+
+from manager_rest import manager_exceptions
+from manager_rest.rest import rest_decorators
+from manager_rest.rest.responses_v3 import NodeInstancesUpdateResponse
+from manager_rest.rest.rest_utils import get_json_and_verify_params
+from manager_rest.security.authorization import authorize
+from manager_rest.storage import get_storage_manager, models
+
+from ..resources_v2 import NodeInstances as v2_NodeInstances
+
+
+class NodeInstances(v2_NodeInstances):
+
+    @swagger.operation(
+        responseClass=NodeInstancesUpdateResponse,
+        nickname="patchNodeInstances",
+        notes="Update many node instances in a single transaction. "
+              "Expecting the request body to be a dictionary containing "
+              "'node_instances', a list of dictionaries of the same form as "
+              "when updating a single node instance, with an additional "
+              "'id'. Each node instance can only appear once. The node "
+              "instances that can't be updated (e.g. because of a version "
+              "conflict) are skipped, and reported in 'errors'",
+        consumes=["application/json"]
+    )
+    @rest_decorators.exceptions_handled
+    @authorize('node_instance_update')
+    @rest_decorators.marshal_with(NodeInstancesUpdateResponse)
+    def patch(self, **kwargs):
+        """Update many node instances."""
+        request_dict = get_json_and_verify_params(
+            {'node_instances': {'type': list}}
+        )
+        updates = request_dict['node_instances']
+        for update in updates:
+            self._validate_update(update)
+        self._validate_unique_ids(updates)
+
+        sm = get_storage_manager()
+        # Lock all the instances at once, in a consistent order, so that
+        # concurrent batches don't deadlock
+        instances = {
+            instance.id: instance for instance in sm.list(
+                models.NodeInstance,
+                filters={'id': [update['id'] for update in updates]},
+                sort={'id': 'asc'},
+                get_all_results=True,
+                locking=True
+            )
+        }
+
+        updated, errors = [], []
+        for update in updates:
+            instance = instances.get(update['id'])
+            try:
+                self._update_instance(instance, update)
+            except manager_exceptions.ManagerException as e:
+                errors.append({
+                    'id': update['id'],
+                    'error_code': e.error_code,
+                    'message': str(e),
+                })
+            else:
+                updated.append(instance)
+        sm.update_many(updated)
+
+        return {
+            'items': marshal([item.to_response() for item in updated],
+                             models.NodeInstance.response_fields),
+            'errors': errors,
+        }
+
+    @staticmethod
+    def _validate_update(update):
+        if not isinstance(update, collections.Mapping) or \
+                not isinstance(update.get('id'), basestring) or \
+                not isinstance(update.get('version'), int):
+            raise manager_exceptions.BadParametersError(
+                'Each of the node instances is expected to be a map '
+                'containing an "id" and a "version" field, and optionally '
+                '"runtime_properties" and/or "state" fields')
+
+    @staticmethod
+    def _validate_unique_ids(updates):
+        # The versions are only bumped when the batch is stored, so two
+        # updates of the same instance would both pass the version check,
+        # and the second one would silently override the first
+        counts = collections.Counter(update['id'] for update in updates)
+        duplicates = sorted(
+            instance_id for instance_id, count in counts.items() if count > 1)
+        if duplicates:
+            raise manager_exceptions.BadParametersError(
+                'Each node instance can only be updated once in a batch, '
+                'but got several updates of: {0}'
+                .format(', '.join(duplicates)))
+
+    @staticmethod
+    def _update_instance(instance, update):
+        """Apply the update to the instance, like `NodeInstancesId.patch`"""
+        if instance is None:
+            raise manager_exceptions.NotFoundError(
+                'Requested `NodeInstance` with ID `{0}` was not found'
+                .format(update['id']))
+        # Added for backwards compatibility with older client versions that
+        # had version=0 by default
+        version = update['version'] or 1
+        if instance.version > version:
+            raise manager_exceptions.ConflictError(
+                'Node instance update conflict [current version={0}, '
+                'update version={1}]'.format(instance.version, version)
+            )
+        instance.runtime_properties = update.get(
+            'runtime_properties',
+            instance.runtime_properties
+        )
+        instance.state = update.get('state', instance.state)
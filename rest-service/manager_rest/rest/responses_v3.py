@@ -100,3 +100,11 @@ class AgentResponse(BaseResponse):
         'node': fields.String,
         'deployment': fields.String
     }
+
+
+@swagger.model
+class NodeInstancesUpdateResponse(BaseResponse):
+    resource_fields = {
+        'items': fields.Raw,
+        'errors': fields.Raw,
+    }
@@ -16,12 +16,13 @@
 import pytz
 
 from functools import wraps
+from itertools import islice
 from collections import OrderedDict
 
 from dateutil.parser import parse as parse_datetime
 from flask_restful import marshal
 from flask_restful.utils import unpack
-from flask import request, current_app
+from flask import request, current_app, Response, stream_with_context
 from sqlalchemy.util._collections import _LW as sql_alchemy_collection
 from toolz import (
     dicttoolz,
@@ -46,6 +47,7 @@ from manager_rest.rest.rest_utils import (verify_and_convert_bool,
                                           request_use_all_tenants)
 
 from .responses_v2 import ListResponse
+from .serialization import Serializer, stream_list
 
 INCLUDE = 'Include'
 SORT = 'Sort'
@@ -105,10 +107,17 @@ def exceptions_handled(func):
 
 
 class marshal_with(object):
-    def __init__(self, response_class):
+    # Limit the number of serializers kept for the different `_include`
+    # parameters that the requests might pass
+    MAX_SERIALIZERS = 100
+
+    def __init__(self, response_class, stream_threshold=None):
         """
         :param response_class: response class to marshal result with.
          class must have a "resource_fields" class variable
+        :param stream_threshold: If set, list responses with more items
+         than that are streamed, so that they're serialized one item at a
+         time when they're sent, instead of all at once
         """
         if hasattr(response_class, 'response_fields'):
             self._fields = response_class.response_fields
@@ -120,6 +129,9 @@ class marshal_with(object):
                 'class variable'.format(type(response_class)))
 
         self.response_class = response_class
+        self.stream_threshold = stream_threshold
+        self._model_fields = {}
+        self._serializers = {}
 
     def __call__(self, f):
         @wraps(f)
@@ -128,6 +140,7 @@ class marshal_with(object):
                 return f(*args, **kwargs)
 
             fields_to_include = self._get_fields_to_include()
+            serialize = self._get_serializer(fields_to_include)
             if self._is_include_parameter_in_request():
                 # only pushing "_include" into kwargs when the request
                 # contained this parameter, to keep things cleaner (identical
@@ -138,10 +151,13 @@ class marshal_with(object):
 
             def wrap_list_items(response):
                 wrapped_items = self.wrap_with_response_object(response.items)
-                response.items = marshal(wrapped_items, fields_to_include)
+                response.items = serialize(wrapped_items)
                 return response
 
             if isinstance(response, ListResponse):
+                if self.stream_threshold is not None and \
+                        len(response.items) > self.stream_threshold:
+                    return self._stream_list_response(response, serialize)
                 return marshal(wrap_list_items(response),
                                ListResponse.resource_fields)
             # SQLAlchemy returns a class that subtypes tuple, but acts
@@ -156,13 +172,52 @@ class marshal_with(object):
                             headers)
                 else:
                     data = self.wrap_with_response_object(data)
-                    return marshal(data, fields_to_include), code, headers
+                    return serialize(data), code, headers
             else:
                 response = self.wrap_with_response_object(response)
-                return marshal(response, fields_to_include)
+                return serialize(response)
 
         return wrapper
 
+    def _get_serializer(self, fields):
+        """A serializer for the fields, created once for every set of fields
+        """
+        key = frozenset(fields)
+        if key not in self._serializers:
+            if len(self._serializers) >= self.MAX_SERIALIZERS:
+                self._serializers.clear()
+            self._serializers[key] = Serializer(fields)
+        return self._serializers[key]
+
+    def _stream_list_response(self, response, serialize):
+        """Stream the items of a large list response.
+
+        The first item is serialized before the response is started, so
+        that an error affecting all the items is still returned as a regular
+        error response. The status of the response is already sent when a
+        later item fails, so such an error can only be logged, and the
+        response is cut short.
+        """
+        def serialize_item(item):
+            return serialize(self.wrap_with_response_object(item))
+
+        first_item = serialize_item(response.items[0])
+
+        def serialized_items():
+            yield first_item
+            try:
+                for item in islice(response.items, 1, None):
+                    yield serialize_item(item)
+            except Exception:
+                current_app.logger.exception(
+                    'Error serializing a streamed response, it is cut short')
+                raise
+
+        return Response(
+            stream_with_context(stream_list(serialized_items(),
+                                            response.metadata)),
+            mimetype='application/json')
+
     def wrap_with_response_object(self, data):
         if isinstance(data, dict):
             return data
@@ -173,7 +228,10 @@ class marshal_with(object):
         # Support for partial results from SQLAlchemy (i.e. only
         # certain columns, and not the whole model class)
         elif isinstance(data, sql_alchemy_collection):
-            return data._asdict()
+            fields = data._asdict()
+            if issubclass(self.response_class, SQLModelBase):
+                fields = self.response_class.partial_response(fields)
+            return fields
         raise RuntimeError('Unexpected response data (type {0}) {1}'.format(
             type(data), data))
 
@@ -187,9 +245,7 @@ class marshal_with(object):
         return verify_and_convert_bool('get_data', get_data)
 
     def _get_fields_to_include(self):
-        skipped_fields = self._get_skipped_fields()
-        model_fields = {k: v for k, v in self._fields.iteritems()
-                        if k not in skipped_fields}
+        model_fields = self._get_model_fields(self._get_api_version())
 
         if self._is_include_parameter_in_request():
             include = set(request.args['_include'].split(','))
@@ -207,8 +263,21 @@ class marshal_with(object):
         version = url.split('/api/')[1]
         return version.split('/')[0]
 
-    def _get_skipped_fields(self):
-        api_version = self._get_api_version()
+    def _get_model_fields(self, api_version):
+        """The fields of the response class in the API version.
+
+        They're only computed once for every version, and must not be
+        modified.
+        """
+        if api_version not in self._model_fields:
+            skipped_fields = self._get_skipped_fields(api_version)
+            self._model_fields[api_version] = {
+                k: v for k, v in self._fields.iteritems()
+                if k not in skipped_fields
+            }
+        return self._model_fields[api_version]
+
+    def _get_skipped_fields(self, api_version):
         if hasattr(self.response_class, 'skipped_fields'):
             return self.response_class.skipped_fields.get(api_version, [])
         return []
@@ -0,0 +1,106 @@
+#########
+# Copyright (c) 2018 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+import json
+from functools import partial
+from collections import OrderedDict
+
+import six
+from flask_restful import fields as flask_fields
+from flask_restful.fields import MarshallingException, get_value
+
+
+def _format_string(value):
+    try:
+        return six.text_type(value)
+    except ValueError as e:
+        raise MarshallingException(e)
+
+
+def _format_integer(value):
+    try:
+        return int(value)
+    except ValueError as e:
+        raise MarshallingException(e)
+
+
+# The fields that are formatted directly, instead of by their `output`:
+# field class -> (default value, format function)
+_FORMATTERS = {
+    flask_fields.Raw: (None, lambda value: value),
+    flask_fields.String: (None, _format_string),
+    flask_fields.Integer: (0, _format_integer),
+    flask_fields.Boolean: (None, bool),
+}
+
+
+def _get_value(key, data):
+    if type(data) in (dict, OrderedDict):
+        return data.get(key)
+    return get_value(key, data)
+
+
+class Serializer(object):
+    """Marshal data like `flask_restful.marshal`, but faster.
+
+    `marshal` creates a field object for each field of each item, and gets
+    the values of the fields in the most generic way. A serializer prepares
+    a function for each of the fields once, and can then be used for any
+    number of items, with the same output as `marshal`. The items are plain
+    dicts rather than OrderedDicts, which are much slower to create (and the
+    order of the fields is arbitrary anyway).
+    """
+
+    def __init__(self, fields):
+        self._fields = [(key, self._compile_field(key, field))
+                        for key, field in fields.items()]
+
+    def __call__(self, data):
+        if isinstance(data, (list, tuple)):
+            return [self(item) for item in data]
+        return {key: serialize(data) for key, serialize in self._fields}
+
+    @staticmethod
+    def _compile_field(key, field):
+        if isinstance(field, dict):
+            return Serializer(field)
+        if field in _FORMATTERS and '.' not in key:
+            default, format_value = _FORMATTERS[field]
+
+            def serialize(data):
+                value = _get_value(key, data)
+                if value is None:
+                    return default
+                return format_value(value)
+            return serialize
+        if isinstance(field, type):
+            field = field()
+        return partial(field.output, key)
+
+
+def stream_list(items, metadata):
+    """Encode a list response as JSON, one item at a time.
+
+    The JSON is the same as that of the marshalled `ListResponse`, but the
+    items are only encoded when the response is sent, so if they're
+    serialized lazily (e.g. `items` is a generator), the whole response
+    doesn't need to be kept in memory.
+    """
+    yield '{"items": ['
+    for index, item in enumerate(items):
+        if index:
+            yield ', '
+        yield json.dumps(item)
+    yield '], "metadata": {0}}}\n'.format(json.dumps(metadata))
@@ -13,19 +13,88 @@
 #  * See the License for the specific language governing permissions and
 #  * limitations under the License.
 
-from datetime import datetime
-from collections import namedtuple
+import os
+import hmac
+import hashlib
+import threading
+from time import time
+from datetime import datetime, timedelta
+from collections import namedtuple, OrderedDict
 
+from dateutil import parser as date_parser
 from flask import current_app, Response
 from flask_security.utils import verify_password, verify_hash
 
 from . import user_handler
+from manager_rest import config
 from manager_rest.storage import user_datastore
 from manager_rest.app_logging import raise_unauthorized_user_error
 
 
 Authorization = namedtuple('Authorization', 'username password')
 
+VERIFICATION_CACHE_SIZE = 1000
+VERIFICATION_CACHE_TTL = 60  # seconds
+
+
+class VerificationCache(object):
+    """Remember the credentials that were recently verified.
+
+    Verifying a password (or a token) means hashing it with a deliberately
+    slow hash, which is too expensive to do on every request. Instead, once
+    a credential is verified, a digest of it is kept for a while, so that
+    the next requests only need to compare digests.
+
+    The digest is keyed with a secret that never leaves the process. For
+    passwords and tokens, it covers the stored password hash of the user as
+    well, so changing the password invalidates all the cached credentials
+    of the user (on every worker). Locked users are rejected before the
+    cache is checked.
+    """
+
+    def __init__(self, size_limit, ttl):
+        self._size_limit = size_limit
+        self._ttl = ttl
+        self._secret = os.urandom(32)
+        self._verified = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _digest(self, key_parts):
+        digest = hmac.new(self._secret, digestmod=hashlib.sha256)
+        for part in key_parts:
+            if isinstance(part, unicode):
+                part = part.encode('utf-8')
+            digest.update(part + b'\0')
+        return digest.digest()
+
+    def verify(self, key_parts, verify_func):
+        """Verify the credential, unless it was verified recently.
+
+        :param key_parts: Strings identifying what is verified, e.g. the
+                          password from the request and the password hash
+                          stored for the user
+        :param verify_func: Called to verify the credential if it's not
+                            cached, and returns whether it's valid
+        :return: Whether the credential is valid
+        """
+        digest = self._digest(key_parts)
+        with self._lock:
+            verified_at = self._verified.pop(digest, None)
+            if verified_at is not None and time() - verified_at < self._ttl:
+                self._verified[digest] = verified_at
+                return True
+        if not verify_func():
+            return False
+        with self._lock:
+            self._verified[digest] = time()
+            while len(self._verified) > self._size_limit:
+                self._verified.popitem(last=False)
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._verified.clear()
+
 
 class Authentication(object):
     def __init__(self):
@@ -66,15 +135,36 @@ class Authentication(object):
             raise_unauthorized_user_error('No authentication info provided')
         self.logger.debug('Authenticated user: {0}'.format(user))
 
-        if request.authorization:
+        modified = False
+        if request.authorization and user.failed_logins_counter:
             # Reset the counter only when using basic authentication
             # (User + Password), otherwise the counter will be reset on
             # every UI refresh (every 4 sec) and accounts won't be locked.
             user.failed_logins_counter = 0
-        user.last_login_at = datetime.now()
-        user_datastore.commit()
+            modified = True
+        now = datetime.now()
+        if modified or self._last_login_outdated(user, now):
+            user.last_login_at = now
+            user_datastore.commit()
         return user
 
+    @staticmethod
+    def _last_login_outdated(user, now):
+        """Whether the last login time of the user should be updated.
+
+        Updating it on every request would turn every request (even reading
+        ones) into a write to the users table, so it is only updated once
+        every `last_login_update_interval` seconds.
+        """
+        if not user.last_login_at:
+            return True
+        update_interval = timedelta(
+            seconds=config.instance.last_login_update_interval)
+        last_login = user.last_login_at
+        if isinstance(last_login, basestring):
+            last_login = date_parser.parse(last_login, ignoretz=True)
+        return last_login + update_interval <= now
+
     def _internal_auth(self, request):
         user = None
         auth = request.authorization
@@ -132,7 +222,9 @@ class Authentication(object):
                 'Authentication failed for '
                 '<User username=`{0}`>'.format(username)
             )
-        if not verify_password(password, user.password):
+        if not verification_cache.verify(
+                (password, user.password),
+                lambda: verify_password(password, user.password)):
             self._increment_failed_logins_counter(user)
             raise_unauthorized_user_error(
                 'Authentication failed for {0}.'
@@ -159,7 +251,10 @@ class Authentication(object):
             )
         elif not user:
             raise_unauthorized_user_error('No authentication info provided')
-        elif not verify_hash(compare_data=user.password, hashed_data=data[1]):
+        elif not verification_cache.verify(
+                (data[1], user.password),
+                lambda: verify_hash(compare_data=user.password,
+                                    hashed_data=data[1])):
             raise_unauthorized_user_error(
                 'Authentication failed for {0}'.format(user)
             )
@@ -167,4 +262,6 @@ class Authentication(object):
         return user
 
 
+verification_cache = VerificationCache(VERIFICATION_CACHE_SIZE,
+                                       VERIFICATION_CACHE_TTL)
 authenticator = Authentication()
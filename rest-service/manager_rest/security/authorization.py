@@ -1,14 +1,15 @@
 
-from functools import wraps
+from functools import wraps, partial
 
 from flask import request
 from flask_security import current_user
 
 from manager_rest import config, utils
+from manager_rest.storage import db
 from manager_rest.storage.models import Tenant
-from manager_rest.storage import get_storage_manager
 from manager_rest.constants import CLOUDIFY_TENANT_HEADER
-from manager_rest.manager_exceptions import NotFoundError, ForbiddenError
+from manager_rest.user_permissions import get_current_user_permissions
+from manager_rest.manager_exceptions import ForbiddenError
 from manager_rest.rest.rest_utils import (get_json_and_verify_params,
                                           request_use_all_tenants)
 
@@ -33,20 +34,12 @@ def authorize(action,
             else:
                 tenant_name = tenant_for_auth
 
-            # finding tenant to add to the app config
+            # finding tenant to add to the app config. It's only loaded
+            # when the request uses it
             if tenant_name:
-                try:
-                    tenant = get_storage_manager().get(
-                        Tenant,
-                        tenant_name,
-                        filters={'name': tenant_name}
-                    )
-                    utils.set_current_tenant(tenant)
-                except NotFoundError:
-                    raise ForbiddenError(
-                        'Authorization failed: Tried to authenticate with '
-                        'invalid tenant name: {0}'.format(tenant_name)
-                    )
+                tenant_id = _get_tenant_id(tenant_name)
+                utils.set_current_tenant_loader(
+                    partial(Tenant.query.get, tenant_id))
 
             if not current_user.active:
                 raise ForbiddenError(
@@ -72,22 +65,25 @@ def authorize(action,
     return authorize_dec
 
 
-def get_current_user_roles(tenant_name=None, allow_all_tenants=False):
-    tenant_roles = []
-
-    # extracting tenant roles for user in the tenant
-    for t in current_user.all_tenants:
-        if (allow_all_tenants and request_use_all_tenants()) \
-                or t.name == tenant_name:
-            tenant_roles += current_user.all_tenants[t]
-
-    # joining user's system role with his tenant roles
-    user_roles = [role.name for role in tenant_roles] \
-        + current_user.system_roles
-    return user_roles
+def _get_tenant_id(tenant_name):
+    """Get the id of the tenant from the permissions of the current user,
+    or from the database if the user isn't a member of the tenant (e.g. when
+    it's allowed to access it by its system role)
+    """
+    tenant_id = get_current_user_permissions().tenant_ids.get(tenant_name)
+    if tenant_id is None:
+        tenant_id = db.session.query(Tenant.id) \
+            .filter(Tenant.name == tenant_name).scalar()
+    if tenant_id is None:
+        raise ForbiddenError(
+            'Authorization failed: Tried to authenticate with '
+            'invalid tenant name: {0}'.format(tenant_name)
+        )
+    return tenant_id
 
 
 def is_user_action_allowed(action, tenant_name=None, allow_all_tenants=False):
-    user_roles = get_current_user_roles(tenant_name, allow_all_tenants)
-    action_roles = config.instance.authorization_permissions[action]
-    return set(user_roles) & set(action_roles)
+    permissions = get_current_user_permissions()
+    if allow_all_tenants and request_use_all_tenants():
+        return permissions.is_allowed_in_any_tenant(action)
+    return permissions.is_allowed(action, tenant_name)
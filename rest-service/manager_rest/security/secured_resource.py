@@ -32,8 +32,10 @@ def authenticate(func):
             return auth_response
         response = func(*args, **kwargs)
         if hasattr(auth_response, 'response_headers'):
-            # to set additional headers
-            response = jsonify(response)
+            # to set additional headers (streamed list responses are
+            # already Response objects)
+            if not isinstance(response, Response):
+                response = jsonify(response)
             for header, value in auth_response.response_headers.iteritems():
                 response.headers[header] = value
         return response
@@ -14,6 +14,7 @@
 #  * limitations under the License.
 
 from uuid import uuid4
+from itertools import chain
 from collections import (
     OrderedDict,
     defaultdict,
@@ -21,12 +22,14 @@ from collections import (
 from datetime import timedelta, datetime
 from dateutil import parser as date_parser
 
+from sqlalchemy import event, inspect
 from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy.ext.associationproxy import association_proxy
 from flask_security import SQLAlchemyUserDatastore, UserMixin, RoleMixin
 
 from manager_rest import config
 from manager_rest.constants import BOOTSTRAP_ADMIN_ID, DEFAULT_TENANT_ID
+from manager_rest.user_permissions import permissions_cache
 
 from .idencoder import get_encoder
 from .relationships import (
@@ -476,3 +479,29 @@ class UserTenantAssoc(SQLModelBase):
 
 
 user_datastore = SQLAlchemyUserDatastore(db, User, Role)
+
+# The permissions of users are cached (see `manager_rest.user_permissions`),
+# so they have to be recomputed whenever the roles, the groups or the
+# tenants of users change
+MEMBERSHIP_MODELS = (Role, Tenant, Group, GroupTenantAssoc, UserTenantAssoc)
+USER_MEMBERSHIP_ATTRIBUTES = ('roles', 'groups', 'tenant_associations')
+
+
+def _is_membership_change(session, instance):
+    if isinstance(instance, MEMBERSHIP_MODELS):
+        return True
+    if not isinstance(instance, User):
+        return False
+    if instance in session.new or instance in session.deleted:
+        return True
+    attributes = inspect(instance).attrs
+    return any(attributes[attribute].history.has_changes()
+               for attribute in USER_MEMBERSHIP_ATTRIBUTES)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _invalidate_permissions_cache(session, flush_context):
+    for instance in chain(session.new, session.dirty, session.deleted):
+        if _is_membership_change(session, instance):
+            permissions_cache.invalidate()
+            return
@@ -16,16 +16,18 @@
 import json
 
 from collections import OrderedDict
+from datetime import date, datetime
 
 from dateutil import parser as date_parser
 from flask_sqlalchemy import SQLAlchemy, inspect
 from flask_restful import fields as flask_fields
 from sqlalchemy import MetaData
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.ext.associationproxy import ASSOCIATION_PROXY
 from sqlalchemy.ext.hybrid import HYBRID_PROPERTY
 from sqlalchemy.orm.interfaces import NOT_EXTENSION
 
-from manager_rest.utils import classproperty
+from manager_rest.utils import cached_classproperty
 
 
 db = SQLAlchemy(metadata=MetaData(naming_convention={
@@ -87,12 +89,121 @@ class JSONString(db.TypeDecorator):
         return json.loads(value)
 
 
+class JSONB(db.TypeDecorator):
+
+    """A json object, stored as JSONB in PostgreSQL.
+
+    Unlike pickled objects, the contents of the object can be queried (and
+    indexed) by the database, using the JSONB operators. Other databases
+    (i.e. SQLite, in the tests) store the object as a json string.
+
+    """
+
+    impl = db.Text
+    comparator_factory = postgresql.JSONB.Comparator
+
+    def __init__(self, comparator=None):
+        """
+        :param comparator: An optional function that compares two values of
+                           the column, to decide whether it was changed
+        """
+        super(JSONB, self).__init__()
+        self.comparator = comparator
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'postgresql':
+            return dialect.type_descriptor(postgresql.JSONB(none_as_null=True))
+        return dialect.type_descriptor(db.Text())
+
+    def process_bind_param(self, value, dialect):
+        if dialect.name == 'postgresql' or value is None:
+            return value
+        return json.dumps(value)
+
+    def process_result_value(self, value, dialect):
+        if dialect.name == 'postgresql' or value is None:
+            return value
+        return json.loads(value)
+
+    def compare_values(self, x, y):
+        if self.comparator:
+            return self.comparator(x, y)
+        return x == y
+
+
+def make_json_compatible(value):
+    """Convert a (e.g. previously pickled) value to one that is storable as
+    json.
+
+    Tuples and sets become lists, dates and datetimes become ISO-8601
+    strings, and byte strings are decoded as utf-8. Values that have no json
+    equivalent (e.g. non-utf-8 byte strings, NaN, or instances of arbitrary
+    classes) are replaced with None.
+
+    :return: A tuple of the converted value, and a list of the paths (e.g.
+             `['a'][2]`) of the values that were replaced with None
+    """
+    dropped = []
+    return _make_json_compatible(value, '', dropped), dropped
+
+
+def _make_json_compatible(value, path, dropped):
+    if value is None or isinstance(value, (bool, int, long, unicode)):
+        return value
+    if isinstance(value, float):
+        if value != value or value in (float('inf'), float('-inf')):
+            dropped.append(path)
+            return None
+        return value
+    if isinstance(value, str):
+        try:
+            return value.decode('utf-8')
+        except UnicodeDecodeError:
+            dropped.append(path)
+            return None
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        try:
+            value = sorted(value)
+        except TypeError:
+            value = list(value)
+    if isinstance(value, (list, tuple)):
+        return [_make_json_compatible(item, '{0}[{1}]'.format(path, index),
+                                      dropped)
+                for index, item in enumerate(value)]
+    if isinstance(value, dict):
+        converted = {}
+        for key, item in value.items():
+            item_path = '{0}[{1!r}]'.format(path, key)
+            key = _make_json_compatible(key, item_path, [])
+            if not isinstance(key, basestring):
+                key = json.dumps(key)
+            converted[key] = _make_json_compatible(item, item_path, dropped)
+        return converted
+    dropped.append(path)
+    return None
+
+
 class CIColumn(db.Column):
     """A column for case insensitive string fields
     """
     is_ci = True
 
 
+# The group of the large (pickled/json) columns, which aren't loaded with the
+# rest of the object by default. The storage manager loads them when it
+# returns whole objects, but objects that are loaded through relationships
+# (e.g. the blueprint of a deployment, for its `blueprint_id`) only load them
+# when they're accessed
+HEAVY_COLUMNS = 'heavy_columns'
+
+
+def heavy_column(*args, **kwargs):
+    """Return a column that is deferred with the other large columns"""
+    return db.deferred(db.Column(*args, **kwargs), group=HEAVY_COLUMNS)
+
+
 def _get_extension_type(desc):
     """Return the extension_type of a SQLAlchemy descriptors.
 
@@ -128,6 +239,7 @@ class SQLModelBase(db.Model):
         'Text': flask_fields.String,
         'String': flask_fields.String,
         'PickleType': flask_fields.Raw,
+        'JSONB': flask_fields.Raw,
         'UTCDateTime': flask_fields.String,
         'Enum': flask_fields.String,
         'Boolean': flask_fields.Boolean
@@ -164,7 +276,14 @@ class SQLModelBase(db.Model):
     def to_response(self, **kwargs):
         return {f: getattr(self, f) for f in self.resource_fields}
 
-    @classproperty
+    @classmethod
+    def partial_response(cls, fields):
+        """Return the response for a partial result (i.e. only some of the
+        columns, as a dict), converting the fields like `to_response` does
+        """
+        return fields
+
+    @cached_classproperty
     def resource_fields(cls):
         """Return a mapping of available field names and their corresponding
         flask types
@@ -17,6 +17,7 @@ from os import path
 from datetime import datetime
 
 from sqlalchemy import case
+from dsl_parser.constants import WORKFLOW_PLUGINS_TO_INSTALL
 from flask_restful import fields as flask_fields
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.ext.declarative import declared_attr
@@ -24,13 +25,15 @@ from sqlalchemy.ext.associationproxy import association_proxy
 
 from manager_rest import config
 from manager_rest.rest.responses import Workflow
-from manager_rest.utils import classproperty, files_in_folder
+from manager_rest.utils import cached_classproperty, files_in_folder
 from manager_rest.deployment_update.constants import ACTION_TYPES, ENTITY_TYPES
 from manager_rest.constants import (FILE_SERVER_PLUGINS_FOLDER,
                                     FILE_SERVER_RESOURCES_FOLDER)
 
 from .models_base import (
     db,
+    heavy_column,
+    JSONB,
     JSONString,
     UTCDateTime,
 )
@@ -53,10 +56,25 @@ class Blueprint(SQLResourceBase):
 
     created_at = db.Column(UTCDateTime, nullable=False, index=True)
     main_file_name = db.Column(db.Text, nullable=False)
-    plan = db.Column(db.PickleType, nullable=False)
+    plan = heavy_column(JSONB, nullable=False)
     updated_at = db.Column(UTCDateTime)
     description = db.Column(db.Text)
 
+    # The workflow plugins of the plan, which are needed for starting every
+    # execution, so that the (possibly very large) plan isn't loaded for it
+    _workflow_plugins = db.Column(JSONB)
+
+    @property
+    def workflow_plugins(self):
+        """The workflow plugins of the plan.
+
+        Blueprints that were stored without them (e.g. restored from an
+        Elasticsearch snapshot) fall back to reading them from the plan.
+        """
+        if self._workflow_plugins is None:
+            return self.plan[WORKFLOW_PLUGINS_TO_INSTALL]
+        return self._workflow_plugins
+
 
 class Snapshot(SQLResourceBase):
     __tablename__ = 'snapshots'
@@ -115,9 +133,9 @@ class Plugin(SQLResourceBase):
             self.distribution
         )
 
-    @classproperty
+    @cached_classproperty
     def response_fields(cls):
-        fields = super(Plugin, cls).response_fields
+        fields = super(Plugin, cls).response_fields.copy()
         fields['file_server_path'] = flask_fields.String
         fields['yaml_url_path'] = flask_fields.String
         return fields
@@ -141,9 +159,9 @@ class Secret(SQLResourceBase):
     def key(self):
         return self.id
 
-    @classproperty
+    @cached_classproperty
     def resource_fields(cls):
-        fields = super(Secret, cls).resource_fields
+        fields = super(Secret, cls).resource_fields.copy()
         fields['key'] = fields.pop('id')
         return fields
 
@@ -163,15 +181,15 @@ class Deployment(SQLResourceBase):
 
     created_at = db.Column(UTCDateTime, nullable=False, index=True)
     description = db.Column(db.Text)
-    inputs = db.Column(db.PickleType)
-    groups = db.Column(db.PickleType)
+    inputs = heavy_column(JSONB)
+    groups = heavy_column(JSONB)
     permalink = db.Column(db.Text)
-    policy_triggers = db.Column(db.PickleType)
-    policy_types = db.Column(db.PickleType)
-    outputs = db.Column(db.PickleType(comparator=lambda *a: False))
-    scaling_groups = db.Column(db.PickleType)
+    policy_triggers = heavy_column(JSONB)
+    policy_types = heavy_column(JSONB)
+    outputs = heavy_column(JSONB(comparator=lambda *a: False))
+    scaling_groups = db.Column(JSONB)
     updated_at = db.Column(UTCDateTime)
-    workflows = db.Column(db.PickleType(comparator=lambda *a: False))
+    workflows = heavy_column(JSONB(comparator=lambda *a: False))
 
     _blueprint_fk = foreign_key(Blueprint._storage_id)
 
@@ -181,9 +199,9 @@ class Deployment(SQLResourceBase):
 
     blueprint_id = association_proxy('blueprint', 'id')
 
-    @classproperty
+    @cached_classproperty
     def response_fields(cls):
-        fields = super(Deployment, cls).response_fields
+        fields = super(Deployment, cls).response_fields.copy()
         fields['workflows'] = flask_fields.List(
             flask_fields.Nested(Workflow.resource_fields)
         )
@@ -194,6 +212,12 @@ class Deployment(SQLResourceBase):
         dep_dict['workflows'] = self._list_workflows(self.workflows)
         return dep_dict
 
+    @classmethod
+    def partial_response(cls, fields):
+        if 'workflows' in fields:
+            fields['workflows'] = cls._list_workflows(fields['workflows'])
+        return fields
+
     @staticmethod
     def _list_workflows(deployment_workflows):
         if deployment_workflows is None:
@@ -218,7 +242,7 @@ class Execution(SQLResourceBase):
     ended_at = db.Column(UTCDateTime, nullable=True)
     error = db.Column(db.Text)
     is_system_workflow = db.Column(db.Boolean, nullable=False)
-    parameters = db.Column(db.PickleType)
+    parameters = heavy_column(JSONB)
     status = db.Column(
         db.Enum(*ExecutionState.STATES, name='execution_status')
     )
@@ -259,11 +283,22 @@ class Execution(SQLResourceBase):
         self.deployment = deployment
 
 
+# The queue of executions is read by the execution scheduler, oldest first,
+# and it's small compared to the whole table
+db.Index('executions_queued_created_at_idx',
+         Execution.created_at,
+         Execution._storage_id,
+         postgresql_where=Execution.status == ExecutionState.QUEUED)
+
+
 class Event(SQLResourceBase):
 
     """Execution events."""
 
     __tablename__ = 'events'
+    # Inserted rows are moved to their daily partition by a trigger, so
+    # postgres can't return them: the primary key is fetched beforehand
+    __table_args__ = {'implicit_returning': False}
 
     timestamp = db.Column(
         UTCDateTime,
@@ -280,6 +315,17 @@ class Event(SQLResourceBase):
     error_causes = db.Column(JSONString)
 
     _execution_fk = foreign_key(Execution._storage_id, index=True)
+    # Denormalized from the execution and node_id, so that listing events
+    # doesn't need to go through the execution to join its deployment
+    _deployment_fk = foreign_key(Deployment._storage_id, nullable=True,
+                                 index=True)
+    _blueprint_fk = foreign_key(Blueprint._storage_id, nullable=True,
+                                index=True)
+    _node_instance_fk = db.Column(
+        db.ForeignKey('node_instances._storage_id', ondelete='SET NULL'),
+        nullable=True,
+        index=True,
+    )
 
     @declared_attr
     def execution(cls):
@@ -290,6 +336,9 @@ class Event(SQLResourceBase):
     def set_execution(self, execution):
         self._set_parent(execution)
         self.execution = execution
+        self._deployment_fk = execution._deployment_fk
+        if execution.deployment:
+            self._blueprint_fk = execution.deployment._blueprint_fk
 
 
 class Log(SQLResourceBase):
@@ -297,6 +346,9 @@ class Log(SQLResourceBase):
     """Execution logs."""
 
     __tablename__ = 'logs'
+    # Inserted rows are moved to their daily partition by a trigger, so
+    # postgres can't return them: the primary key is fetched beforehand
+    __table_args__ = {'implicit_returning': False}
 
     timestamp = db.Column(
         UTCDateTime,
@@ -313,6 +365,15 @@ class Log(SQLResourceBase):
     node_id = db.Column(db.Text)
 
     _execution_fk = foreign_key(Execution._storage_id, index=True)
+    _deployment_fk = foreign_key(Deployment._storage_id, nullable=True,
+                                 index=True)
+    _blueprint_fk = foreign_key(Blueprint._storage_id, nullable=True,
+                                index=True)
+    _node_instance_fk = db.Column(
+        db.ForeignKey('node_instances._storage_id', ondelete='SET NULL'),
+        nullable=True,
+        index=True,
+    )
 
     @declared_attr
     def execution(cls):
@@ -323,16 +384,19 @@ class Log(SQLResourceBase):
     def set_execution(self, execution):
         self._set_parent(execution)
         self.execution = execution
+        self._deployment_fk = execution._deployment_fk
+        if execution.deployment:
+            self._blueprint_fk = execution.deployment._blueprint_fk
 
 
 class DeploymentUpdate(SQLResourceBase):
     __tablename__ = 'deployment_updates'
 
     created_at = db.Column(UTCDateTime, nullable=False, index=True)
-    deployment_plan = db.Column(db.PickleType)
-    deployment_update_node_instances = db.Column(db.PickleType)
-    deployment_update_deployment = db.Column(db.PickleType)
-    deployment_update_nodes = db.Column(db.PickleType)
+    deployment_plan = heavy_column(db.PickleType)
+    deployment_update_node_instances = heavy_column(db.PickleType)
+    deployment_update_deployment = heavy_column(db.PickleType)
+    deployment_update_nodes = heavy_column(db.PickleType)
     modified_entity_ids = db.Column(db.PickleType)
     old_inputs = db.Column(db.PickleType)
     new_inputs = db.Column(db.PickleType)
@@ -372,9 +436,9 @@ class DeploymentUpdate(SQLResourceBase):
     old_blueprint_id = association_proxy('old_blueprint', 'id')
     new_blueprint_id = association_proxy('new_blueprint', 'id')
 
-    @classproperty
+    @cached_classproperty
     def response_fields(cls):
-        fields = super(DeploymentUpdate, cls).response_fields
+        fields = super(DeploymentUpdate, cls).response_fields.copy()
         fields['steps'] = flask_fields.List(
             flask_fields.Nested(DeploymentUpdateStep.response_fields)
         )
@@ -461,13 +525,13 @@ class Node(SQLResourceBase):
     min_number_of_instances = db.Column(db.Integer, nullable=False)
     number_of_instances = db.Column(db.Integer, nullable=False)
     planned_number_of_instances = db.Column(db.Integer, nullable=False)
-    plugins = db.Column(db.PickleType)
-    plugins_to_install = db.Column(db.PickleType)
-    properties = db.Column(db.PickleType)
-    relationships = db.Column(db.PickleType)
-    operations = db.Column(db.PickleType)
+    plugins = heavy_column(JSONB)
+    plugins_to_install = heavy_column(JSONB)
+    properties = heavy_column(JSONB)
+    relationships = heavy_column(JSONB)
+    operations = heavy_column(JSONB)
     type = db.Column(db.Text, nullable=False, index=True)
-    type_hierarchy = db.Column(db.PickleType)
+    type_hierarchy = db.Column(JSONB)
 
     _deployment_fk = foreign_key(Deployment._storage_id)
 
@@ -495,9 +559,9 @@ class NodeInstance(SQLResourceBase):
     # TODO: This probably should be a foreign key, but there's no guarantee
     # in the code, currently, that the host will be created beforehand
     host_id = db.Column(db.Text)
-    relationships = db.Column(db.PickleType)
-    runtime_properties = db.Column(db.PickleType)
-    scaling_groups = db.Column(db.PickleType)
+    relationships = heavy_column(JSONB)
+    runtime_properties = heavy_column(JSONB)
+    scaling_groups = db.Column(JSONB)
     state = db.Column(db.Text, nullable=False)
     version = db.Column(db.Integer, nullable=False)
 
@@ -17,7 +17,7 @@ from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy.ext.associationproxy import association_proxy
 
-from manager_rest.utils import classproperty
+from manager_rest.utils import cached_classproperty
 
 from .models_base import db, SQLModelBase
 from .models_states import VisibilityState
@@ -44,7 +44,7 @@ class SQLResourceBase(SQLModelBase):
     # Lists of fields to skip when using older versions of the client
     skipped_fields = {'v1': [], 'v2': [], 'v2.1': []}
 
-    @classproperty
+    @cached_classproperty
     def response_fields(cls):
         fields = cls.resource_fields.copy()
         fields.update(cls._extra_fields)
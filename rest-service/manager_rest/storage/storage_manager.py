@@ -14,18 +14,20 @@
 #  * limitations under the License.
 
 import psutil
-from collections import OrderedDict
+from collections import OrderedDict, defaultdict
 from flask_security import current_user
 from sqlalchemy import or_ as sql_or, func
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import undefer, undefer_group
 from flask import current_app, has_request_context
 from sqlite3 import DatabaseError as SQLiteDBError
 from sqlalchemy.orm.attributes import flag_modified
 
-from manager_rest.storage.models_base import db
+from manager_rest.storage.models_base import db, HEAVY_COLUMNS
 from manager_rest import manager_exceptions, config, utils
 from manager_rest.storage.models_states import VisibilityState
 from manager_rest.utils import all_tenants_authorization, is_administrator
+from manager_rest.user_permissions import get_current_user_permissions
 
 try:
     from psycopg2 import DatabaseError as Psycopg2DBError
@@ -36,6 +38,9 @@ except ImportError:
 
 
 class SQLStorageManager(object):
+    # Keep the number of bound parameters below the sqlite limit
+    UNIQUE_IDS_CHUNK_SIZE = 500
+
     @staticmethod
     def _safe_commit():
         """Try to commit changes in the session. Roll back if exception raised
@@ -49,12 +54,15 @@ class SQLStorageManager(object):
                 'SQL Storage error: {0}'.format(str(e))
             )
 
-    def _get_base_query(self, model_class, include, joins):
+    def _get_base_query(self, model_class, include, joins,
+                        heavy_columns=None):
         """Create the initial query from the model class and included columns
 
         :param model_class: SQL DB table class
         :param include: A (possibly empty) list of columns to include in
         the query
+        :param heavy_columns: An optional list of the large columns to load
+        with the objects. By default, all of them are loaded
         :return: An SQLAlchemy AppenderQuery object
         """
         # If only some columns are included, query through the session object
@@ -64,7 +72,12 @@ class SQLStorageManager(object):
             query = db.session.query(*include)
         else:
             # If all columns should be returned, query directly from the model
-            query = model_class.query
+            # (including the large columns, which are deferred by default)
+            if heavy_columns is None:
+                options = [undefer_group(HEAVY_COLUMNS)]
+            else:
+                options = [undefer(column) for column in heavy_columns]
+            query = model_class.query.options(*options)
 
         query = query.join(*joins)
         return query
@@ -176,11 +189,8 @@ class SQLStorageManager(object):
             if all_tenants_authorization():
                 return query
             # Filter by all the tenants the user is allowed to list in
-            tenant_ids = [
-                tenant.id for tenant in current_user.all_tenants
-                if utils.tenant_specific_authorization(tenant,
-                                                       model_class.__name__)
-                ]
+            tenant_ids = get_current_user_permissions().allowed_tenant_ids(
+                utils.get_permission_name(model_class.__name__))
         else:
             # Specific tenant only
             tenant_ids = [current_tenant.id] if current_tenant else []
@@ -255,6 +265,12 @@ class SQLStorageManager(object):
         substr_filters = substr_filters or dict()
         sort = sort or OrderedDict()
 
+        # Fields that aren't columns (e.g. python properties) are only
+        # available on whole objects, so in that case the query can't be
+        # limited to the included columns
+        if not all(self._is_column(model_class, c) for c in include):
+            include = []
+
         all_columns = set(include) | set(filters.keys()) | set(sort.keys())
         joins = self._get_joins(model_class, all_columns)
 
@@ -269,7 +285,8 @@ class SQLStorageManager(object):
                    filters=None,
                    substr_filters=None,
                    sort=None,
-                   all_tenants=None):
+                   all_tenants=None,
+                   heavy_columns=None):
         """Get an SQL query object based on the params passed
 
         :param model_class: SQL DB table class
@@ -279,6 +296,8 @@ class SQLStorageManager(object):
         of such values)
         :param sort: An optional dictionary where keys are column names to
         sort by, and values are the order (asc/desc)
+        :param heavy_columns: An optional list of the large columns to load,
+        when whole objects are returned
         :return: A sorted and filtered query with only the relevant
         columns
         """
@@ -286,7 +305,8 @@ class SQLStorageManager(object):
             self._get_joins_and_converted_columns(
                 model_class, include, filters, substr_filters, sort)
 
-        query = self._get_base_query(model_class, include, joins)
+        query = self._get_base_query(model_class, include, joins,
+                                     heavy_columns)
         query = self._filter_query(
             query, model_class, filters, substr_filters, all_tenants)
         query = self._sort_query(query, sort)
@@ -311,6 +331,10 @@ class SQLStorageManager(object):
 
         return include, filters, substr_filters, sort
 
+    @staticmethod
+    def _is_column(model_class, column_name):
+        return not isinstance(getattr(model_class, column_name), property)
+
     @staticmethod
     def _get_column(model_class, column_name):
         """Return the column on which an action (filtering, sorting, etc.)
@@ -410,6 +434,47 @@ class SQLStorageManager(object):
                 )
             )
 
+    def _validate_unique_resource_ids_per_tenant(self, instances):
+        """Same as `_validate_unique_resource_id_per_tenant`, for many
+        instances at once, with a single query per model class (and per
+        chunk of ids).
+        The instances are expected to be flushed, but not committed yet
+        """
+        ids_by_class = defaultdict(list)
+        for instance in instances:
+            if instance.is_resource and instance.is_id_unique:
+                ids_by_class[instance.__class__].append(instance.id)
+
+        for model_class, ids in ids_by_class.items():
+            for i in range(0, len(ids), self.UNIQUE_IDS_CHUNK_SIZE):
+                chunk = ids[i:i + self.UNIQUE_IDS_CHUNK_SIZE]
+                duplicate = (
+                    db.session.query(model_class.id)
+                    .filter(model_class.id.in_(chunk))
+                    .filter(self._get_unique_resource_filter(model_class))
+                    .group_by(model_class.id)
+                    .having(func.count() > 1)
+                    .first()
+                )
+                if duplicate:
+                    db.session.rollback()
+                    raise manager_exceptions.ConflictError(
+                        '{0} `{1}` already exists on {2} or with global '
+                        'visibility'.format(model_class.__name__,
+                                            duplicate.id,
+                                            self.current_tenant)
+                    )
+
+    def _get_unique_resource_filter(self, model_class):
+        """
+        Filter the resources that are in the current tenant, or are global
+        """
+        tenant_id = self.current_tenant.id if self.current_tenant else ''
+        return sql_or(
+            model_class._tenant_id == tenant_id,
+            model_class.visibility == VisibilityState.GLOBAL
+        )
+
     def _get_unique_resource_id_query(self, model_class, resource_id):
         """
         Query for all the resources with the same id of the given instance,
@@ -417,12 +482,7 @@ class SQLStorageManager(object):
         """
         query = model_class.query
         query = query.filter(model_class.id == resource_id)
-        tenant_id = self.current_tenant.id if self.current_tenant else ''
-        unique_resource_filter = sql_or(
-            model_class._tenant_id == tenant_id,
-            model_class.visibility == VisibilityState.GLOBAL
-        )
-        query = query.filter(unique_resource_filter)
+        query = query.filter(self._get_unique_resource_filter(model_class))
         return query
 
     def _associate_users_and_tenants(self, instance):
@@ -457,14 +517,21 @@ class SQLStorageManager(object):
             element_id,
             include=None,
             filters=None,
-            locking=False):
+            locking=False,
+            heavy_columns=None):
         """Return a single result based on the model class and element ID
+
+        :param heavy_columns: An optional list of the large columns to load
+        with the object (e.g. only the `workflows` of a deployment, and not
+        its inputs and outputs). The other large columns are loaded when
+        they're accessed. By default, all of them are loaded
         """
         current_app.logger.debug(
             'Get `{0}` with ID `{1}`'.format(model_class.__name__, element_id)
         )
         filters = filters or {'id': element_id}
-        query = self._get_query(model_class, include, filters)
+        query = self._get_query(model_class, include, filters,
+                                heavy_columns=heavy_columns)
         if locking:
             query = query.with_for_update()
         result = query.first()
@@ -500,7 +567,9 @@ class SQLStorageManager(object):
              sort=None,
              all_tenants=None,
              substr_filters=None,
-             get_all_results=False):
+             get_all_results=False,
+             locking=False,
+             heavy_columns=None):
         """Return a list of `model_class` results
 
         :param model_class: SQL DB table class
@@ -518,6 +587,11 @@ class SQLStorageManager(object):
         :param get_all_results: Get all the results without the limitation of
                                 size or pagination. Use it carefully to
                                 prevent consumption of too much memory
+        :param locking: Lock the returned rows (SELECT ... FOR UPDATE) until
+                        the end of the transaction
+        :param heavy_columns: An optional list of the large columns to load
+                              with the objects. By default, all of them are
+                              loaded
         :return: A (possibly empty) list of `model_class` results
         """
         self._validate_available_memory()
@@ -533,7 +607,10 @@ class SQLStorageManager(object):
                                 filters,
                                 substr_filters,
                                 sort,
-                                all_tenants)
+                                all_tenants,
+                                heavy_columns)
+        if locking:
+            query = query.with_for_update()
 
         results, total, size, offset = self._paginate(query,
                                                       pagination,
@@ -564,6 +641,47 @@ class SQLStorageManager(object):
         self._validate_unique_resource_id_per_tenant(instance)
         return instance
 
+    def put_many(self, instances):
+        """Create many `model_class` instances in a single transaction
+
+        Unlike calling `put` for each of the instances, all of them are
+        committed at once, and the uniqueness of their ids is validated with
+        a single query, so that creating many instances (e.g. the node
+        instances of a deployment) doesn't take a commit and a query each.
+
+        :param instances: A list of instances of the SQLModelBase class (or
+        some class derived from it)
+        :return: The same instances, with the tenant set, if necessary
+        """
+        if not instances:
+            return instances
+        current_app.logger.debug('Put {0} instances'.format(len(instances)))
+        for instance in instances:
+            self._associate_users_and_tenants(instance)
+        db.session.add_all(instances)
+        try:
+            db.session.flush()
+        except sql_errors as e:
+            db.session.rollback()
+            raise manager_exceptions.SQLStorageException(
+                'SQL Storage error: {0}'.format(str(e))
+            )
+        self._validate_unique_resource_ids_per_tenant(instances)
+        self._safe_commit()
+        return instances
+
+    def update_many(self, instances):
+        """Add all the instances to the DB session, and commit them at once
+
+        :param instances: Instances to be updated in the DB
+        :return: The updated instances
+        """
+        current_app.logger.debug(
+            'Update {0} instances'.format(len(instances)))
+        db.session.add_all(instances)
+        self._safe_commit()
+        return instances
+
     def delete(self, instance):
         """Delete the passed instance
         """
@@ -203,14 +203,18 @@ class SelectEventsBaseTest(TestCase):
         def create_event():
             """Create new event using the execution created above."""
             execution = choice(executions)
+            node_instance = choice(node_instances)
             return Event(
                 id='event_{}'.format(fake.uuid4()),
                 timestamp=fake.date_time(),
                 reported_timestamp=fake.date_time(),
                 _execution_fk=execution._storage_id,
+                _deployment_fk=execution._deployment_fk,
+                _blueprint_fk=execution.deployment._blueprint_fk,
+                _node_instance_fk=node_instance._storage_id,
                 _tenant_id=execution._tenant_id,
                 _creator_id=execution._creator_id,
-                node_id=choice(node_instances).id,
+                node_id=node_instance.id,
                 operation='<operation>',
                 event_type=choice(self.EVENT_TYPES),
                 message=fake.sentence(),
@@ -220,14 +224,18 @@ class SelectEventsBaseTest(TestCase):
         def create_log():
             """Create new log using the execution created above."""
             execution = choice(executions)
+            node_instance = choice(node_instances)
             return Log(
                 id='log_{}'.format(fake.uuid4()),
                 timestamp=fake.date_time(),
                 reported_timestamp=fake.date_time(),
                 _execution_fk=execution._storage_id,
+                _deployment_fk=execution._deployment_fk,
+                _blueprint_fk=execution.deployment._blueprint_fk,
+                _node_instance_fk=node_instance._storage_id,
                 _tenant_id=execution._tenant_id,
                 _creator_id=execution._creator_id,
-                node_id=choice(node_instances).id,
+                node_id=node_instance.id,
                 operation='<operation>',
                 logger='<logger>',
                 level=choice(self.LOG_LEVELS),
@@ -739,6 +747,77 @@ class SelectEventsSortTest(SelectEventsBaseTest):
         self._sort_by_timestamp('@timestamp', 'desc')
 
 
+@attr(client_min_version=1, client_max_version=1)
+class SelectEventsCursorTest(SelectEventsBaseTest):
+
+    """Paginate through events using cursors."""
+
+    DEFAULT_FILTERS = {
+        'type': ['cloudify_event', 'cloudify_log']
+    }
+    DEFAULT_RANGE_FILTERS = {}
+    PAGE_SIZE = 7
+
+    def setUp(self):
+        super(SelectEventsCursorTest, self).setUp()
+        # Make some events share the same timestamp, to verify that ties
+        # don't make the pagination skip or repeat events
+        for event in self.events[10:20]:
+            event.timestamp = self.events[10].timestamp
+        db.session.commit()
+
+    def _paginate_with_cursor(self, direction):
+        """Get all the events, one page at a time.
+
+        :param direction: Sorting direction (asc/desc)
+        :type direction: str
+
+        """
+        sort = {'timestamp': direction}
+        params = {'limit': self.PAGE_SIZE, 'offset': 0}
+        cursor = None
+        event_ids = []
+        while True:
+            query = EventsV1._build_select_query(
+                self.DEFAULT_FILTERS,
+                sort,
+                self.DEFAULT_RANGE_FILTERS,
+                self.tenant.id,
+                cursor,
+            )
+            events = query.params(**params).all()
+            event_ids.extend(event.id for event in events)
+            if len(events) < self.PAGE_SIZE:
+                break
+            cursor = EventsV1._decode_cursor(
+                EventsV1._encode_cursor(events[-1]))
+
+        expected_events = sorted(
+            self.events,
+            key=lambda event: (
+                event.timestamp,
+                event.__class__.__name__,
+                event._storage_id,
+            ),
+            reverse=direction == 'desc',
+        )
+        expected_event_ids = [event.id for event in expected_events]
+        self.assertListEqual(event_ids, expected_event_ids)
+
+    def test_paginate_ascending(self):
+        """Paginate through events sorted by timestamp ascending."""
+        self._paginate_with_cursor('asc')
+
+    def test_paginate_descending(self):
+        """Paginate through events sorted by timestamp descending."""
+        self._paginate_with_cursor('desc')
+
+    def test_invalid_cursor(self):
+        """Invalid cursors are rejected."""
+        with self.assertRaises(BadParametersError):
+            EventsV1._decode_cursor('not-a-cursor')
+
+
 @attr(client_min_version=1, client_max_version=1)
 class SelectEventsRangeFilterTest(SelectEventsBaseTest):
 
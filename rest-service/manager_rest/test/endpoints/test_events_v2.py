@@ -12,9 +12,13 @@
 #  * See the License for the specific language governing permissions and
 #  * limitations under the License.
 
+import json
+from datetime import datetime
+
 from manager_rest.test.attribute import attr
 
 from manager_rest.test import base_test
+from manager_rest.storage import models
 
 
 @attr(client_min_version=2, client_max_version=base_test.LATEST_API_VERSION)
@@ -38,9 +42,118 @@ class EventsTest(base_test.BaseServerTestCase):
         self.assertEquals(total, response.metadata.pagination.total)
         self.assertEquals(len(hits), len(response.items))
 
+    def _put_events(self, execution, timestamps, first_index=0):
+        """Store an event and a log for each of the timestamps"""
+        stored = []
+        for index, timestamp in enumerate(timestamps, first_index):
+            for model in [models.Event, models.Log]:
+                item = model(id='{0}_{1}'.format(model.__name__, index),
+                             timestamp=timestamp,
+                             reported_timestamp=timestamp,
+                             message='{0} at {1}'.format(
+                                 model.__name__, timestamp))
+                item.set_execution(execution)
+                stored.append(self.sm.put(item))
+        return stored
+
+    @attr(client_min_version=3,
+          client_max_version=base_test.LATEST_API_VERSION)
+    def test_list_events_with_cursor(self):
+        self.put_deployment('d1')
+        execution = self.sm.list(models.Execution)[0]
+        # Events and logs share timestamps, so ties are broken by the type,
+        # and then by the storage id
+        shared = datetime(2018, 1, 1, 12, 0, 0)
+        stored = self._put_events(
+            execution, [shared, shared, shared, datetime(2018, 1, 1, 12, 1)])
+        expected = sorted(
+            stored,
+            key=lambda item: (item.timestamp, item.__class__.__name__,
+                              item._storage_id))
+
+        messages = []
+        cursor = ''
+        while True:
+            response = self.get('/events', query_params={
+                'execution_id': execution.id,
+                'type': ['cloudify_event', 'cloudify_log'],
+                '_sort': '@timestamp',
+                '_size': 3,
+                '_cursor': cursor,
+            })
+            self.assertEqual(200, response.status_code)
+            result = json.loads(response.data)
+            # the total isn't counted, unless requested
+            self.assertIsNone(result['metadata']['pagination']['total'])
+            if not result['items']:
+                break
+            messages.extend(item['message'] for item in result['items'])
+            cursor = result['metadata']['pagination']['cursor']
+        self.assertEqual([item.message for item in expected], messages)
+
+        response = self.get('/events', query_params={
+            'execution_id': execution.id,
+            'type': ['cloudify_event', 'cloudify_log'],
+            '_cursor': '',
+            '_include_count': True,
+        })
+        result = json.loads(response.data)
+        self.assertEqual(len(stored),
+                         result['metadata']['pagination']['total'])
+
     @attr(client_min_version=3,
           client_max_version=base_test.LATEST_API_VERSION)
     def test_delete_events(self):
         response = self.client.events.delete(
             '<deployment_id>', include_logs=True)
         self.assertEqual(response.items, [0])
+
+    @attr(client_min_version=3.1,
+          client_max_version=base_test.LATEST_API_VERSION)
+    def test_tail_events_empty(self):
+        response = self.get('/events/tail', query_params={
+            'execution_id': '<execution_id>',
+            '_cursor': '',
+        })
+        self.assertEqual(200, response.status_code)
+        result = json.loads(response.data)
+        self.assertEqual([], result['items'])
+        self.assertEqual('', result['metadata']['pagination']['cursor'])
+
+    @attr(client_min_version=3.1,
+          client_max_version=base_test.LATEST_API_VERSION)
+    def test_tail_events_after_cursor(self):
+        self.put_deployment('d1')
+        execution = self.sm.list(models.Execution)[0]
+        self._put_events(execution, [datetime(2018, 1, 1, 12, 0)])
+
+        def _tail(cursor):
+            response = self.get('/events/tail', query_params={
+                'execution_id': execution.id,
+                'type': ['cloudify_event', 'cloudify_log'],
+                '_cursor': cursor,
+            })
+            self.assertEqual(200, response.status_code)
+            result = json.loads(response.data)
+            return ([item['message'] for item in result['items']],
+                    result['metadata']['pagination']['cursor'])
+
+        messages, cursor = _tail('')
+        self.assertEqual(['Event at 2018-01-01 12:00:00',
+                          'Log at 2018-01-01 12:00:00'], messages)
+        self.assertEqual(([], cursor), _tail(cursor))
+
+        # Only the events stored after the cursor are returned
+        self._put_events(execution, [datetime(2018, 1, 1, 12, 1)],
+                         first_index=1)
+        messages, next_cursor = _tail(cursor)
+        self.assertEqual(['Event at 2018-01-01 12:01:00',
+                          'Log at 2018-01-01 12:01:00'], messages)
+        self.assertNotEqual(cursor, next_cursor)
+        self.assertEqual(([], next_cursor), _tail(next_cursor))
+
+    @attr(client_min_version=3.1,
+          client_max_version=base_test.LATEST_API_VERSION)
+    def test_tail_events_execution_required(self):
+        response = self.get('/events/tail')
+        self.assertEqual(400, response.status_code)
@@ -13,16 +13,20 @@
 #  * See the License for the specific language governing permissions and
 #  * limitations under the License.
 
+import threading
 from itertools import dropwhile
 
 import mock
+from sqlalchemy import event
 from manager_rest.test.attribute import attr
 
 from cloudify_rest_client import exceptions
 
-from manager_rest import utils
-from manager_rest.storage import models
+from manager_rest import config, utils
+from manager_rest.storage import db, models
 from manager_rest import manager_exceptions
+from manager_rest.constants import DEFAULT_TENANT_NAME
+from manager_rest.execution_dispatcher import QueuedExecutionsDispatcher
 from manager_rest.test.base_test import BaseServerTestCase
 from manager_rest.test.base_test import LATEST_API_VERSION
 from manager_rest.storage.models_states import ExecutionState
@@ -715,6 +719,198 @@ class ExecutionsTestCase(BaseServerTestCase):
             except exceptions.CloudifyClientError, e:
                 self.assertEqual(expected_status_code, e.status_code)
 
+    @mock.patch('manager_rest.resource_manager.send_event')
+    def test_start_queued_executions(self, _):
+        _, deployment_id, _, _ = self.put_deployment(self.DEPLOYMENT_ID)
+        _, other_deployment_id, _, _ = self.put_deployment(
+            'other_deployment', blueprint_id='other_blueprint')
+
+        running = self.client.executions.start(deployment_id, 'install')
+        self._modify_execution_status_in_database(
+            running, ExecutionState.STARTED)
+        other_running = self.client.executions.start(other_deployment_id,
+                                                     'install')
+        self._modify_execution_status_in_database(
+            other_running, ExecutionState.STARTED)
+        queued = [
+            self.client.executions.start(deployment_id, 'install',
+                                         queue=True),
+            self.client.executions.start(deployment_id, 'install',
+                                         queue=True),
+            self.client.executions.start(other_deployment_id, 'install',
+                                         queue=True),
+        ]
+        self.assertEqual(['queued'] * 3, [e.status for e in queued])
+
+        # Only the oldest queued execution of the deployment is started, and
+        # the other deployment is still busy
+        self.client.executions.update(running.id, 'terminated')
+        self.assertEqual(['terminated', 'queued', 'queued'],
+                         [self.client.executions.get(e.id).status
+                          for e in queued])
+
+        self.client.executions.update(other_running.id, 'terminated')
+        self.assertEqual(['terminated'] * 3,
+                         [self.client.executions.get(e.id).status
+                          for e in queued])
+
+    def test_execute_workflow_loads_only_workflow_columns(self):
+        blueprint_id, deployment_id, _, _ = self.put_deployment(
+            self.DEPLOYMENT_ID)
+        blueprint = self.sm.get(models.Blueprint, blueprint_id)
+        self.assertEqual(blueprint.plan['workflow_plugins_to_install'],
+                         blueprint._workflow_plugins)
+
+        statements = []
+
+        def _record_statement(conn, cursor, statement, *_):
+            statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', _record_statement)
+        self.addCleanup(event.remove, db.engine, 'before_cursor_execute',
+                        _record_statement)
+
+        self.client.executions.start(deployment_id, 'install')
+        statements = ' '.join(statements)
+        self.assertIn('deployments.workflows', statements)
+        for column in ['blueprints.plan', 'deployments.inputs',
+                       'deployments.outputs']:
+            self.assertNotIn(column, statements)
+
+    def test_execute_workflow_without_stored_workflow_plugins(self):
+        # e.g. a blueprint restored from an Elasticsearch snapshot
+        blueprint_id, deployment_id, _, _ = self.put_deployment(
+            self.DEPLOYMENT_ID)
+        blueprint = self.sm.get(models.Blueprint, blueprint_id)
+        blueprint._workflow_plugins = None
+        self.sm.update(blueprint)
+
+        execution = self.client.executions.start(deployment_id, 'install')
+        self.assertEqual(ExecutionState.TERMINATED, execution.status)
+        self.assertEqual(blueprint.plan['workflow_plugins_to_install'],
+                         blueprint.workflow_plugins)
+
+    @mock.patch.object(QueuedExecutionsDispatcher, '_use_thread',
+                       return_value=True)
+    @mock.patch.object(QueuedExecutionsDispatcher,
+                       '_start_queued_executions')
+    def test_start_queued_executions_in_background(self, start_queued, _):
+        dispatched = threading.Event()
+        start_queued.side_effect = lambda *_: dispatched.set()
+        _, deployment_id, _, _ = self.put_deployment(self.DEPLOYMENT_ID)
+        execution = self.client.executions.start(deployment_id, 'install')
+        self._modify_execution_status_in_database(
+            execution, ExecutionState.STARTED)
+
+        with mock.patch('manager_rest.resource_manager.dispatcher',
+                        QueuedExecutionsDispatcher()):
+            self.client.executions.update(execution.id, 'terminated')
+        self.assertTrue(dispatched.wait(5))
+        _, _, tenant_id, user_id = start_queued.call_args[0]
+        tenant = models.Tenant.query.filter_by(
+            name=DEFAULT_TENANT_NAME).first()
+        self.assertEqual((tenant.id, 0), (tenant_id, user_id))
+
+    @mock.patch('manager_rest.resource_manager.send_event')
+    @mock.patch.object(QueuedExecutionsDispatcher, '_use_thread',
+                       return_value=True)
+    def test_background_thread_starts_queued_executions(self, *_):
+        _, deployment_id, _, _ = self.put_deployment(self.DEPLOYMENT_ID)
+        running = self.client.executions.start(deployment_id, 'install')
+        self._modify_execution_status_in_database(
+            running, ExecutionState.STARTED)
+        queued = self.client.executions.start(deployment_id, 'install',
+                                              queue=True)
+
+        dispatcher = QueuedExecutionsDispatcher()
+        with mock.patch('manager_rest.resource_manager.dispatcher',
+                        dispatcher), \
+                mock.patch.object(threading, 'Thread') as thread:
+            self.client.executions.update(running.id, 'terminated')
+        self.assertEqual(ExecutionState.QUEUED,
+                         self.client.executions.get(queued.id).status)
+
+        # SQLite can't be shared between threads, so the thread's pass over
+        # the pending tenants runs here
+        dispatcher._start_pending(*thread.call_args[1]['args'])
+        self.assertEqual(ExecutionState.TERMINATED,
+                         self.client.executions.get(queued.id).status)
+
+    def _bulk_execute(self, deployment_ids, **kwargs):
+        data = dict(deployment_ids=deployment_ids, workflow_id='install',
+                    **kwargs)
+        return self.post('/bulk-executions', data)
+
+    def _put_deployments(self, count):
+        return [self.put_deployment('deployment{0}'.format(i),
+                                    blueprint_id='blueprint{0}'.format(i))[1]
+                for i in range(count)]
+
+    @attr(client_min_version=3.1, client_max_version=LATEST_API_VERSION)
+    def test_bulk_execute(self):
+        deployment_ids = self._put_deployments(3)
+        response = self._bulk_execute(deployment_ids)
+        self.assertEqual(201, response.status_code)
+        executions = response.json
+        self.assertEqual(deployment_ids,
+                         [e['deployment_id'] for e in executions])
+        for execution in executions:
+            self.assertEqual(
+                'terminated',
+                self.client.executions.get(execution['id']).status)
+
+    @attr(client_min_version=3.1, client_max_version=LATEST_API_VERSION)
+    @mock.patch('manager_rest.resource_manager.send_events')
+    def test_bulk_execute_running_deployment(self, send_events):
+        deployment_ids = self._put_deployments(2)
+        running = self.client.executions.start(deployment_ids[0], 'install')
+        self._modify_execution_status_in_database(
+            running, ExecutionState.STARTED)
+
+        # Nothing is created if an execution can't start
+        response = self._bulk_execute(deployment_ids)
+        self.assertEqual(400, response.status_code)
+        self.assertIn(running.id, response.json['message'])
+        self.assertEqual(0, len(self.client.executions.list(
+            deployment_id=deployment_ids[1], workflow_id='install')))
+
+        response = self._bulk_execute(deployment_ids, queue=True)
+        self.assertEqual(201, response.status_code)
+        self.assertEqual(['queued', 'terminated'],
+                         [e['status'] for e in response.json])
+        queued_events = send_events.call_args[0][0]
+        self.assertEqual([response.json[0]['id']],
+                         [e['context']['execution_id'] for e in queued_events])
+
+    @attr(client_min_version=3.1, client_max_version=LATEST_API_VERSION)
+    @mock.patch('manager_rest.resource_manager.send_events')
+    def test_bulk_execute_max_concurrent_executions(self, _):
+        deployment_ids = self._put_deployments(3)
+        with mock.patch.object(config.instance, 'max_concurrent_executions',
+                               1):
+            response = self._bulk_execute(deployment_ids)
+            self.assertEqual(400, response.status_code)
+
+            response = self._bulk_execute(deployment_ids, queue=True)
+            self.assertEqual(201, response.status_code)
+            executions = response.json
+            self.assertEqual(['terminated', 'queued', 'queued'],
+                             [e['status'] for e in executions])
+
+            # The queued executions are started one at a time as well
+            self._modify_execution_status_in_database(
+                executions[0], ExecutionState.STARTED)
+            self.client.executions.update(executions[0]['id'], 'terminated')
+            self.assertEqual(['terminated', 'queued'],
+                             [self.client.executions.get(e['id']).status
+                              for e in executions[1:]])
+
+    @attr(client_min_version=3.1, client_max_version=LATEST_API_VERSION)
+    def test_bulk_execute_nonexistent_deployment(self):
+        deployment_ids = self._put_deployments(1)
+        response = self._bulk_execute(deployment_ids + ['idonotexist'])
+        self.assertEqual(404, response.status_code)
+        self.assertIn('idonotexist', response.json['message'])
+
     def test_get_non_existent_execution(self):
         resource_path = '/executions/idonotexist'
         response = self.get(resource_path)
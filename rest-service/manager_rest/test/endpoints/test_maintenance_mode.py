@@ -20,6 +20,8 @@ from manager_rest.test.attribute import attr
 from cloudify_rest_client import exceptions
 
 from manager_rest import utils
+from manager_rest.maintenance import (MaintenanceModeState,
+                                      prepare_maintenance_dict)
 from manager_rest.test import base_test
 from manager_rest.storage import models
 from manager_rest.test.base_test import BaseServerTestCase
@@ -260,6 +262,24 @@ class MaintenanceModeTest(BaseServerTestCase):
         self._test_different_execution_status_in_activating_mode(
                 ExecutionState.FORCE_CANCELLING)
 
+    def test_maintenance_state_refreshed_from_file(self):
+        maintenance_file = os.path.join(self.maintenance_mode_dir,
+                                        MAINTENANCE_MODE_STATUS_FILE)
+        state = MaintenanceModeState(refresh_interval=60)
+        self.assertIsNone(state.get())
+
+        # e.g. activated by another worker
+        utils.write_dict_to_json_file(
+            maintenance_file,
+            prepare_maintenance_dict(MAINTENANCE_MODE_ACTIVATED))
+        self.assertIsNone(state.get())
+        self.assertEqual(MAINTENANCE_MODE_ACTIVATED,
+                         state.get(refresh=True)['status'])
+
+        state.set(None)
+        self.assertFalse(os.path.exists(maintenance_file))
+        self.assertIsNone(state.get())
+
     def _test_different_execution_status_in_activating_mode(
             self,
             execution_status=None):
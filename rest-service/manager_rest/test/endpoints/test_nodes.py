@@ -132,6 +132,90 @@ class NodesTest(base_test.BaseServerTestCase):
         self.assertEqual('ddd', response.json['runtime_properties']['ccc'])
         self.assertEqual('b-state', response.json['state'])
 
+    @attr(client_min_version=3.1,
+          client_max_version=base_test.LATEST_API_VERSION)
+    def test_patch_many_node_instances(self):
+        """Many node instances are updated in a single request."""
+        self.put_node_instance(instance_id='1234', deployment_id='111')
+        self.put_node_instance(instance_id='5678', deployment_id='111')
+
+        response = self.patch('/node-instances', {'node_instances': [
+            {
+                'id': '1234',
+                'state': 'a-state',
+                'runtime_properties': {'aaa': 'bbb'},
+                'version': 1
+            },
+            {'id': '5678', 'state': 'b-state', 'version': 1},
+        ]})
+        self.assertEqual(200, response.status_code)
+        self.assertEqual([], response.json['errors'])
+        items = {item['id']: item for item in response.json['items']}
+        self.assertEqual({'aaa': 'bbb'}, items['1234']['runtime_properties'])
+        self.assertEqual('a-state', items['1234']['state'])
+        self.assertEqual('b-state', items['5678']['state'])
+        self.assertEqual(
+            {'1234': 2, '5678': 2},
+            {instance.id: instance.version
+             for instance in self.client.node_instances.list()})
+
+    @attr(client_min_version=3.1,
+          client_max_version=base_test.LATEST_API_VERSION)
+    def test_patch_many_node_instances_errors(self):
+        """Conflicting and missing node instances are reported, and the rest
+        of the node instances are still updated."""
+        self.put_node_instance(instance_id='1234', deployment_id='111')
+        self.put_node_instance(instance_id='5678', deployment_id='111')
+        self.patch('/node-instances/1234', {'state': 'x-state',
+                                            'version': 1})
+
+        response = self.patch('/node-instances', {'node_instances': [
+            {'id': '1234', 'state': 'a-state', 'version': 1},
+            {'id': '5678', 'state': 'b-state', 'version': 1},
+            {'id': 'missing', 'state': 'c-state', 'version': 1},
+        ]})
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(['5678'],
+                         [item['id'] for item in response.json['items']])
+        self.assertEqual(
+            [('1234', 'conflict_error'), ('missing', 'not_found_error')],
+            [(error['id'], error['error_code'])
+             for error in response.json['errors']])
+        self.assertEqual('x-state',
+                         self.client.node_instances.get('1234').state)
+        self.assertEqual('b-state',
+                         self.client.node_instances.get('5678').state)
+
+    @attr(client_min_version=3.1,
+          client_max_version=base_test.LATEST_API_VERSION)
+    def test_bad_patch_many_node_instances(self):
+        response = self.patch('/node-instances', {'node_instances': [
+            {'id': '1234'},
+        ]})
+        self.assertEqual(400, response.status_code)
+        response = self.patch('/node-instances', {'node_instances': 'bad'})
+        self.assertEqual(400, response.status_code)
+
+    @attr(client_min_version=3.1,
+          client_max_version=base_test.LATEST_API_VERSION)
+    def test_patch_many_node_instances_duplicate_ids(self):
+        """A batch can't update the same node instance twice, as the second
+        update would override the first without a version conflict."""
+        self.put_node_instance(instance_id='1234', deployment_id='111')
+        self.put_node_instance(instance_id='5678', deployment_id='111')
+
+        response = self.patch('/node-instances', {'node_instances': [
+            {'id': '1234', 'state': 'a-state', 'version': 1},
+            {'id': '5678', 'state': 'b-state', 'version': 1},
+            {'id': '1234', 'state': 'c-state', 'version': 1},
+        ]})
+        self.assertEqual(400, response.status_code)
+        self.assertIn('1234', response.json['message'])
+        self.assertEqual(
+            {'1234': 1, '5678': 1},
+            {instance.id: instance.version
+             for instance in self.client.node_instances.list()})
+
     @skip('Deprecated since using sqlalchemy locking mechanism')
     def test_old_version(self):
         """Can't update a node instance passing new version != old version."""
@@ -14,19 +14,27 @@
 #  * limitations under the License.
 
 
+import json
 from unittest import TestCase
 
+from flask import Flask
+from flask_restful import fields, marshal
+from flask_restful.fields import MarshallingException
 
 from dateutil.parser import parse as parse_datetime
 from mock import Mock, patch, MagicMock
 from manager_rest.test.attribute import attr
 from voluptuous import Invalid
 
+from manager_rest.rest.responses_v2 import ListResponse
 from manager_rest.rest.rest_decorators import (
+    marshal_with,
     paginate,
     rangeable,
     sortable,
 )
+from manager_rest.rest.serialization import Serializer, stream_list
+from manager_rest.security.secured_resource import authenticate
 from manager_rest.test import base_test
 
 
@@ -227,3 +235,87 @@ class SortableTest(TestCase):
             request.args.getlist.return_value = [None]
             with self.assertRaises(Invalid):
                 sortable()(Mock)()
+
+
+@attr(client_min_version=1, client_max_version=base_test.LATEST_API_VERSION)
+class SerializerTest(TestCase):
+    FIELDS = {
+        'id': fields.String,
+        'count': fields.Integer,
+        'enabled': fields.Boolean,
+        'properties': fields.Raw,
+        'tags': fields.List(fields.String),
+        'nested': {'id': fields.String},
+        'renamed': fields.String(attribute='id'),
+    }
+
+    def test_same_as_marshal(self):
+        items = [
+            {'id': 'a', 'count': '3', 'enabled': 1, 'properties': {'x': [1]},
+             'tags': ['t1', 't2'], 'extra': 'not included'},
+            {'id': None, 'count': None, 'enabled': None, 'properties': None,
+             'tags': None},
+            {},
+        ]
+        self.assertEqual(marshal(items, self.FIELDS),
+                         Serializer(self.FIELDS)(items))
+        self.assertEqual(marshal(items[0], self.FIELDS),
+                         Serializer(self.FIELDS)(items[0]))
+
+    def test_stream_list(self):
+        items = [{'id': 'a'}, {'id': 'b'}]
+        metadata = {'pagination': {'total': 2, 'size': 2, 'offset': 0}}
+        streamed = ''.join(stream_list(iter(items), metadata))
+        self.assertEqual({'items': items, 'metadata': metadata},
+                         json.loads(streamed))
+        self.assertEqual({'items': [], 'metadata': metadata},
+                         json.loads(''.join(stream_list([], metadata))))
+
+    def test_stream_large_list_response(self):
+        class IdResponse(object):
+            resource_fields = {'id': fields.String}
+
+        @marshal_with(IdResponse, stream_threshold=1)
+        def list_items(count):
+            return ListResponse(items=[{'id': str(i)} for i in range(count)],
+                                metadata={})
+
+        with Flask(__name__).test_request_context('/api/v3.1/items'):
+            self.assertEqual([{'id': '0'}], list_items(1)['items'])
+            response = list_items(2)
+            self.assertEqual(
+                {'items': [{'id': '0'}, {'id': '1'}], 'metadata': {}},
+                json.loads(''.join(response.response)))
+
+    def test_stream_serialization_error(self):
+        class IdResponse(object):
+            resource_fields = {'id': fields.Integer}
+
+        @marshal_with(IdResponse, stream_threshold=1)
+        def list_items(ids):
+            return ListResponse(items=[{'id': i} for i in ids], metadata={})
+
+        with Flask(__name__).test_request_context('/api/v3.1/items'):
+            # the first item is serialized before the response starts, so
+            # the error isn't hidden in a truncated response
+            with self.assertRaises(MarshallingException):
+                list_items(['a', '1'])
+
+    def test_stream_response_headers(self):
+        class IdResponse(object):
+            resource_fields = {'id': fields.String}
+
+        @authenticate
+        @marshal_with(IdResponse, stream_threshold=1)
+        def list_items(count):
+            return ListResponse(items=[{'id': str(i)} for i in range(count)],
+                                metadata={})
+
+        auth_response = Mock(response_headers={'X-Auth': 'value'})
+        with Flask(__name__).test_request_context('/api/v3.1/items'):
+            with patch('manager_rest.security.secured_resource.authenticator.'
+                       'authenticate', return_value=auth_response):
+                response = list_items(2)
+            self.assertEqual('value', response.headers['X-Auth'])
+            self.assertEqual(2, len(json.loads(
+                ''.join(response.response))['items']))
@@ -13,13 +13,23 @@
 #  * See the License for the specific language governing permissions and
 #  * limitations under the License.
 
+import imp
+import os
+from datetime import datetime
+from decimal import Decimal
+
+import sqlalchemy as sa
+from mock import patch
+from sqlalchemy.dialects import postgresql
+
 from manager_rest.test.attribute import attr
 
 from manager_rest import utils
 from manager_rest.test import base_test
-from manager_rest.storage import models
+from manager_rest.storage import db, models
+from manager_rest.storage.models_base import JSONString, make_json_compatible
 from manager_rest.storage.models_states import VisibilityState
-from manager_rest.manager_exceptions import IllegalActionError
+from manager_rest.manager_exceptions import ConflictError, IllegalActionError
 
 
 @attr(client_min_version=1, client_max_version=base_test.LATEST_API_VERSION)
@@ -216,3 +226,155 @@ class StorageManagerTests(base_test.BaseServerTestCase):
             get_all_results=True
         )
         self.assertEquals(1001, len(secret_list))
+
+    def test_put_many(self):
+        now = utils.get_formatted_timestamp()
+        secrets = [models.Secret(id='secret_{}'.format(i),
+                                 value='value',
+                                 created_at=now,
+                                 updated_at=now,
+                                 visibility=VisibilityState.TENANT)
+                   for i in range(1001)]
+        self.sm.put_many(secrets)
+
+        secret_list = self.sm.list(models.Secret, get_all_results=True)
+        self.assertEquals(1001, len(secret_list))
+        self.assertEquals(self.sm.current_tenant, secret_list[0].tenant)
+
+    def test_put_many_conflict(self):
+        now = utils.get_formatted_timestamp()
+        self.sm.put(models.Secret(id='secret_1',
+                                  value='value',
+                                  created_at=now,
+                                  updated_at=now,
+                                  visibility=VisibilityState.TENANT))
+        secrets = [models.Secret(id='secret_{}'.format(i),
+                                 value='value',
+                                 created_at=now,
+                                 updated_at=now,
+                                 visibility=VisibilityState.TENANT)
+                   for i in range(3)]
+        self.assertRaisesRegexp(ConflictError,
+                                'secret_1',
+                                self.sm.put_many,
+                                secrets)
+        # none of the secrets were stored, except the existing one
+        secret_list = self.sm.list(models.Secret)
+        self.assertEquals(['secret_1'], [s.id for s in secret_list])
+
+    def test_heavy_columns_deferred(self):
+        now = utils.get_formatted_timestamp()
+        blueprint = models.Blueprint(id='blueprint-id',
+                                     created_at=now,
+                                     updated_at=now,
+                                     description=None,
+                                     plan={'name': 'my-bp'},
+                                     main_file_name='aaa')
+        self.sm.put(blueprint)
+        deployment = models.Deployment(id='dep-1',
+                                       created_at=now,
+                                       updated_at=now,
+                                       workflows={},
+                                       outputs={})
+        deployment.blueprint = blueprint
+        self.sm.put(deployment)
+        db.session.expunge(deployment)
+        db.session.expunge(blueprint)
+
+        # The blueprint is loaded through the relationship, without its plan
+        deployment = self.sm.get(models.Deployment, 'dep-1')
+        self.assertIn('workflows', deployment.__dict__)
+        self.assertEquals('blueprint-id', deployment.blueprint_id)
+        self.assertNotIn('plan', deployment.blueprint.__dict__)
+
+        blueprint = self.sm.get(models.Blueprint, 'blueprint-id')
+        self.assertEquals({'name': 'my-bp'}, blueprint.__dict__['plan'])
+
+    def test_json_columns(self):
+        now = utils.get_formatted_timestamp()
+        blueprint = models.Blueprint(id='blueprint-id',
+                                     created_at=now,
+                                     updated_at=now,
+                                     description=None,
+                                     plan={'name': 'my-bp'},
+                                     main_file_name='aaa')
+        self.sm.put(blueprint)
+        deployment = models.Deployment(id='dep-1',
+                                       created_at=now,
+                                       updated_at=now,
+                                       inputs={'a': [1, {'b': None}]},
+                                       groups=None)
+        deployment.blueprint = blueprint
+        self.sm.put(deployment)
+        db.session.expunge(deployment)
+
+        deployment = self.sm.get(models.Deployment, 'dep-1')
+        self.assertEquals({'a': [1, {'b': None}]}, deployment.inputs)
+        self.assertIsNone(deployment.groups)
+        self.assertIsInstance(
+            models.Deployment.inputs.type.load_dialect_impl(
+                postgresql.dialect()),
+            postgresql.JSONB)
+
+    def test_make_json_compatible(self):
+        value, dropped = make_json_compatible({
+            'set': {3, 1, 2},
+            'tuple': (1, ('a', 'b')),
+            'date': datetime(2017, 1, 2, 3, 4, 5),
+            'bytes': 'caf\xc3\xa9',
+            'not utf-8': '\xff\xfe',
+            'nested': [{1: float('nan')}, Decimal('1.5')],
+        })
+        self.assertEquals({
+            'set': [1, 2, 3],
+            'tuple': [1, ['a', 'b']],
+            'date': '2017-01-02T03:04:05',
+            'bytes': u'caf\xe9',
+            'not utf-8': None,
+            'nested': [{'1': None}, None],
+        }, value)
+        self.assertEquals(
+            {"['not utf-8']", "['nested'][0][1]", "['nested'][1]"},
+            set(dropped))
+
+    def test_pickle_to_jsonb_migration(self):
+        migration = imp.load_source(
+            'pickle_to_jsonb',
+            os.path.join(self.server_configuration.file_server_root,
+                         'cloudify', 'migrations', 'versions',
+                         '7b1038e2351f_pickle_to_jsonb.py'))
+        engine = sa.create_engine('sqlite:///{0}'.format(
+            os.path.join(self.tmpdir, 'migration.db')))
+        table = sa.Table(
+            'pickled', sa.MetaData(),
+            sa.Column('_storage_id', sa.Integer, primary_key=True),
+            sa.Column('value', sa.PickleType),
+            sa.Column('value_converted', JSONString))
+        table.create(engine)
+        values = [
+            {'set': {2, 1}, 'date': datetime(2017, 1, 2, 3, 4, 5)},
+            ('a', 'b'),
+            {'not utf-8': '\xff', 'decimal': Decimal('1.5')},
+            None,
+            float('nan'),
+        ]
+        engine.execute(table.insert(), [{'value': value} for value in values])
+
+        with patch.object(migration, 'op') as op, \
+                patch.object(migration, 'logger') as logger, \
+                patch.object(migration, 'BATCH_SIZE', 2):
+            op.get_bind.return_value = engine.connect()
+            migration._convert_table('pickled', ['value'], sa.PickleType(),
+                                     JSONString(), migration._to_json)
+
+        converted = engine.execute(
+            sa.select([table.c.value_converted])
+            .order_by(table.c._storage_id)).fetchall()
+        self.assertEquals([
+            {'set': [1, 2], 'date': '2017-01-02T03:04:05'},
+            ['a', 'b'],
+            {'not utf-8': None, 'decimal': None},
+            None,
+            None,
+        ], [row[0] for row in converted])
+        self.assertEquals(3, logger.warning.call_count)
@@ -14,10 +14,15 @@
 #  * limitations under the License.
 
 import os
+import Queue
 
 from mock import patch
+from cryptography.fernet import Fernet, InvalidToken
 from manager_rest.test.attribute import attr
 
+from manager_rest.amqp_publisher import AMQPPublisher
+from manager_rest.cryptography_utils import KeyManager
+from manager_rest.manager_exceptions import AMQPPublishError
 from manager_rest.utils import read_json_file, write_dict_to_json_file
 from manager_rest.utils import plugin_installable_on_current_platform
 from manager_rest.test import base_test
@@ -40,6 +45,76 @@ class TestUtils(base_test.BaseServerTestCase):
         self.assertEqual(3, read_dict['test'])
         self.assertEqual(test_dict, read_dict)
 
+    def test_model_fields_computed_once(self):
+        self.assertIs(models.Secret.resource_fields,
+                      models.Secret.resource_fields)
+        self.assertIs(models.Deployment.response_fields,
+                      models.Deployment.response_fields)
+        # extending the fields of the base class doesn't change them
+        self.assertIn('key', models.Secret.resource_fields)
+        self.assertNotIn('id', models.Secret.resource_fields)
+        self.assertIn('workflows', models.Deployment.response_fields)
+        self.assertNotIn('workflows', models.Blueprint.response_fields)
+
+    def test_key_manager_reloads_changed_key(self):
+        security_file = os.path.join(self.tmpdir, 'rest-security.conf')
+        self._get_encryption_key.reset_mock()
+        self._get_encryption_key.side_effect = \
+            lambda path: read_json_file(path)['encryption_key']
+        key_manager = KeyManager(security_file)
+        key = Fernet.generate_key()
+        write_dict_to_json_file(security_file, {'encryption_key': key})
+
+        encrypted = key_manager.encrypt_many(['a', 'b'])
+        self.assertEqual(['a', 'b'], key_manager.decrypt_many(encrypted))
+        self.assertEqual(1, self._get_encryption_key.call_count)
+        self.assertEqual('a', key_manager.decrypt(encrypted[0]))
+        self.assertEqual(1, self._get_encryption_key.call_count)
+
+        new_key = Fernet.generate_key()
+        write_dict_to_json_file(security_file, {'encryption_key': new_key})
+        # make sure the change is noticed, even if the mtime is the same
+        os.utime(security_file, (0, 0))
+        self.assertRaises(InvalidToken, key_manager.decrypt, encrypted[0])
+        self.assertEqual('a', key_manager.decrypt(encrypted[0], key=key))
+
+    @patch('manager_rest.amqp_publisher.get_client')
+    def test_amqp_publisher_reuses_connection(self, get_client):
+        client = get_client.return_value
+        thread = client.consume_in_thread.return_value
+        thread.is_alive.return_value = True
+        publisher = AMQPPublisher()
+
+        publisher.publish({'id': 1}, 'workflow')
+        publisher.publish_many([{'id': 2}, {'id': 3}], 'hook')
+        self.assertEqual(1, get_client.call_count)
+        self.assertEqual([True, True], [
+            call[1]['wait'] for call in client.publish.call_args_list[1:]])
+        self.assertEqual('events.hooks',
+                         client.publish.call_args[0][0]['routing_key'])
+
+        # the connection thread is gone, so a new connection is created
+        thread.is_alive.return_value = False
+        publisher.publish({'id': 4}, 'service')
+        self.assertEqual(2, get_client.call_count)
+
+    @patch('manager_rest.amqp_publisher.get_client')
+    def test_amqp_publisher_stops_on_failure(self, get_client):
+        client = get_client.return_value
+        client.consume_in_thread.return_value.is_alive.return_value = True
+        client.publish.side_effect = [None, Queue.Empty(), None]
+        publisher = AMQPPublisher()
+
+        with self.assertRaisesRegexp(AMQPPublishError, 'after sending 1'):
+            publisher.publish_many([{'id': 1}, {'id': 2}, {'id': 3}],
+                                   'workflow')
+        # the message after the failed one isn't sent, and the connection
+        # is recreated for the next messages
+        self.assertEqual(2, client.publish.call_count)
+        client.close.assert_called_once_with(wait=False)
+        publisher.publish({'id': 4}, 'workflow')
+        self.assertEqual(2, get_client.call_count)
+
     @attr(client_min_version=2,
           client_max_version=base_test.LATEST_API_VERSION)
     def test_plugin_installable_on_current_platform(self):
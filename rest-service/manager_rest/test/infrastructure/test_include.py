@@ -197,6 +197,12 @@ class IncludeQueryParamTests(base_test.BaseServerTestCase):
         response = self.client.deployments.get('b', _include=['blueprint_id'])
         self.assertEqual(response, {'blueprint_id': 'b'})
 
+    def test_deployment_workflows_include(self):
+        self.put_deployment(deployment_id='a', blueprint_id='a')
+        workflows = self.client.deployments.get('a').workflows
+        response = self.client.deployments.get('a', _include=['workflows'])
+        self.assertEqual(response, {'workflows': workflows})
+
     def test_created_by_include(self):
         self.put_deployment(deployment_id='a', blueprint_id='a')
         response = self.client.deployments.get('a', _include=['created_by'])
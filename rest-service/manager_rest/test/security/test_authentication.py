@@ -13,10 +13,18 @@
 #  * See the License for the specific language governing permissions and
 #  * limitations under the License.
 
+import unittest
+
 from manager_rest.test.attribute import attr
 from base64 import urlsafe_b64encode
 
+from mock import patch
+
+from manager_rest import config
 from manager_rest.constants import CLOUDIFY_TENANT_HEADER
+from manager_rest.storage import db, user_datastore
+from manager_rest.security.authentication import (VerificationCache,
+                                                  verification_cache)
 from manager_rest.test.base_test import LATEST_API_VERSION
 from manager_rest.utils import BASIC_AUTH_PREFIX, CLOUDIFY_AUTH_HEADER
 
@@ -110,3 +118,61 @@ class AuthenticationTests(SecurityTestBase):
             self.client._client.headers.pop(CLOUDIFY_TENANT_HEADER, None)
             token = self.client.tokens.get()
         self._assert_user_authorized(token=token.value)
+
+    def test_verified_password_is_cached(self):
+        verification_cache.clear()
+        self._assert_user_authorized(username='alice',
+                                     password='alice_password')
+        with patch('manager_rest.security.authentication.verify_password',
+                   return_value=False) as verify_password:
+            self._assert_user_authorized(username='alice',
+                                         password='alice_password')
+            self._assert_user_unauthorized(username='alice',
+                                           password='wrong_password')
+        # only the wrong password had to be verified
+        self.assertEqual(1, verify_password.call_count)
+
+    def test_last_login_update_is_coalesced(self):
+        def get_last_login():
+            db.session.expire_all()
+            return user_datastore.get_user('alice').last_login_at
+
+        self._assert_user_authorized(username='alice',
+                                     password='alice_password')
+        last_login = get_last_login()
+        self._assert_user_authorized(username='alice',
+                                     password='alice_password')
+        self.assertEqual(last_login, get_last_login())
+        with patch.object(config.instance, 'last_login_update_interval', 0):
+            self._assert_user_authorized(username='alice',
+                                         password='alice_password')
+        self.assertNotEqual(last_login, get_last_login())
+
+
+class VerificationCacheTests(unittest.TestCase):
+    def test_only_valid_credentials_are_cached(self):
+        cache = VerificationCache(size_limit=10, ttl=60)
+        self.assertFalse(cache.verify(('password', 'hash'), lambda: False))
+        self.assertTrue(cache.verify(('password', 'hash'), lambda: True))
+        self.assertTrue(cache.verify(('password', 'hash'), lambda: False))
+
+    def test_password_change_invalidates(self):
+        cache = VerificationCache(size_limit=10, ttl=60)
+        cache.verify(('password', 'hash'), lambda: True)
+        self.assertFalse(cache.verify(('password', 'new hash'), lambda: False))
+
+    def test_expiry(self):
+        cache = VerificationCache(size_limit=10, ttl=60)
+        with patch('manager_rest.security.authentication.time',
+                   return_value=1000):
+            cache.verify(('password', 'hash'), lambda: True)
+        with patch('manager_rest.security.authentication.time',
+                   return_value=1060):
+            self.assertFalse(cache.verify(('password', 'hash'), lambda: False))
+
+    def test_size_limit(self):
+        cache = VerificationCache(size_limit=2, ttl=60)
+        for password in ['a', 'b', 'c']:
+            cache.verify((password, 'hash'), lambda: True)
+        self.assertFalse(cache.verify(('a', 'hash'), lambda: False))
+        self.assertTrue(cache.verify(('c', 'hash'), lambda: False))
@@ -0,0 +1,72 @@
+#########
+# Copyright (c) 2018 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+from mock import patch
+
+from manager_rest.test.attribute import attr
+from manager_rest.test.base_test import LATEST_API_VERSION
+from manager_rest.utils import create_auth_header
+from manager_rest.rest.resources_v3.manager import (authenticator,
+                                                    file_server_auth_cache)
+
+from .test_base import SecurityTestBase
+
+
+@attr(client_min_version=3, client_max_version=LATEST_API_VERSION)
+class FileServerAuthTests(SecurityTestBase):
+    def setUp(self):
+        super(FileServerAuthTests, self).setUp()
+        file_server_auth_cache.clear()
+
+    def _file_server_auth(self, uri, **credentials):
+        headers = create_auth_header(**credentials)
+        headers['X-Original-Uri'] = uri
+        return self.app.get('/api/v3/file-server-auth', headers=headers)
+
+    def test_authentication_required(self):
+        response = self._file_server_auth(
+            '/resources/cloudify_agent/agent.tar.gz',
+            username='alice', password='wrong_password')
+        self.assertEqual(401, response.status_code)
+
+        response = self._file_server_auth(
+            '/resources/cloudify_agent/agent.tar.gz',
+            username='alice', password='alice_password')
+        self.assertEqual(200, response.status_code)
+
+    def test_decision_cached_per_resource(self):
+        response = self._file_server_auth(
+            '/blueprints/default_tenant/bp/scripts/create.sh',
+            username='bob', password='bob_password')
+        self.assertEqual(200, response.status_code)
+
+        with patch.object(authenticator, 'authenticate',
+                          wraps=authenticator.authenticate) as authenticate:
+            response = self._file_server_auth(
+                '/blueprints/default_tenant/bp/scripts/configure.sh',
+                username='bob', password='bob_password')
+            self.assertEqual(200, response.status_code)
+            self.assertFalse(authenticate.called)
+
+            response = self._file_server_auth(
+                '/blueprints/default_tenant/other_bp/scripts/create.sh',
+                username='bob', password='bob_password')
+            self.assertEqual(200, response.status_code)
+            self.assertEqual(1, authenticate.call_count)
+
+            response = self._file_server_auth(
+                '/blueprints/default_tenant/bp/scripts/configure.sh',
+                username='bob', password='wrong_password')
+            self.assertEqual(401, response.status_code)
@@ -0,0 +1,94 @@
+#########
+# Copyright (c) 2018 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+from datetime import datetime
+
+from sqlalchemy import event
+
+from cloudify_rest_client.exceptions import CloudifyClientError
+
+from manager_rest.constants import DEFAULT_TENANT_NAME, CLOUDIFY_TENANT_HEADER
+from manager_rest.utils import create_auth_header
+from manager_rest.storage import db, user_datastore
+from manager_rest.user_permissions import UserPermissions, permissions_cache
+
+from .test_base import SecurityTestBase
+
+
+class UserPermissionsTests(SecurityTestBase):
+    def test_permissions(self):
+        permissions = UserPermissions(
+            system_roles=['manager'],
+            tenant_roles={(1, 'tenant1'): ['user'], (2, 'tenant2'): []}
+        )
+        self.assertTrue(permissions.is_allowed('all_tenants'))
+        self.assertTrue(permissions.is_allowed('all_tenants', 'tenant1'))
+        self.assertFalse(permissions.is_allowed('create_global_resource',
+                                                'tenant1'))
+
+        permissions = UserPermissions(
+            system_roles=['default'],
+            tenant_roles={(1, 'tenant1'): ['user'], (2, 'tenant2'): []}
+        )
+        self.assertFalse(permissions.is_allowed('deployment_list'))
+        self.assertTrue(permissions.is_allowed('deployment_list', 'tenant1'))
+        self.assertFalse(permissions.is_allowed('deployment_list',
+                                                'tenant2'))
+        self.assertFalse(permissions.is_allowed('deployment_list',
+                                                'tenant3'))
+        self.assertTrue(permissions.is_allowed_in_any_tenant(
+            'deployment_list'))
+        self.assertEqual([1], permissions.allowed_tenant_ids(
+            'deployment_list'))
+
+    def test_membership_change_invalidates_cache(self):
+        bob = user_datastore.get_user('bob')
+        permissions = permissions_cache.get(bob)
+        self.assertTrue(permissions.is_allowed('deployment_list',
+                                               DEFAULT_TENANT_NAME))
+
+        bob.last_login_at = datetime.now()
+        db.session.commit()
+        self.assertIs(permissions, permissions_cache.get(bob))
+
+        bob.tenant_associations = []
+        db.session.commit()
+        self.assertFalse(permissions_cache.get(bob).is_allowed(
+            'deployment_list', DEFAULT_TENANT_NAME))
+
+    def test_tenant_resolved_from_permissions(self):
+        statements = []
+
+        def _record_statement(conn, cursor, statement, *args):
+            statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', _record_statement)
+        self.addCleanup(event.remove, db.engine, 'before_cursor_execute',
+                        _record_statement)
+
+        with self.use_secured_client(username='bob',
+                                     password='bob_password'):
+            self.client.deployments.list()
+        # bob is a member of the tenant, so the tenant isn't looked up by
+        # its name
+        self.assertFalse([statement for statement in statements
+                          if 'tenants.name = ' in statement])
+
+    def test_invalid_tenant(self):
+        headers = create_auth_header(username='bob', password='bob_password')
+        headers[CLOUDIFY_TENANT_HEADER] = 'no_such_tenant'
+        with self.use_secured_client(headers):
+            with self.assertRaisesRegexp(CloudifyClientError,
+                                         'invalid tenant name'):
+                self.client.deployments.list()
@@ -0,0 +1,121 @@
+#########
+# Copyright (c) 2018 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+import threading
+from time import time
+from collections import defaultdict
+
+from flask_security import current_user
+
+from manager_rest import config
+
+# Membership changes made by this process invalidate the cache right away,
+# but other processes only notice them once their snapshots expire
+PERMISSIONS_CACHE_TTL = 10  # seconds
+
+
+class UserPermissions(object):
+    """The actions a user is allowed to perform, in each of its tenants.
+
+    Resolving the roles of a user means loading its tenant associations, its
+    groups and their tenant associations, and then matching the roles with
+    `config.instance.authorization_permissions`. This is done once, when the
+    snapshot is created, instead of on every permission check.
+    """
+
+    def __init__(self, system_roles, tenant_roles):
+        """
+        :param system_roles: Names of the system roles of the user
+        :param tenant_roles: A dict mapping (tenant id, tenant name) pairs to
+                             the names of the roles of the user in the tenant
+        """
+        self.authorization_permissions = \
+            config.instance.authorization_permissions
+        role_actions = defaultdict(set)
+        for action, roles in self.authorization_permissions.iteritems():
+            for role in roles:
+                role_actions[role].add(action)
+
+        self.system_actions = frozenset().union(
+            *(role_actions[role] for role in system_roles))
+        self.tenant_ids = {}
+        self.tenant_actions = {}
+        for (tenant_id, tenant_name), roles in tenant_roles.iteritems():
+            self.tenant_ids[tenant_name] = tenant_id
+            self.tenant_actions[tenant_name] = self.system_actions.union(
+                *(role_actions[role] for role in roles))
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(
+            system_roles=user.system_roles,
+            tenant_roles={
+                (tenant.id, tenant.name): [role.name for role in roles]
+                for tenant, roles in user.all_tenants.iteritems()
+            }
+        )
+
+    def is_allowed(self, action, tenant_name=None):
+        """Is the action allowed in the tenant (or by the system roles)"""
+        return action in self.tenant_actions.get(tenant_name,
+                                                 self.system_actions)
+
+    def is_allowed_in_any_tenant(self, action):
+        return action in self.system_actions or any(
+            action in actions for actions in self.tenant_actions.values())
+
+    def allowed_tenant_ids(self, action):
+        """Ids of the tenants of the user in which the action is allowed"""
+        return [self.tenant_ids[tenant_name]
+                for tenant_name, actions in self.tenant_actions.iteritems()
+                if action in actions]
+
+
+class PermissionsCache(object):
+    def __init__(self, ttl):
+        self._ttl = ttl
+        self._permissions = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, user):
+        """Get the permissions of the user, from the cache if possible"""
+        now = time()
+        with self._lock:
+            generation = self._generation
+            expires_at, permissions = self._permissions.get(user.id,
+                                                            (0, None))
+        if expires_at > now and permissions.authorization_permissions is \
+                config.instance.authorization_permissions:
+            return permissions
+        permissions = UserPermissions.from_user(user)
+        with self._lock:
+            # Don't cache a snapshot that might've been computed before
+            # the memberships changed
+            if generation == self._generation:
+                self._permissions[user.id] = (now + self._ttl, permissions)
+        return permissions
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._permissions.clear()
+
+
+permissions_cache = PermissionsCache(PERMISSIONS_CACHE_TTL)
+
+
+def get_current_user_permissions():
+    return permissions_cache.get(current_user)
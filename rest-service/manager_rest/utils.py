@@ -35,8 +35,9 @@ from flask_security import current_user
 from werkzeug.local import LocalProxy
 
 from cloudify import logs
-from cloudify.amqp_client import create_events_publisher
 from manager_rest import constants, config, manager_exceptions
+from manager_rest.amqp_publisher import publisher
+from manager_rest.user_permissions import get_current_user_permissions
 
 
 CLOUDIFY_AUTH_HEADER = 'Authorization'
@@ -167,6 +168,25 @@ class classproperty(object):  # NOQA  # class CapWords
         return self.get_func(owner_cls)
 
 
+class cached_classproperty(classproperty):  # NOQA  # class CapWords
+    """A `classproperty` that is only computed once for every class
+
+    The value is shared by all the users of the property, so it must not
+    be modified (copy it first).
+    """
+    def __init__(self, get_func):
+        super(cached_classproperty, self).__init__(get_func)
+        self._values = {}
+
+    def __get__(self, _, owner_cls):
+        try:
+            return self._values[owner_cls]
+        except KeyError:
+            value = self.get_func(owner_cls)
+            self._values[owner_cls] = value
+            return value
+
+
 def create_auth_header(username=None, password=None, token=None, tenant=None):
     """Create a valid authentication header either from username/password or
     a token if any were provided; return an empty dict otherwise
@@ -186,44 +206,48 @@ def create_auth_header(username=None, password=None, token=None, tenant=None):
 def all_tenants_authorization():
     return (
         current_user.id == constants.BOOTSTRAP_ADMIN_ID or
-        any(r in current_user.system_roles
-            for r in config.instance.authorization_permissions['all_tenants'])
+        get_current_user_permissions().is_allowed('all_tenants')
     )
 
 
+def get_permission_name(resource_name, action='list'):
+    resource_name = MODELS_TO_PERMISSIONS.get(resource_name,
+                                              resource_name.lower())
+    return '{0}_{1}'.format(resource_name, action)
+
+
 def tenant_specific_authorization(tenant, resource_name, action='list'):
     """
     Return true if the user is permitted to perform a certain action in a
     in a given tenant on a given resource (for filtering purpose).
     """
-    resource_name = MODELS_TO_PERMISSIONS.get(resource_name,
-                                              resource_name.lower())
-    permission_name = '{0}_{1}'.format(resource_name, action)
-    return current_user.has_role_in(
-        tenant, config.instance.authorization_permissions[permission_name])
+    return get_current_user_permissions().is_allowed(
+        get_permission_name(resource_name, action), tenant.name)
 
 
 def is_administrator(tenant):
-    administrators_roles = \
-        config.instance.authorization_permissions['administrators']
     return (
         current_user.id == constants.BOOTSTRAP_ADMIN_ID or
-        current_user.has_role_in(tenant, administrators_roles)
+        get_current_user_permissions().is_allowed(
+            'administrators', tenant.name if tenant else None)
     )
 
 
 def is_create_global_permitted(tenant):
-    create_global_roles = \
-        config.instance.authorization_permissions['create_global_resource']
     return (
         current_user.id == constants.BOOTSTRAP_ADMIN_ID or
-        current_user.has_role_in(tenant, create_global_roles)
+        get_current_user_permissions().is_allowed(
+            'create_global_resource', tenant.name if tenant else None)
     )
 
 
 @LocalProxy
 def current_tenant():
     tenant = getattr(g, 'current_tenant', None)
+    if not tenant:
+        load_tenant = getattr(g, 'load_current_tenant', None)
+        if load_tenant is not None:
+            tenant = g.current_tenant = load_tenant()
     if not tenant:
         raise manager_exceptions.TenantNotProvided(
             'Authorization failed: tenant not provided')
@@ -234,6 +258,14 @@ def set_current_tenant(tenant):
     g.current_tenant = tenant
 
 
+def set_current_tenant_loader(load_tenant):
+    """Set the current tenant, which is only loaded (by calling
+    `load_tenant`) once it's used
+    """
+    g.current_tenant = None
+    g.load_current_tenant = load_tenant
+
+
 def unzip(archive, destination=None, logger=None):
     if not destination:
         destination = tempfile.mkdtemp()
@@ -263,15 +295,11 @@ def remove(path):
 
 def send_event(event, message_type):
     logs.populate_base_item(event, 'cloudify_event')
-    events_publisher = create_events_publisher(
-        amqp_host=config.instance.amqp_host,
-        amqp_user=config.instance.amqp_username,
-        amqp_pass=config.instance.amqp_password,
-        amqp_port=constants.BROKER_SSL_PORT,
-        amqp_vhost='/',
-        ssl_enabled=True,
-        ssl_cert_path=config.instance.amqp_ca_path
-    )
+    publisher.publish(event, message_type)
+
 
-    events_publisher.publish_message(event, message_type)
-    events_publisher.close()
+def send_events(events, message_type):
+    """Send the events to the broker in a single batch"""
+    for event in events:
+        logs.populate_base_item(event, 'cloudify_event')
+    publisher.publish_many(events, message_type)
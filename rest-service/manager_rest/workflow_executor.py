@@ -13,14 +13,18 @@
 #  * See the License for the specific language governing permissions and
 #  * limitations under the License.
 
-from flask_security import current_user
+import threading
+from contextlib import contextmanager
+from itertools import groupby
+from operator import itemgetter
 
-from cloudify.amqp_client import get_client, SendHandler
+from flask_security import current_user
 
-from manager_rest import config, utils
+from manager_rest import utils
+from manager_rest.amqp_publisher import publisher
 from manager_rest.cryptography_utils import decrypt
 from manager_rest.storage import get_storage_manager, models
-from manager_rest.constants import MGMTWORKER_QUEUE, BROKER_SSL_PORT
+from manager_rest.constants import MGMTWORKER_QUEUE
 
 
 def execute_workflow(name,
@@ -110,21 +114,40 @@ def _get_tenant_dict():
     return tenant_dict
 
 
+# The tasks of the current `batched_tasks` block, per thread
+_batch = threading.local()
+
+
+@contextmanager
+def batched_tasks():
+    """Send the mgmtworker tasks of the block together, when it ends
+
+    The tasks are published in a single batch (per routing key), over the
+    same connection, after the block's work is done. If the block raises,
+    none of its tasks are sent.
+    """
+    if getattr(_batch, 'messages', None) is not None:
+        # A nested block - the tasks are sent by the outer one
+        yield
+        return
+    _batch.messages = []
+    try:
+        yield
+        messages = _batch.messages
+    finally:
+        _batch.messages = None
+    for routing_key, batch in groupby(messages, key=itemgetter(0)):
+        publisher.publish_many([message for _, message in batch],
+                               routing_key)
+
+
 def _send_mgmtworker_task(message, routing_key='workflow'):
     """Send a message to the mgmtworker exchange"""
-    client = get_client(
-        amqp_host=config.instance.amqp_host,
-        amqp_user=config.instance.amqp_username,
-        amqp_pass=config.instance.amqp_password,
-        amqp_port=BROKER_SSL_PORT,
-        amqp_vhost='/',
-        ssl_enabled=True,
-        ssl_cert_path=config.instance.amqp_ca_path
-    )
-    send_handler = SendHandler(MGMTWORKER_QUEUE, routing_key=routing_key)
-    client.add_handler(send_handler)
-    with client:
-        send_handler.publish(message)
+    messages = getattr(_batch, 'messages', None)
+    if messages is not None:
+        messages.append((routing_key, message))
+    else:
+        publisher.publish(message, routing_key)
 
 
 def _execute_task(execution_id, execution_parameters, context):
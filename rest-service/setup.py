@@ -22,6 +22,8 @@ install_requires = [
     'flask-sqlalchemy==2.3.2',
     'flask-security==3.0.0',
     'flask-migrate==2.2.1',
+    # migrations commit their batches in autocommit blocks
+    'alembic>=1.2.0',
     'supervise==1.1.1',
     'cloudify-common==4.5.5.dev1',
     'requests>=2.7.0,<3.0.0',
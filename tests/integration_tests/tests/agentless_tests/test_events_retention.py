@@ -0,0 +1,80 @@
+########
+# Copyright (c) 2018 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+from datetime import datetime, timedelta
+
+from integration_tests.framework import docl
+from integration_tests import AgentlessTestCase
+from integration_tests.framework import postgresql
+from integration_tests.tests.utils import get_resource as resource
+
+RETENTION_SCRIPT = '/etc/cloudify/delete_logs_and_events_from_db.py'
+# the default save period and partitions created ahead by the script
+SAVE_PERIOD = 5
+PARTITIONS_CREATED_AHEAD = 3
+
+
+class TestEventsRetention(AgentlessTestCase):
+    def _run_retention(self):
+        docl.execute('/opt/manager/env/bin/python {0}'
+                     .format(RETENTION_SCRIPT))
+
+    @staticmethod
+    def _partition_name(table, days_from_today):
+        day = datetime.utcnow().date() + timedelta(days=days_from_today)
+        return '{0}_p{1}'.format(table, day.strftime('%Y%m%d'))
+
+    def _create_partition(self, table, days_from_today):
+        day = datetime.utcnow().date() + timedelta(days=days_from_today)
+        postgresql.run_query("SELECT create_daily_partition('{0}', '{1}')"
+                             .format(table, day))
+        return self._partition_name(table, days_from_today)
+
+    @staticmethod
+    def _get_partitions(table):
+        result = postgresql.run_query(
+            "SELECT inhrelid::regclass::text FROM pg_inherits "
+            "WHERE inhparent = '{0}'::regclass".format(table))
+        return set(row[0] for row in result['all'])
+
+    def test_drop_expired_partitions(self):
+        expired, kept = {}, {}
+        for table in ['events', 'logs']:
+            expired[table] = self._create_partition(table, -SAVE_PERIOD - 2)
+            kept[table] = self._create_partition(table, -SAVE_PERIOD + 1)
+
+        self._run_retention()
+
+        for table in ['events', 'logs']:
+            partitions = self._get_partitions(table)
+            self.assertNotIn(expired[table], partitions)
+            self.assertIn(kept[table], partitions)
+            for day in range(PARTITIONS_CREATED_AHEAD + 1):
+                self.assertIn(self._partition_name(table, day), partitions)
+
+    def test_events_stored_in_partitions(self):
+        self._run_retention()
+        dsl_path = resource('dsl/basic.yaml')
+        self.deploy_application(dsl_path)
+
+        # the new events and logs are routed to today's partition
+        for table in ['events', 'logs']:
+            in_parent = postgresql.run_query(
+                'SELECT count(*) FROM ONLY {0}'.format(table))
+            self.assertEqual(in_parent['all'][0][0], 0)
+        in_partition = postgresql.run_query(
+            'SELECT count(*) FROM {0}'.format(
+                self._partition_name('events', 0)))
+        self.assertGreater(in_partition['all'][0][0], 0)
@@ -249,6 +249,21 @@ class TestSnapshot(AgentlessTestCase):
             tenant_name=tenant_name,
         )
 
+    def test_3_3_1_snapshot_events_restored_into_partitions(self):
+        # Pre-4.0 snapshots are restored through the ORM, so the events
+        # (inserted into the parent table) are moved to their partitions
+        # by the routing trigger
+        snapshot_path = self._get_snapshot('snap_3.3.1_with_plugin.zip')
+        self._upload_and_restore_snapshot(snapshot_path)
+        self._assert_3_3_1_snapshot_restored()
+
+        for table in ['events', 'logs']:
+            in_parent = postgresql.run_query(
+                'SELECT count(*) FROM ONLY {0}'.format(table))
+            self.assertEqual(in_parent['all'][0][0], 0)
+        in_partitions = postgresql.run_query('SELECT count(*) FROM events')
+        self.assertEqual(in_partitions['all'][0][0], 97)
+
     def test_restore_2_snapshots(self):
         tenant_1_name = 'tenant_1'
         tenant_2_name = 'tenant_2'
@@ -15,7 +15,6 @@
 
 import os
 import re
-import pickle
 import shutil
 import string
 import itertools
@@ -170,7 +169,8 @@ def restore(tempdir, postgres, version):
         for elem in result:
             node_id = elem[0]
             deployment_id = elem[1]
-            node_properties = pickle.loads(elem[2])
+            # The properties are stored as JSONB, so they're already loaded
+            node_properties = elem[2]
             agent_config = get_agent_config(node_properties)
             agent_key = agent_config.get('key')
 
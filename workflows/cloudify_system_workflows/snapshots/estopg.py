@@ -19,6 +19,8 @@ import json
 import logging
 import argparse
 
+from dsl_parser import constants
+
 from manager_rest import manager_exceptions
 from manager_rest import flask_utils
 from manager_rest import utils
@@ -29,6 +31,8 @@ logging.basicConfig(stream=sys.stdout, level=logging.DEBUG, format=format_str)
 logger = logging.getLogger('estopg')
 
 COMPUTE_NODE_TYPE = 'cloudify.nodes.Compute'
+# How many events or logs are stored in a single transaction
+EVENTS_BATCH_SIZE = 1000
 
 
 # Make storage manager work correctly
@@ -96,6 +100,8 @@ class EsToPg(object):
         for line in open(self._blueprints_path, 'r'):
             elem = self._get_elem(line)
             blueprint = models.Blueprint(**elem)
+            blueprint._workflow_plugins = \
+                blueprint.plan[constants.WORKFLOW_PLUGINS_TO_INSTALL]
             self._storage_manager.put(blueprint)
 
     def _restore_deployments(self):
@@ -159,6 +165,7 @@ class EsToPg(object):
 
     def _restore_events(self):
         """Restore events to postgres."""
+        events = []
         for line in open(self._events_path, 'r'):
             es_document = json.loads(line)
             es_event = es_document['_source']
@@ -187,13 +194,18 @@ class EsToPg(object):
                 'operation': es_event['context'].get('operation'),
                 'node_id': es_event['context'].get('node_id'),
                 'execution': execution,
+                '_deployment_fk': execution._deployment_fk,
+                '_blueprint_fk': self._get_blueprint_fk(execution),
             }
-            event = models.Event(**pg_event)
-            self._storage_manager.put(event)
-            logger.debug('Event added to database: %s', pg_event['id'])
+            events.append(models.Event(**pg_event))
+            if len(events) >= EVENTS_BATCH_SIZE:
+                self._put_events(events)
+                events = []
+        self._put_events(events)
 
     def _restore_logs(self):
         """Restore logs to postgres."""
+        logs = []
         for line in open(self._logs_path, 'r'):
             es_document = json.loads(line)
             es_log = es_document['_source']
@@ -223,10 +235,29 @@ class EsToPg(object):
                 'operation': es_log['context'].get('operation'),
                 'node_id': es_log['context'].get('node_id'),
                 'execution': execution,
+                '_deployment_fk': execution._deployment_fk,
+                '_blueprint_fk': self._get_blueprint_fk(execution),
             }
-            log = models.Log(**pg_log)
-            self._storage_manager.put(log)
-            logger.debug('Log added to database: %s', pg_log['id'])
+            logs.append(models.Log(**pg_log))
+            if len(logs) >= EVENTS_BATCH_SIZE:
+                self._put_events(logs)
+                logs = []
+        self._put_events(logs)
+
+    def _put_events(self, events):
+        """Store the events (or logs) in a single transaction.
+
+        The rows are moved to their daily partitions when they're inserted,
+        so they are stored without being returned (see the Event model).
+        """
+        self._storage_manager.put_many(events)
+        logger.debug('%d events/logs added to database', len(events))
+
+    @staticmethod
+    def _get_blueprint_fk(execution):
+        if execution.deployment is None:
+            return None
+        return execution.deployment._blueprint_fk
 
     def _get_node(self, node_id, deployment_id):
         nodes = self._storage_manager.list(
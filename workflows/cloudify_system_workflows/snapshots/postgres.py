@@ -17,11 +17,11 @@ import os
 import psycopg2
 from uuid import uuid4
 from contextlib import closing
-from cryptography.fernet import Fernet
 from psycopg2.extras import execute_values
 
 from cloudify.workflows import ctx
 from cloudify.exceptions import NonRecoverableError
+from manager_rest.cryptography_utils import encrypt_many
 
 from .constants import ADMIN_DUMP_FILE
 from .utils import run as run_shell
@@ -40,7 +40,11 @@ class Postgres(object):
     _STAGE_DB_NAME = 'stage'
     _COMPOSER_DB_NAME = 'composer'
     _TABLES_TO_KEEP = ['alembic_version', 'provider_context', 'roles']
-    _TABLES_TO_EXCLUDE_ON_DUMP = _TABLES_TO_KEEP + ['snapshots']
+    _PARTITIONED_TABLES = ['events', 'logs']
+    # partitioned tables are dumped separately, see _dump_partitioned_table
+    _TABLES_TO_EXCLUDE_ON_DUMP = _TABLES_TO_KEEP + ['snapshots'] + \
+        _PARTITIONED_TABLES + \
+        ['{0}_p*'.format(table) for table in _PARTITIONED_TABLES]
     _TABLES_TO_RESTORE = ['users', 'tenants']
     _STAGE_TABLES_TO_EXCLUDE = ['"SequelizeMeta"']
     _COMPOSER_TABLES_TO_EXCLUDE = ['"SequelizeMeta"']
@@ -98,6 +102,10 @@ class Postgres(object):
                 self._db_name,
                 exclude_tables=self._TABLES_TO_EXCLUDE_ON_DUMP
             )
+            if include_logs:
+                self._dump_partitioned_table(destination_path, 'logs')
+            if include_events:
+                self._dump_partitioned_table(destination_path, 'events')
             self._dump_admin_user_to_file(
                 admin_dump_path,
                 self._db_name,
@@ -248,6 +256,30 @@ class Postgres(object):
         command.extend(flags)
         run_shell(command)
 
+    def _dump_partitioned_table(self, destination_path, table):
+        """Append the rows of a partitioned table, including all of its
+        partitions, to the dump file.
+
+        The rows are restored into the parent table, so that the partitions
+        which don't exist on the restoring manager are created on insert.
+        """
+        ctx.logger.debug('Dumping partitioned table: {0}'.format(table))
+        result = self.run_query(
+            "SELECT column_name FROM information_schema.columns "
+            "WHERE table_name = '{0}' "
+            "ORDER BY ordinal_position".format(table))
+        columns = ', '.join('"{0}"'.format(row[0]) for row in result['all'])
+        self._append_dump(destination_path, 'COPY {0} ({1}) FROM stdin;'
+                          .format(table, columns))
+        command = self.get_psql_command()
+        command.extend([
+            '-c', 'COPY (SELECT {0} FROM {1}) TO STDOUT'.format(columns,
+                                                                table)
+        ])
+        run_shell(command, redirect_output_path=destination_path)
+        with open(destination_path, 'a') as f:
+            f.write('\\.\n')
+
     def _dump_admin_user_to_file(self, destination_path, db_name):
         ctx.logger.debug('Dumping admin account')
         command = self.get_psql_command(db_name)
@@ -391,11 +423,9 @@ class Postgres(object):
         if len(values['all']) < 1:
             return
 
-        encrypted_values = []
-        fernet = Fernet(encryption_key)
-        for value in values['all']:
-            encrypted_value = fernet.encrypt(bytes(value[1]))
-            encrypted_values.append((value[0], encrypted_value))
+        ids = [value[0] for value in values['all']]
+        encrypted_values = zip(ids, encrypt_many(
+            [value[1] for value in values['all']], key=encryption_key))
 
         update_query = """
 UPDATE {0}